@@ -0,0 +1,233 @@
+# Benchmark for every filter and overlay of the image manipulation program, with regression gates.
+# Each effect is timed on synthetic frames at several resolutions and on a short synthetic video
+# through process_video. Results can be saved as a baseline that later runs are checked against.
+
+# To run the benchmark, run the following command from the root of the repository:
+#     python3 Benchmarks/bench_effects.py
+# to save the results as the baseline of this machine:
+#     python3 Benchmarks/bench_effects.py --save-baseline
+# or to fail when an effect is more than 20% slower than the baseline:
+#     python3 Benchmarks/bench_effects.py --check --threshold 0.2
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts', 'image_manipulation')))
+from effects import ARRAY_FILTERS, OVERLAYS, stage_effect, uses_strength
+from main import process_video
+
+RESOLUTIONS: dict[str, tuple[int, int]] = {
+    "nuScenes": (1600, 900),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+}
+STRENGTHS: tuple[float, ...] = (0.2, 0.5, 1.0)
+VIDEO_SIZE: tuple[int, int] = (1600, 900)  # Size of the synthetic video, that of the nuScenes camera frames
+VIDEO_FPS: int = 12  # Frame rate of the nuScenes camera sweeps
+BASELINE_PATH: Path = Path(__file__).resolve().parent / "baselines" / "bench_effects.json"
+DEFAULT_THRESHOLD: float = 0.2  # Largest accepted drop in throughput, as a fraction of the baseline
+
+
+def time_effect(effect_func: Callable, image: np.ndarray, repeats: int) -> float:
+    """Applies an effect several times and measures the median time taken.
+
+    Args:
+        effect_func: The effect taking an image array.
+        image: The image array to process.
+        repeats: Number of timed runs, after one warm-up run that also prepares cached overlays.
+
+    Returns:
+        The median time in seconds.
+    """
+    effect_func(image)
+    timings: list[float] = []
+    for _ in range(repeats):
+        start: float = time.perf_counter()
+        effect_func(image)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Creates a smooth random frame, so blurs behave as they would on a photograph.
+
+    Args:
+        width: Width of the frame in pixels.
+        height: Height of the frame in pixels.
+        seed: Seed of the random values, so every run processes the same frames.
+
+    Returns:
+        The frame as a uint8 array with three channels.
+    """
+    rng: np.random.Generator = np.random.default_rng(seed)
+    coarse: np.ndarray = rng.integers(0, 256, (max(1, height // 50), max(1, width // 50), 3), dtype=np.uint8)
+    return cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+
+def write_synthetic_video(video_path: Path, frames: int) -> None:
+    """Writes a short video of smooth random frames panning sideways.
+
+    Args:
+        video_path: Path the video is saved to.
+        frames: Number of frames in the video.
+    """
+    base: np.ndarray = synthetic_frame(*VIDEO_SIZE)
+    writer: cv2.VideoWriter = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*'mp4v'), VIDEO_FPS, VIDEO_SIZE)
+    for i in range(frames):
+        writer.write(np.roll(base, 8 * i, axis=1))
+    writer.release()
+
+def effect_settings(effect_names: list[str]) -> list[tuple[str, float]]:
+    """Lists the (effect, strength) pairs to time. Overlays do not depend on the strength and are timed once.
+
+    Args:
+        effect_names: The effects to time.
+
+    Returns:
+        The pairs, in the order of effect_names.
+    """
+    return [(name, strength) for name in effect_names for strength in (STRENGTHS if uses_strength(name) else STRENGTHS[:1])]
+
+def result_name(effect_name: str, strength: float) -> str:
+    """Names an effect in the results and the baseline.
+
+    Args:
+        effect_name: Name of the effect.
+        strength: Strength of the effect, left out of the name of overlays.
+
+    Returns:
+        The name, e.g. gaussian@0.5 or rain.
+    """
+    return f"{effect_name}@{strength:g}" if uses_strength(effect_name) else effect_name
+
+def bench_images(effect_names: list[str], resolutions: list[str], repeats: int) -> dict[str, float]:
+    """Times every effect on single frames of every resolution.
+
+    Args:
+        effect_names: The effects to time.
+        resolutions: Names of the resolutions in RESOLUTIONS.
+        repeats: Number of timed runs per effect and resolution.
+
+    Returns:
+        The throughput in megapixels per second, keyed by '{resolution} {effect}'.
+    """
+    results: dict[str, float] = {}
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        image: np.ndarray = synthetic_frame(width, height)
+        for effect_name, strength in effect_settings(effect_names):
+            seconds: float = time_effect(stage_effect(effect_name, strength), image, repeats)
+            name: str = f"{resolution} {result_name(effect_name, strength)}"
+            results[name] = width * height / 1e6 / seconds
+            print(f"{name:<32}{seconds * 1000:>12.1f}{results[name]:>12.1f} MP/s")
+    return results
+
+def bench_video(effect_names: list[str], frames: int) -> dict[str, float]:
+    """Times process_video on a short synthetic video, decoding and encoding included.
+
+    Args:
+        effect_names: The effects to time, each at the default strength.
+        frames: Number of frames in the video.
+
+    Returns:
+        The throughput in frames per second, keyed by 'video {effect}'.
+    """
+    results: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path: Path = Path(temp_dir) / "video.mp4"
+        write_synthetic_video(video_path, frames)
+        for effect_name in effect_names:
+            start: float = time.perf_counter()
+            process_video(video_path, effect_name, STRENGTHS[1], Path(temp_dir) / "output")
+            seconds: float = time.perf_counter() - start
+            name: str = f"video {effect_name}"
+            results[name] = frames / seconds
+            print(f"{name:<32}{seconds * 1000:>12.1f}{results[name]:>12.1f} fps")
+    return results
+
+def check_baseline(results: dict[str, float], baseline: dict[str, float], threshold: float) -> list[str]:
+    """Compares the results with a baseline.
+
+    Args:
+        results: The throughput of every benchmark.
+        baseline: The throughput of the benchmarks saved earlier on the same machine.
+        threshold: Largest accepted drop in throughput, as a fraction of the baseline.
+
+    Returns:
+        A message for every benchmark slower than the threshold allows. Benchmarks missing from
+        the baseline are not checked.
+    """
+    regressions: list[str] = []
+    for name, throughput in results.items():
+        expected: float = baseline.get(name, 0.0)
+        if throughput < expected * (1 - threshold):
+            regressions.append(f"{name}: {throughput:.1f} against a baseline of {expected:.1f} "
+                               f"({(1 - throughput / expected) * 100:.0f}% slower)")
+    return regressions
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse the arguments from the command line.
+
+    Returns:
+        The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the filters and overlays of the image manipulation program.")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="Number of runs per effect and resolution. Default is 3.")
+    parser.add_argument("--effects", type=lambda value: value.split(","), default=[*ARRAY_FILTERS, *OVERLAYS],
+                        help="Comma-separated effects to time. Default is every filter and overlay.")
+    parser.add_argument("--resolutions", type=lambda value: value.split(","), default=list(RESOLUTIONS),
+                        help=f"Comma-separated resolutions to time, from {', '.join(RESOLUTIONS)}. Default is all of them.")
+    parser.add_argument("--frames", type=int, default=48, help="Frames in the synthetic video, 0 skips it. Default is 48.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help=f"Baseline file. Default is {BASELINE_PATH}.")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the baseline, keeping benchmarks not run.")
+    parser.add_argument("--check", action="store_true", help="Exit with an error if a benchmark is slower than the baseline allows.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Largest accepted drop in throughput, as a fraction of the baseline. Default is {DEFAULT_THRESHOLD}.")
+    return parser.parse_args()
+
+def main() -> None:
+    """Times every effect, then saves the results as the baseline or checks them against it."""
+    args: argparse.Namespace = parse_arguments()
+    unknown: list[str] = [name for name in args.effects if name not in ARRAY_FILTERS and name not in OVERLAYS] + \
+                         [name for name in args.resolutions if name not in RESOLUTIONS]
+    if unknown:
+        print(f"Unknown effects or resolutions: {', '.join(unknown)}")
+        exit(1)
+
+    print(f"{'Benchmark':<32}{'Median (ms)':>12}{'Throughput':>12}")
+    results: dict[str, float] = bench_images(args.effects, args.resolutions, args.repeats)
+    if args.frames:
+        results.update(bench_video(args.effects, args.frames))
+
+    baseline: dict[str, float] = {}
+    if args.baseline.exists():
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump({**baseline, **results}, file, indent=1, sort_keys=True)
+        print(f"Saved the baseline to {args.baseline}")
+    elif args.check:
+        if not baseline:
+            print(f"No baseline at {args.baseline}, run with --save-baseline first.")
+            exit(1)
+        regressions: list[str] = check_baseline(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Regression in {regression}")
+        if regressions:
+            exit(1)
+        print(f"No benchmark is more than {args.threshold:.0%} slower than the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Benchmark for the blur filters of the image manipulation program.
+# Each filter is timed against the implementation it replaced on a synthetic nuScenes-sized frame.
+
+# To run the benchmark, run the following command from the root of the repository:
+#     python3 Benchmarks/bench_filters.py
+# or, with more repeats and a different frame size:
+#     python3 Benchmarks/bench_filters.py -r 20 --width 3200 --height 1800
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable
+
+import cv2
+import numpy as np
+from PIL import Image, ImageFilter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts', 'image_manipulation')))
+from filters import gaussian_blur_array, motion_blur_array
+
+STRENGTHS: tuple[float, ...] = (0.2, 0.5, 1.0, 3.0)
+
+
+def previous_gaussian_blur(image: np.ndarray, strength: float) -> np.ndarray:
+    """The Gaussian blur as applied through PIL before it moved to OpenCV."""
+    return np.array(Image.fromarray(image).filter(ImageFilter.GaussianBlur(radius=strength * 5)))
+
+def previous_motion_blur(image: np.ndarray, strength: float) -> np.ndarray:
+    """The motion blur as applied with a dense square kernel before it became a 1-D filter."""
+    kernel_size: int = int(strength * image.shape[1] / 20)
+    if kernel_size < 1:
+        return image
+    kernel: np.ndarray = np.zeros((kernel_size, kernel_size))
+    kernel[int((kernel_size - 1) / 2), :] = np.ones(kernel_size)
+    return cv2.filter2D(image, -1, kernel / kernel_size)
+
+BENCHMARKS: dict[str, tuple[Callable, Callable]] = {
+    "gaussian": (previous_gaussian_blur, gaussian_blur_array),
+    "motion": (previous_motion_blur, motion_blur_array),
+}
+
+
+def time_filter(filter_func: Callable, image: np.ndarray, strength: float, repeats: int) -> float:
+    """Applies a filter several times and measures the median time taken.
+
+    Args:
+        filter_func: The filter taking an image array and a strength.
+        image: The image array to filter.
+        strength: Strength of the filter.
+        repeats: Number of timed runs, after one warm-up run.
+
+    Returns:
+        The median time in milliseconds.
+    """
+    filter_func(image, strength)
+    timings: list[float] = []
+    for _ in range(repeats):
+        start: float = time.perf_counter()
+        filter_func(image, strength)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def synthetic_frame(width: int, height: int) -> np.ndarray:
+    """Creates a smooth random frame, so blurs behave as they would on a photograph.
+
+    Args:
+        width: Width of the frame in pixels.
+        height: Height of the frame in pixels.
+
+    Returns:
+        The frame as a uint8 array with three channels.
+    """
+    rng: np.random.Generator = np.random.default_rng(0)
+    coarse: np.ndarray = rng.integers(0, 256, (max(1, height // 50), max(1, width // 50), 3), dtype=np.uint8)
+    return cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse the arguments from the command line.
+
+    Returns:
+        The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the blur filters of the image manipulation program.")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="Number of runs per filter. Default is 5.")
+    parser.add_argument("--width", type=int, default=1600, help="Width of the frame. Default is 1600.")
+    parser.add_argument("--height", type=int, default=900, help="Height of the frame. Default is 900.")
+    return parser.parse_args()
+
+def main() -> None:
+    """Times every blur filter against its previous implementation and prints the speed-up."""
+    args: argparse.Namespace = parse_arguments()
+    image: np.ndarray = synthetic_frame(args.width, args.height)
+    print(f"{'Filter':<10}{'Strength':>10}{'Previous (ms)':>15}{'Current (ms)':>14}{'Speed-up':>10}{'Max diff':>10}")
+    for name, (previous_func, current_func) in BENCHMARKS.items():
+        for strength in STRENGTHS:
+            previous_ms: float = time_filter(previous_func, image, strength, args.repeats)
+            current_ms: float = time_filter(current_func, image, strength, args.repeats)
+            difference: int = int(np.abs(previous_func(image, strength).astype(int)
+                                         - current_func(image, strength).astype(int)).max())
+            print(f"{name:<10}{strength:>10.1f}{previous_ms:>15.1f}{current_ms:>14.1f}"
+                  f"{previous_ms / current_ms:>9.1f}x{difference:>10}")
+
+
+if __name__ == "__main__":
+    main()
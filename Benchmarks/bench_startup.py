@@ -0,0 +1,79 @@
+# Benchmark for the start-up time of the api CLI.
+# Each scenario imports the modules an action needs in a fresh interpreter, as the CLI would.
+
+# To run the benchmark, run the following command from the root of the repository:
+#     python3 Benchmarks/bench_startup.py
+# or, with more repeats:
+#     python3 Benchmarks/bench_startup.py -r 20
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR: str = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts', 'api'))
+
+# Libraries that should only be loaded by the actions that use them
+HEAVY_MODULES: tuple[str, ...] = (
+    "openai", "anthropic", "google.generativeai", "pandas", "cv2", "tkinter", "tqdm", "PIL", "pyarrow"
+)
+
+SCENARIOS: dict[str, list[str]] = {
+    "help (-h)": ["main"],
+    "list/check (-l, -ch)": ["main", "batch_operations"],
+    "process (-p)": ["main", "process"],
+    "process (-p) with provider SDKs": ["main", "process", "openai", "anthropic", "google.generativeai"],
+}
+
+CHILD_SCRIPT: str = """
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_scenario(modules: list[str]) -> tuple[float, list[str]]:
+    """Imports the modules in a fresh interpreter and measures the time taken.
+
+    Args:
+        modules: The modules imported by the scenario, in order.
+
+    Returns:
+        The import time in seconds and the heavy modules that ended up loaded.
+    """
+    script: str = CHILD_SCRIPT.format(modules=modules, heavy=HEAVY_MODULES)
+    output: str = subprocess.run([sys.executable, "-c", script], cwd=API_DIR, capture_output=True,
+                                 text=True, check=True).stdout
+    result: dict = json.loads(output.strip().splitlines()[-1])
+    return result["seconds"], result["loaded"]
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse the arguments from the command line.
+
+    Returns:
+        The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the start-up time of the api CLI.")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="Number of runs per scenario. Default is 5.")
+    return parser.parse_args()
+
+def main() -> None:
+    """Times every scenario and prints the median start-up time and the libraries it loaded."""
+    args: argparse.Namespace = parse_arguments()
+    print(f"{'Scenario':<34}{'Median (ms)':>12}{'Min (ms)':>10}  Loaded")
+    for name, modules in SCENARIOS.items():
+        timings: list[float] = []
+        loaded: list[str] = []
+        for _ in range(args.repeats):
+            seconds, loaded = time_scenario(modules)
+            timings.append(seconds * 1000)
+        print(f"{name:<34}{statistics.median(timings):>12.1f}{min(timings):>10.1f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
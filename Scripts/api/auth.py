@@ -1,11 +1,37 @@
 import sys
-from openai import OpenAI
-from anthropic import Anthropic
-import google.generativeai as genai
+import importlib
 from pathlib import Path
 import common
 from common import verbose_print
 
+# Provider SDKs take seconds to import, so each is only imported when its model is authenticated
+LAZY_IMPORTS: dict[str, tuple[str, str]] = {
+    "OpenAI": ("openai", "OpenAI"),
+    "Anthropic": ("anthropic", "Anthropic"),
+    "genai": ("google.generativeai", None),
+}
+
+def __getattr__(name: str) -> object:
+    """Imports a provider SDK the first time it is looked up on this module."""
+    if name not in LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = LAZY_IMPORTS[name]
+    module = importlib.import_module(module_name)
+    value = getattr(module, attribute) if attribute else module
+    globals()[name] = value
+    return value
+
+def provider(name: str) -> object:
+    """Returns a provider SDK class or module, importing it on first use.
+
+    Args:
+        name: The name in LAZY_IMPORTS.
+
+    Returns:
+        The imported class or module.
+    """
+    return getattr(sys.modules[__name__], name)
+
 def authenticate(model_name: str) -> object:
     """Authenticates with the appropriate service based on the path to the API key.
 
@@ -30,11 +56,11 @@ def authenticate(model_name: str) -> object:
     try:
         match model_name:
             case "chatgpt":
-                common.chatgpt_client = OpenAI(api_key=api_key)
+                common.chatgpt_client = provider("OpenAI")(api_key=api_key)
             case "claude":
-                common.claude_client = Anthropic(api_key=api_key)
+                common.claude_client = provider("Anthropic")(api_key=api_key)
             case "gemini":
-                genai.configure(api_key=api_key)
+                provider("genai").configure(api_key=api_key)
             case _:
                 print(f"Unrecognized auth path: {file_path}. Please include 'chatgpt' or 'claude' in the file name.")
                 sys.exit(1)
@@ -2,7 +2,8 @@ import common
 from common import verbose_print
 from pathlib import Path
 from utils import get_file_dict, encode_image, encode_video
-from process import generate_csv_output
+from process import generate_csv_output, write_sink_output
+from store import begin_run, save_results
 import time
 import json
 import os
@@ -10,7 +11,7 @@ import sys
 import openai
 from openai import OpenAI
 import re
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 
 
 
@@ -124,8 +125,12 @@ def export_batch(batch_id: str) -> None:
 
     response_bytes: bytes = common.chatgpt_client.files.content(output_file_id).read()
     response_dicts: list[dict[str, str]] = bytes_to_dicts(response_bytes)
+    save_results(batch_id, response_dicts)
 
-    exportResult = generate_csv_output('chatgpt', response_dicts)
+    if common.output_format == "csv":
+        exportResult = generate_csv_output('chatgpt', response_dicts)
+    else:
+        exportResult = write_sink_output(response_dicts)
     
     
     
@@ -197,11 +202,13 @@ def batch_process_chatgpt(dir_path: Path) -> str:
 
     
     file_name: str = dir_path.stem
-    out_path: Path = Path("../../Batch_Files") / f"{file_name}.jsonl"
+    out_path: Path = common.BATCH_FILES_DIR / f"{common.BATCH_FILE_PREFIX}{file_name}.jsonl"
     out_path.parent.mkdir(parents=True, exist_ok=True)
     generate_batch_file(file_dict, out_path)
     verbose_print(f"Batch file saved to {out_path}")
-    return upload_batch_file(out_path)
+    batch_id: str = upload_batch_file(out_path)
+    begin_run("batch", "chatgpt", dir_path, batch_id)
+    return batch_id
 
 def generate_batch_file(file_dict: dict[str, Path], out_path: Path) -> None:
     """Generates a batch file from a dictionary of files.
@@ -402,4 +409,135 @@ def delete_exported_files(client: OpenAI, batch_results) -> None:
                 verbose_print(f"File already deleted")
                 
     except Exception as e:
-        verbose_print(f"Error deleting files. Bad batch input: {e}") 
+        verbose_print(f"Error deleting files. Bad batch input: {e}")
+
+
+def cleanup_batch_files(max_age_days: float = common.MAX_BATCH_FILE_AGE_DAYS,
+                        max_local_mb: float = common.MAX_BATCH_FILES_MB, dry_run: bool = False) -> None:
+    """Deletes orphaned batch files from provider storage and prunes local batch files.
+
+    Args:
+        max_age_days: Orphaned provider files and local batch files older than this many days are deleted.
+        max_local_mb: The oldest local batch files are deleted until they use at most this many MB.
+        dry_run: Only print the files that would be deleted.
+    """
+    orphans: list = find_orphaned_files(common.chatgpt_client, max_age_days)
+    print(f"Found {len(orphans)} orphaned batch files in provider storage.")
+    for file in orphans:
+        verbose_print(f"    {file.id}\t{file.filename}\t{file.bytes} bytes")
+    if orphans and not dry_run:
+        deleted: int = delete_files(common.chatgpt_client, [file.id for file in orphans])
+        print(f"Deleted {deleted} of {len(orphans)} orphaned batch files.")
+
+    pruned: list[Path] = prune_local_batch_files(common.BATCH_FILES_DIR, max_age_days, max_local_mb, dry_run)
+    print(f"{'Would prune' if dry_run else 'Pruned'} {len(pruned)} local batch files from {common.BATCH_FILES_DIR}.")
+
+def list_provider_files(client: OpenAI, purpose: str) -> list:
+    """Lists all files with the given purpose in provider storage, following pagination.
+
+    Args:
+        client: Authenticated OpenAI client.
+        purpose: The purpose of the files, such as 'batch'.
+
+    Returns:
+        The file objects.
+    """
+    files: list = []
+    query: dict = {"limit": common.FILES_PAGE_SIZE}
+    while True:
+        try:
+            page = client.files.list(purpose=purpose, extra_query=query)
+        except openai.AuthenticationError as e:
+            raise PermissionError(f"Listing files failed: {e.response} {e.code}\n{e.body}") from None
+        files.extend(page.data)
+        if not page.data or not getattr(page, "has_more", False):
+            return files
+        query["after"] = page.data[-1].id
+
+def find_orphaned_files(client: OpenAI, max_age_days: float = common.MAX_BATCH_FILE_AGE_DAYS) -> list:
+    """Finds batch files of this tool in provider storage that will never be exported.
+
+    A file is orphaned if no batch references it, or if the only batches referencing it have
+    failed, expired or been cancelled. Files of running and completed batches are kept so they
+    can still be exported. Other tools and users may share the account, so only input files
+    named with common.BATCH_FILE_PREFIX and the output and error files of their batches are
+    considered. Files newer than max_age_days are kept, so the input of a batch still being
+    created by another run is not deleted before its batch references it.
+
+    Args:
+        client: Authenticated OpenAI client.
+        max_age_days: Only files created more than this many days ago are orphaned.
+
+    Returns:
+        The orphaned file objects.
+    """
+    keep: set[str] = set()
+    outputs_by_input: dict[str, list[str]] = {}  # Output and error files of each batch, by its input file
+    for batch in client.batches.list(limit=100):  # Iterating follows every page of batches
+        if batch.status not in common.FAILED_STATUS:
+            keep.update(file_id for file_id in (batch.input_file_id, batch.output_file_id, batch.error_file_id) if file_id)
+        outputs_by_input.setdefault(batch.input_file_id, []).extend(
+            file_id for file_id in (batch.output_file_id, batch.error_file_id) if file_id)
+
+    files: list = []
+    for purpose in common.BATCH_FILE_PURPOSES:
+        files.extend(list_provider_files(client, purpose))
+    owned: set[str] = {file.id for file in files if file.filename.startswith(common.BATCH_FILE_PREFIX)}
+    owned.update(file_id for input_id in list(owned) for file_id in outputs_by_input.get(input_id, []))
+    cutoff: float = time.time() - max_age_days * 24 * 60 * 60
+    return [file for file in files if file.id in owned and file.id not in keep and file.created_at < cutoff]
+
+def delete_files(client: OpenAI, file_ids: list[str]) -> int:
+    """Deletes files from provider storage concurrently.
+
+    Args:
+        client: Authenticated OpenAI client.
+        file_ids: The IDs of the files to delete.
+
+    Returns:
+        The number of files deleted.
+    """
+    def delete_file(file_id: str) -> bool:
+        try:
+            client.files.delete(file_id)
+            verbose_print(f"Deleted file {file_id}")
+            return True
+        except Exception as e:
+            verbose_print(f"Could not delete file {file_id}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=common.MAX_THREAD_WORKERS) as executor:
+        return sum(executor.map(delete_file, file_ids))
+
+def prune_local_batch_files(batch_dir: Path, max_age_days: float, max_local_mb: float, dry_run: bool = False) -> list[Path]:
+    """Deletes local batch files older than a maximum age, then the oldest files until under a size limit.
+
+    Args:
+        batch_dir: The directory containing the local .jsonl batch files.
+        max_age_days: Files older than this many days are deleted.
+        max_local_mb: The oldest remaining files are deleted until the directory uses at most this many MB.
+        dry_run: Only return the files that would be deleted.
+
+    Returns:
+        The files that were (or would be) deleted.
+    """
+    if not batch_dir.is_dir():
+        return []
+    # Oldest files first, as (path, modified time, size)
+    batch_files: list[tuple[Path, float, int]] = sorted(
+        ((path, path.stat().st_mtime, path.stat().st_size) for path in batch_dir.glob("*.jsonl")),
+        key=lambda entry: entry[1])
+
+    cutoff: float = time.time() - max_age_days * 24 * 60 * 60
+    total_size: int = sum(size for _, _, size in batch_files)
+    size_limit: float = max_local_mb * 1024 * 1024
+    pruned: list[Path] = []
+    for path, modified, size in batch_files:
+        if modified >= cutoff and total_size <= size_limit:
+            break
+        verbose_print(f"Pruning local batch file {path}")
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        pruned.append(path)
+        total_size -= size
+    return pruned
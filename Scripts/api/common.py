@@ -1,17 +1,26 @@
 import json
 import os
-from openai import OpenAI
-from typing import Tuple
-from anthropic import Anthropic
+import sys
+from typing import Tuple, TYPE_CHECKING
 from pydantic import BaseModel, create_model
 from pathlib import Path
 
+if TYPE_CHECKING:  # Provider SDKs are only imported by auth.py when a model is used
+    from openai import OpenAI
+    from anthropic import Anthropic
+
 # Global Variables
-chatgpt_client: OpenAI = None
-claude_client: Anthropic = None
+chatgpt_client: "OpenAI" = None
+claude_client: "Anthropic" = None
 verbose: bool = False
 custom_str: str = None
+output_format: str = "csv"
+store_results: bool = True
+frame_cache_dir: Path = None  # Where decoded video frames are cached, None decodes videos every time
 default_txt_path = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'custom.txt'))
+RESULTS_DB_PATH: Path = Path(__file__).resolve().parents[2] / "Results" / "results.db"
+BATCH_FILES_DIR: Path = Path(__file__).resolve().parents[2] / "Batch_Files"
+IMAGE_MANIPULATION_DIR: Path = Path(__file__).resolve().parents[1] / "image_manipulation"
 
 # Response Format
 # class AnalysisResponse(BaseModel):
@@ -33,6 +42,13 @@ WAITING_TIMER: int = 15  # Waiting timer in seconds
 
 PROCESS_STATUS : list = ["in_progress", "finalizing", "validating"]
 
+FAILED_STATUS: list = ["failed", "expired", "cancelling", "cancelled"]  # Batches whose files will never be exported
+BATCH_FILE_PURPOSES: list = ["batch", "batch_output"]
+BATCH_FILE_PREFIX: str = "road_safety_"  # Starts the name of every uploaded batch file, so cleanup only deletes files of this tool
+FILES_PAGE_SIZE: int = 10000  # Files listed per page when looking for orphaned batch files
+MAX_BATCH_FILE_AGE_DAYS: int = 7
+MAX_BATCH_FILES_MB: int = 500
+
 VALID_EXTENSIONS: Tuple[str, ...] = (
     '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif',
     '.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.mpeg', '.x-flv', 
@@ -46,7 +62,14 @@ VIDEO_EXTENSIONS: Tuple[str, ...] = (
 
 
 LLMS: list[str] = ["chatgpt", "gemini", "claude", "all"]
+OUTPUT_FORMATS: list[str] = ["csv", "parquet"]
+PARQUET_BATCH_ROWS: int = 1000  # Rows buffered before a record batch is written
 MAX_THREAD_WORKERS: int = 10
+MAX_INFLIGHT_REQUESTS: int = 2 * MAX_THREAD_WORKERS
+MAX_INFLIGHT_BYTES: int = 512 * 1024 * 1024  # Budget for base64 payloads held by running requests
+JPEG_COMPRESSION_ESTIMATE: int = 10  # Rough raw-to-JPEG size ratio used to estimate video payloads
+PERTURB_JPEG_QUALITY: int = 95  # JPEG quality of perturbed images, the OpenCV default used for video frames
+PERTURB_DEFAULT_STRENGTHS: str = "0.5"  # Strengths applied by --perturb when none are given
 MAX_OUTPUT_TOKENS_CLAUDE: int = 4096
 MAX_OUTPUT_TOKENS_GEMINI: int = 400
 
@@ -105,6 +128,12 @@ ARG_INFO = [
         "metavar": "FILE_PATH",
         "help": "Process the input file or directory with batch processing."
     },
+    {
+        "group": "exclusive",
+        "flags": ["-pt", "--perturb"],
+        "metavar": "FILE_PATH",
+        "help": "Apply the --effects to the input file or directory in memory and process the perturbed images."
+    },
     {
         "group": "exclusive",
         "flags": ["-l", "--list"],
@@ -123,6 +152,12 @@ ARG_INFO = [
         "metavar": "BATCH_ID",
         "help": "Export the results of a batch."
     },
+    {
+        "group": "exclusive",
+        "flags": ["-cl", "--cleanup"],
+        "action": "store_true",
+        "help": "Delete orphaned batch files from provider storage and prune old local batch files."
+    },
     # General arguments (verbose is first)
     {
         "flags": ["-v", "--verbose"],
@@ -139,6 +174,71 @@ ARG_INFO = [
         "action": "store_true",
         "help": "Fully automated processing mode, from input to export of batch processing."
     },  
+    {
+        "flags": ["--effects"],
+        "metavar": "EFFECTS",
+        "help": "With --perturb, comma-separated effects or effect chains to apply, e.g. rain,darkness,fog+motion@0.3."
+    },
+    {
+        "flags": ["--strengths"],
+        "metavar": "STRENGTHS",
+        "default": PERTURB_DEFAULT_STRENGTHS,
+        "help": f"With --perturb, strengths to apply the effects at, as start:stop:step or a comma-separated list. Default is {PERTURB_DEFAULT_STRENGTHS}."
+    },
+    {
+        "flags": ["--watch"],
+        "action": "store_true",
+        "help": "With --process or --perturb, keep running and process files added to or changed in the directory as they arrive. "
+                "Results are written to the output file after each batch, or to a new Parquet file per batch."
+    },
+    {
+        "flags": ["--max-inflight"],
+        "metavar": "REQUESTS",
+        "type": int,
+        "help": f"Maximum number of requests in flight during parallel processing. Default is {MAX_INFLIGHT_REQUESTS}."
+    },
+    {
+        "flags": ["--max-inflight-mb"],
+        "metavar": "MEGABYTES",
+        "type": int,
+        "help": f"Maximum size in MB of encoded payloads in flight during parallel processing. Default is {MAX_INFLIGHT_BYTES // (1024 * 1024)}."
+    },
+    {
+        "flags": ["--output-format"],
+        "choices": OUTPUT_FORMATS,
+        "default": "csv",
+        "help": "Format of the results file. Parquet output is written as results come in and requires pyarrow. Default is csv."
+    },
+    {
+        "flags": ["--max-age-days"],
+        "metavar": "DAYS",
+        "type": float,
+        "default": MAX_BATCH_FILE_AGE_DAYS,
+        "help": f"With --cleanup, delete orphaned provider batch files and local batch files older than this many days. Default is {MAX_BATCH_FILE_AGE_DAYS}."
+    },
+    {
+        "flags": ["--max-local-mb"],
+        "metavar": "MEGABYTES",
+        "type": float,
+        "default": MAX_BATCH_FILES_MB,
+        "help": f"With --cleanup, delete the oldest local batch files until they use at most this many MB. Default is {MAX_BATCH_FILES_MB}."
+    },
+    {
+        "flags": ["--dry-run"],
+        "action": "store_true",
+        "help": "With --cleanup, only list the files that would be deleted."
+    },
+    {
+        "flags": ["--frame-cache"],
+        "metavar": "DIR",
+        "help": "Directory to cache decoded video frames in, shared with the image manipulation program, "
+                "so later runs on the same videos skip decoding."
+    },
+    {
+        "flags": ["--no-store"],
+        "action": "store_true",
+        "help": "Do not record the results in the local results store (Results/results.db)."
+    },
     {
         "flags": ["-c", "--custom"],
         "metavar": "TXT_PATH",
@@ -169,6 +269,40 @@ def set_prompt(prompt: str) -> None:
     PROMPT = prompt
     verbose_print(f"Custom Prompt: {prompt}")
 
+def set_output_format(value: str) -> None:
+    global output_format
+    if value not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {value}")
+    output_format = value
+    verbose_print(f"Output format: {value}")
+
+def set_store_results(value: bool) -> None:
+    global store_results
+    store_results = value
+    verbose_print(f"Store results: {value}")
+
+def set_frame_cache(value: str) -> None:
+    global frame_cache_dir
+    frame_cache_dir = Path(value) if value else None
+    verbose_print(f"Frame cache: {frame_cache_dir}")
+
+def set_inflight_limits(max_requests: int = None, max_megabytes: int = None) -> None:
+    global MAX_INFLIGHT_REQUESTS, MAX_INFLIGHT_BYTES
+    if max_requests is not None:
+        if max_requests < 1:
+            raise ValueError("The in-flight request limit must be at least 1")
+        MAX_INFLIGHT_REQUESTS = max_requests
+    if max_megabytes is not None:
+        if max_megabytes < 1:
+            raise ValueError("The in-flight payload budget must be at least 1MB")
+        MAX_INFLIGHT_BYTES = max_megabytes * 1024 * 1024
+    verbose_print(f"In-flight limits: {MAX_INFLIGHT_REQUESTS} requests, {MAX_INFLIGHT_BYTES} bytes")
+
+def use_image_manipulation() -> None:
+    """Makes the effects and watcher of the image manipulation program importable, as it is not an installed package."""
+    if str(IMAGE_MANIPULATION_DIR) not in sys.path:
+        sys.path.append(str(IMAGE_MANIPULATION_DIR))
+
 def verbose_print(*args, **kwargs) -> None:
     if verbose:
         print(*args, **kwargs)
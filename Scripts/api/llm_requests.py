@@ -3,9 +3,7 @@ from copy import deepcopy
 import common
 from common import verbose_print
 from utils import get_media_type, encode_image, encode_video
-from PIL import Image
 import re
-import google.generativeai as genai
 import time
 import json
 
@@ -23,9 +21,20 @@ def chatgpt_request(file_path: Path) -> dict[str, str]:
     else:
         encoded_file: list[str] = [encode_image(file_path)]
 
+    return chatgpt_encoded_request(encoded_file, file_path.name)
+
+def chatgpt_encoded_request(encoded_images: list[str], file_name: str) -> dict[str, str]:
+    """Request for already encoded JPEG images to the ChatGPT API.
+
+    Args:
+        encoded_images: The base64 encoded JPEG images, such as the frames of a video.
+        file_name: The file name recorded with the response.
+
+    Returns:
+        The analysis response as a dictionary."""
     message: str = deepcopy(common.USER_PROMPT)
 
-    for image in encoded_file:
+    for image in encoded_images:
         message["content"].append({
             "type": "image_url",
             "image_url": {
@@ -44,7 +53,7 @@ def chatgpt_request(file_path: Path) -> dict[str, str]:
     full_response: dict = response.dict()
     response_dict: dict = full_response['choices'][0]['message']['parsed']
     response_dict["model"] = "gpt-4o-mini"
-    response_dict["file_name"] = file_path.name
+    response_dict["file_name"] = file_name
     return response_dict
 
 
@@ -56,6 +65,8 @@ def gemini_request(file_path: Path) -> dict[str, str]:
     
     Returns:
         The analysis response as a dictionary."""
+    import google.generativeai as genai  # Imported on first use as it is slow to load
+    from PIL import Image
     is_video: bool = file_path.suffix in common.VIDEO_EXTENSIONS
     if is_video:
         file = genai.upload_file(path=file_path)
@@ -66,7 +77,18 @@ def gemini_request(file_path: Path) -> dict[str, str]:
         verbose_print(f'Video processing complete: {file.uri}')
     else:
         file = Image.open(file_path)
+    return gemini_content_request([file], file_path.name)
+
+def gemini_content_request(contents: list, file_name: str) -> dict[str, str]:
+    """Request for already loaded content to the gemini API.
+
+    Args:
+        contents: The uploaded files, images or {"mime_type", "data"} parts sent with the prompt.
+        file_name: The file name recorded with the response.
 
+    Returns:
+        The analysis response as a dictionary."""
+    import google.generativeai as genai  # Imported on first use as it is slow to load
     model = genai.GenerativeModel(model_name="gemini-1.5-pro")
     safe = [
         {
@@ -80,7 +102,7 @@ def gemini_request(file_path: Path) -> dict[str, str]:
     ]
 
     response: str = model.generate_content(
-        [file, common.prompt],
+        [*contents, common.prompt],
         generation_config=genai.GenerationConfig(
             response_mime_type="application/json",
             temperature=0.3,
@@ -90,7 +112,7 @@ def gemini_request(file_path: Path) -> dict[str, str]:
             safety_settings=safe
             )
     response_dict: dict = response_to_dictionary(response.text, "gemini-1.5-pro")
-    response_dict["file_name"] = file_path.name
+    response_dict["file_name"] = file_name
     return response_dict
 
 def claude_request(file_path: Path) -> dict[str, str]:
@@ -108,8 +130,20 @@ def claude_request(file_path: Path) -> dict[str, str]:
     else:
         media_type: str = get_media_type(file_path)
         encoded_file: str = [encode_image(file_path)]
+    return claude_encoded_request(encoded_file, media_type, file_path.name)
+
+def claude_encoded_request(encoded_images: list[str], media_type: str, file_name: str) -> dict[str, str]:
+    """Request for already encoded images to the Claude API.
+
+    Args:
+        encoded_images: The base64 encoded images, such as the frames of a video.
+        media_type: The media type of the images.
+        file_name: The file name recorded with the response.
+
+    Returns:
+        The analysis response as a dictionary."""
     message: str = deepcopy(common.USER_PROMPT)
-    for image in encoded_file:
+    for image in encoded_images:
         message["content"].append({
             "type": "image",
             "source": {
@@ -126,7 +160,7 @@ def claude_request(file_path: Path) -> dict[str, str]:
     )
     full_response: dict = response.dict()
     response_dict: dict = response_to_dictionary(full_response['content'][0]['text'], "models/claude-3-opus-20240229")
-    response_dict["file_name"] = file_path.name
+    response_dict["file_name"] = file_name
     return response_dict
 
 def response_to_dictionary(response: str, model_name: str) -> dict[str, str]:
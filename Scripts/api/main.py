@@ -1,19 +1,30 @@
 import argparse
+import importlib
 import common
-from common import set_verbose, set_custom, verbose_print, set_prompt
+from common import set_verbose, set_custom, verbose_print, set_prompt, set_inflight_limits, set_output_format, set_store_results, set_frame_cache
 from auth import authenticate
-from process import process_model
-from batch_operations import print_check_batch, export_batch, list_batches, process_batch
 import sys
 sys.tracebacklimit = 0 # Disable traceback for non-verbose mode
 
 
+def run_action(module_name: str, function_name: str, *args) -> None:
+    """Imports the module of an action only when it runs, so other actions' libraries are never loaded.
+
+    Args:
+        module_name: The module containing the action function.
+        function_name: The name of the action function.
+        args: The arguments passed to the action function.
+    """
+    getattr(importlib.import_module(module_name), function_name)(*args)
+
 ACTIONS: dict[str, callable] = {
-    "process": lambda args: process_model(args.llm_model, args.process),
-    "check": lambda args: print_check_batch(args.check),
-    "export": lambda args: export_batch(args.export),
-    "list": lambda args: list_batches(),
-    "batch": lambda args: process_batch(args.batch, args.auto),
+    "process": lambda args: run_action("process", "watch_model" if args.watch else "process_model", args.llm_model, args.process),
+    "perturb": lambda args: run_action("perturb", "perturb_model", args.llm_model, args.perturb, args.effects, args.strengths, args.watch),
+    "check": lambda args: run_action("batch_operations", "print_check_batch", args.check),
+    "export": lambda args: run_action("batch_operations", "export_batch", args.export),
+    "list": lambda args: run_action("batch_operations", "list_batches"),
+    "batch": lambda args: run_action("batch_operations", "process_batch", args.batch, args.auto),
+    "cleanup": lambda args: run_action("batch_operations", "cleanup_batch_files", args.max_age_days, args.max_local_mb, args.dry_run),
 }
 
 def parse_arguments() -> argparse.Namespace:
@@ -51,8 +62,8 @@ def parse_arguments() -> argparse.Namespace:
 def main():
     """Main function that redirects to relevent functions based on the arguments."""
     args: argparse.Namespace = parse_arguments()
-    if args.llm_model != "chatgpt" and any  ([args.batch, args.auto, args.check, args.export]): # only chatgpt model is supported for batch operations
-        print("Only chatgpt model is supported for batch processing commands (-b, -l, -e, -ch). see python3 main.py -h for more help.\nTerminating....")
+    if args.llm_model != "chatgpt" and any  ([args.batch, args.auto, args.check, args.export, args.cleanup]): # only chatgpt model is supported for batch operations
+        print("Only chatgpt model is supported for batch processing commands (-b, -l, -e, -ch, -cl). see python3 main.py -h for more help.\nTerminating....")
         sys.exit(1)
     
     if args.verbose:
@@ -65,6 +76,10 @@ def main():
 
     set_prompt(args.prompt)
     set_custom(args.custom)
+    set_inflight_limits(args.max_inflight, args.max_inflight_mb)
+    set_output_format(args.output_format)
+    set_store_results(not args.no_store)
+    set_frame_cache(args.frame_cache)
     
     # Execute corresponding action from the ACTIONS dictionary
     for arg in vars(args):
@@ -0,0 +1,245 @@
+import common
+from common import verbose_print
+import sys
+import base64
+from io import BytesIO
+from pathlib import Path
+from llm_requests import chatgpt_encoded_request, gemini_content_request, claude_encoded_request
+from utils import get_file_dict
+from process import collect_completed, generate_csv_output, stream_sink_output, watch_model
+from store import begin_run, save_results
+from typing import Callable, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, Future
+
+common.use_image_manipulation()
+
+
+def encode_frames(frames: list[bytes]) -> list[str]:
+    """Encodes JPEG images held in memory into base64 strings.
+
+    Args:
+        frames: The JPEG images.
+
+    Returns:
+        The base64 encoded images."""
+    return [base64.b64encode(frame).decode('utf-8') for frame in frames]
+
+def chatgpt_frames_request(frames: list[bytes], file_name: str) -> dict[str, str]:
+    """Request for JPEG images held in memory to the ChatGPT API.
+
+    Args:
+        frames: The JPEG images of a single file.
+        file_name: The file name recorded with the response.
+
+    Returns:
+        The analysis response as a dictionary."""
+    return chatgpt_encoded_request(encode_frames(frames), file_name)
+
+def gemini_frames_request(frames: list[bytes], file_name: str) -> dict[str, str]:
+    """Request for JPEG images held in memory to the gemini API.
+
+    Args:
+        frames: The JPEG images of a single file.
+        file_name: The file name recorded with the response.
+
+    Returns:
+        The analysis response as a dictionary."""
+    return gemini_content_request([{"mime_type": "image/jpeg", "data": frame} for frame in frames], file_name)
+
+def claude_frames_request(frames: list[bytes], file_name: str) -> dict[str, str]:
+    """Request for JPEG images held in memory to the Claude API.
+
+    Args:
+        frames: The JPEG images of a single file.
+        file_name: The file name recorded with the response.
+
+    Returns:
+        The analysis response as a dictionary."""
+    return claude_encoded_request(encode_frames(frames), "image/jpeg", file_name)
+
+FRAME_REQUEST_FUNCTIONS: dict[str, Callable] = {
+    "chatgpt": chatgpt_frames_request,
+    "gemini": gemini_frames_request,
+    "claude": claude_frames_request
+}
+
+def perturbed_frames(file_path: Path, variants: list[tuple[str, str, float]]) -> list[list[bytes]]:
+    """Applies every effect variant to a file in memory and encodes the results as JPEG images.
+
+    Images go through the same filters and overlays as the image manipulation program. Videos
+    are sampled like encode_video, one frame per second, and only the sampled frames are perturbed.
+
+    Args:
+        file_path: The path to the image or video file.
+        variants: The (name, effect, strength) variants to apply.
+
+    Returns:
+        The JPEG images of each variant, in the order of the variants.
+    """
+    import cv2  # Imported on first use as it is slow to load
+    from effects import apply_image_effect, variants_effect
+    from frame_cache import FrameSource
+
+    if file_path.suffix not in common.VIDEO_EXTENSIONS:
+        from PIL import Image
+        image = Image.open(file_path)
+        image.load()  # Decode once for every variant
+        payloads: list[list[bytes]] = []
+        for _, effect_name, strength in variants:
+            buffer = BytesIO()
+            apply_image_effect(image, effect_name, strength).convert("RGB").save(buffer, "JPEG", quality=common.PERTURB_JPEG_QUALITY)
+            payloads.append([buffer.getvalue()])
+        return payloads
+
+    apply_variants: Callable = variants_effect(variants)
+    payloads = [[] for _ in variants]
+    source = FrameSource(file_path, sampled=True, cache_dir=common.frame_cache_dir)
+    try:
+        frame = source.read()
+        while frame is not None:
+            for payload, result in zip(payloads, apply_variants(frame)):
+                success, buffer = cv2.imencode('.jpg', result, [cv2.IMWRITE_JPEG_QUALITY, common.PERTURB_JPEG_QUALITY])
+                if success:
+                    payload.append(buffer.tobytes())
+            frame = source.read()
+    finally:
+        source.close()
+    return payloads
+
+def perturbed_request(model_name: str, frames: list[bytes], file_name: str, effect_name: str, strength: Optional[float]) -> dict[str, Any]:
+    """Sends the perturbed images of a file to a model and records the perturbation with the response.
+
+    Args:
+        model_name: The name of the model to send the images to.
+        frames: The JPEG images of the perturbed file.
+        file_name: The name of the original file.
+        effect_name: The effect or effect chain that was applied.
+        strength: The strength it was applied at, or None if the strength does not change it.
+
+    Returns:
+        The analysis response as a dictionary, with the effect and strength added.
+    """
+    response_dict: dict[str, Any] = FRAME_REQUEST_FUNCTIONS[model_name](frames, file_name)
+    response_dict["effect"] = effect_name
+    response_dict["strength"] = "" if strength is None else strength
+    return response_dict
+
+def perturb_process(file_path: Path, variants: list[tuple[str, str, float]], model_names: list[str],
+                    on_result: Optional[Callable] = None) -> list[dict[str, Any]]:
+    """Perturbs every file in memory and sends each variant to each model in parallel.
+
+    Files are perturbed one at a time as the requests of the previous ones are submitted, with
+    requests bounded by common.MAX_INFLIGHT_REQUESTS and common.MAX_INFLIGHT_BYTES like parallel_process.
+    Nothing is written to disk.
+
+    Args:
+        file_path: The path to the file or directory to perturb.
+        variants: The (name, effect, strength) variants to apply.
+        model_names: The models to send every variant to.
+        on_result: Optional callable that receives each result as it comes in instead of it being collected.
+
+    Returns:
+        A list of dictionaries containing results for each file, variant and model. Empty when on_result is given.
+    """
+    file_dict: dict[str, Path] = get_file_dict(file_path)
+    if not file_dict:
+        raise ValueError("No valid files found in the directory.")
+    return perturb_files(file_dict, variants, model_names, on_result)
+
+def perturb_files(file_dict: dict[str, Path], variants: list[tuple[str, str, float]], model_names: list[str],
+                  on_result: Optional[Callable] = None) -> list[dict[str, Any]]:
+    """Perturbs the given files in memory and sends each variant to each model, with the same limits as perturb_process.
+
+    Args:
+        file_dict: The files to perturb, keyed by the label used in the results.
+        variants: The (name, effect, strength) variants to apply.
+        model_names: The models to send every variant to.
+        on_result: Optional callable that receives each result as it comes in instead of it being collected.
+
+    Returns:
+        A list of dictionaries containing results for each file, variant and model. Empty when on_result is given.
+    """
+    from tqdm import tqdm
+    from effects import uses_strength
+    request_output: list = []
+
+    collect: Callable = on_result or request_output.append
+    pending: dict[Future, tuple[str, int]] = {}
+    inflight_bytes: int = 0
+    with ThreadPoolExecutor(max_workers=common.MAX_THREAD_WORKERS) as executor, \
+            tqdm(total=len(file_dict) * len(variants) * len(model_names), desc="Processing items") as progress:
+        for label, file in file_dict.items():
+            try:
+                payloads: list[list[bytes]] = perturbed_frames(file, variants)
+            except Exception as e:
+                print(f'{label} could not be perturbed: {e}')
+                progress.update(len(variants) * len(model_names))
+                continue
+
+            for (variant_name, effect_name, strength), frames in zip(variants, payloads):
+                payload_size: int = sum((len(frame) + 2) // 3 * 4 for frame in frames)
+                for model_name in model_names:
+                    # Wait for running requests to finish while either limit would be exceeded
+                    while pending and (len(pending) >= common.MAX_INFLIGHT_REQUESTS or
+                                       inflight_bytes + payload_size > common.MAX_INFLIGHT_BYTES):
+                        inflight_bytes -= collect_completed(pending, collect, progress)
+                    future: Future = executor.submit(perturbed_request, model_name, frames, label, effect_name,
+                                                     strength if uses_strength(effect_name) else None)
+                    pending[future] = (f"{label} ({variant_name}, {model_name})", payload_size)
+                    inflight_bytes += payload_size
+
+        while pending:
+            inflight_bytes -= collect_completed(pending, collect, progress)
+
+    return request_output
+
+def perturb_model(model_name: str, file_path_str: str, effects_str: Optional[str], strengths_str: str, watch: bool = False) -> None:
+    """Perturbs a file or directory in memory, processes the results with a model and generates the output.
+
+    Args:
+        model_name: The name of the model to process.
+        file_path_str: The path to the file or directory to perturb.
+        effects_str: Comma-separated effects or effect chains to apply.
+        strengths_str: The strengths to apply them at, as start:stop:step or a comma-separated list.
+        watch: Whether to keep running and perturb new or changed files in the directory as they arrive.
+    """
+    from effects import parse_chain, parse_strengths, effect_variants
+    verbose_print(f"Perturbing for model: {model_name}")
+    verbose_print(f"Prompt Used: {common.prompt}")
+    if model_name not in common.LLMS:
+        print("Invalid model name")
+        sys.exit(1)
+    if not effects_str:
+        print("Please provide the effects to apply with --effects.")
+        sys.exit(1)
+
+    effect_names: list[str] = [effect_name for effect_name in effects_str.split(",") if effect_name]
+    try:
+        strengths: list[float] = parse_strengths(strengths_str)
+        if not strengths:
+            raise ValueError(f"No strengths in '{strengths_str}'.")
+        for effect_name in effect_names:
+            parse_chain(effect_name, strengths[0])
+    except ValueError as e:
+        print(f"Invalid effects or strengths: {e}")
+        sys.exit(1)
+
+    file_path: Path = Path(file_path_str)
+    variants: list[tuple[str, str, float]] = effect_variants(effect_names, strengths, sweep=True)
+    verbose_print(f"Applying {len(variants)} effect variants: {', '.join(name for name, _, _ in variants)}")
+    models: list[str] = ["chatgpt", "gemini", "claude"] if model_name == "all" else [model_name]
+
+    if watch:
+        watch_model(model_name, file_path_str, lambda model_names, file_dict: perturb_files(file_dict, variants, model_names),
+                    command="perturb")
+        return
+
+    if common.output_format != "csv":
+        stream_sink_output(model_name, file_path,
+                           lambda model_names, on_result: perturb_process(file_path, variants, model_names, on_result),
+                           command="perturb")
+        return
+
+    request_output: list[dict[str, Any]] = perturb_process(file_path, variants, models)
+    save_results(begin_run("perturb", model_name, file_path), request_output)
+    generate_csv_output(model_name, request_output)
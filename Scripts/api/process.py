@@ -3,12 +3,12 @@ from common import verbose_print
 import sys
 from pathlib import Path
 from llm_requests import chatgpt_request, gemini_request, claude_request
-from utils import get_file_dict, ask_save_location
+from utils import get_file_dict, ask_save_location, estimate_payload_size
+from sinks import OUTPUT_SINKS, result_row
+from store import begin_run, save_results
 from typing import Callable, Any, Optional
-from tqdm import tqdm
 import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, Future
 import os 
 REQUEST_FUNCTIONS: dict[str, Callable] = {
     "chatgpt": chatgpt_request,
@@ -16,13 +16,14 @@ REQUEST_FUNCTIONS: dict[str, Callable] = {
     "claude": claude_request
 }
 
-def process_each_model(model_name: str, file_path: Path) -> list[dict[str, Any]]:
+def process_each_model(model_name: str, file_path: Path, on_result: Optional[Callable] = None) -> list[dict[str, Any]]:
     """Helper Function For Process_Each_Model
     Processes for a LLM and returns the result as a dictionary.
 
     Args:
         model_name: The name of the model to process.
         file_path_str: The path to the file or directory to process.
+        on_result: Optional callable that receives each result as it comes in instead of it being returned.
     """
     verbose_print(f"Processing model: {model_name}")
     if model_name not in common.LLMS:
@@ -31,10 +32,13 @@ def process_each_model(model_name: str, file_path: Path) -> list[dict[str, Any]]
     if file_path.is_file() and file_path.suffix in common.VALID_EXTENSIONS:
         verbose_print(f"Sending {file_path} to {model_name}...")
         request_output: list[dict[str, Any]] = [REQUEST_FUNCTIONS[model_name](file_path)]
+        if on_result is not None:
+            on_result(request_output[0])
+            request_output = []
 
     elif file_path.is_dir():
         verbose_print(f"Sending {file_path} to {model_name}...")
-        request_output: list[dict[str, Any]] = parallel_process(file_path, REQUEST_FUNCTIONS[model_name])
+        request_output: list[dict[str, Any]] = parallel_process(file_path, REQUEST_FUNCTIONS[model_name], on_result)
 
     else:
         print(f"{file_path} is not a valid file or directory.")
@@ -57,13 +61,18 @@ def process_model(model_name: str, file_path_str: str) -> None:
         sys.exit(1)
     file_path: Path = Path(file_path_str)
 
+    if common.output_format != "csv":
+        stream_sink_output(model_name, file_path)
+        return
+
     request_output = []
     if model_name == "all":
         for model in ["chatgpt", "gemini", "claude"]:
             request_output = request_output + process_each_model(model, file_path)
     else:
         request_output = process_each_model(model_name, file_path)
-    
+
+    save_results(begin_run("process", model_name, file_path), request_output)
     generate_csv_output(model_name, request_output)
 
 def generate_csv_output(model_name, data: dict[str, Any], output_directory: Optional[Path] = None):
@@ -75,22 +84,10 @@ def generate_csv_output(model_name, data: dict[str, Any], output_directory: Opti
     """
     
 
-    rows: list[dict[str, Any]] = []
     data = sorted(data, key=lambda x: (x["file_name"], x["model"]))
-    for single_data in data:
-        row = {
-                'File_name': single_data.get('file_name', ""),
-                'Model': single_data.get('model', ""),
-        }
-        for response_column in common.AnalysisResponse.model_fields.keys():
-            row[response_column] = single_data.get(response_column, "")
-
-        for key, value in single_data.items():
-            if key not in row:
-                row[key.capitalize()] = value
-        rows.append(row)
-     
+    rows: list[dict[str, Any]] = [result_row(single_data) for single_data in data]
 
+    import pandas as pd  # Imported on first use as it is slow to load
     df: pd.DataFrame = pd.DataFrame(rows)
     if output_directory is None:
         csv_file_path = ask_save_location("result.csv")
@@ -112,37 +109,201 @@ def generate_csv_output(model_name, data: dict[str, Any], output_directory: Opti
         print(f"An error occurred: {e}")   
         raise e 
         return False
-        
 
-def parallel_process(dir_path: Path, request_function: Callable) -> list[dict[str, Any]]:
+def open_output_sink():
+    """Prompts for a save location and opens the sink for the selected output format.
+
+    Returns:
+        The opened sink, or None if the user cancelled.
+    """
+    sink_class = OUTPUT_SINKS[common.output_format]
+    output_path = ask_save_location(f"result{sink_class.extension}", sink_class.extension, sink_class.filetypes)
+    if not output_path:
+        return None
+    return sink_class(output_path)
+
+def stream_sink_output(model_name: str, file_path: Path, run_models: Optional[Callable] = None, command: str = "process") -> bool:
+    """Processes a model and file path, writing each result to the output sink as it comes in.
+
+    Args:
+        model_name: The name of the model to process.
+        file_path: The path to the file or directory to process.
+        run_models: Optional callable taking the model names and the result callback that makes the requests.
+            Defaults to processing the files of file_path with each model.
+        command: The command recorded with the run in the results store.
+
+    Returns:
+        True if the results were saved, False otherwise.
+    """
+    sink = open_output_sink()
+    if sink is None:
+        return False
+    run_ids: list[Optional[str]] = []
+    unsaved: list[dict[str, Any]] = []
+
+    def flush_results() -> None:
+        if unsaved and not run_ids:
+            # The run is recorded once results arrive so invalid inputs leave no trace
+            run_ids.append(begin_run(command, model_name, file_path))
+        if unsaved:
+            save_results(run_ids[0], unsaved)
+            unsaved.clear()
+
+    def on_result(result: dict[str, Any]) -> None:
+        sink.write(result)
+        unsaved.append(result)
+        if len(unsaved) >= common.PARQUET_BATCH_ROWS:
+            flush_results()
+
+    models: list[str] = ["chatgpt", "gemini", "claude"] if model_name == "all" else [model_name]
+    if run_models is not None:
+        run_models(models, on_result)
+    else:
+        for model in models:
+            process_each_model(model, file_path, on_result)
+    flush_results()
+    return sink.close()
+
+def write_sink_output(data: list[dict[str, Any]]) -> bool:
+    """Writes already collected results to the output sink.
+
+    Args:
+        data: The results to write.
+
+    Returns:
+        True if the results were saved, False otherwise.
+    """
+    sink = open_output_sink()
+    if sink is None:
+        return False
+    for single_data in data:
+        sink.write(single_data)
+    return sink.close()
+
+def parallel_process(dir_path: Path, request_function: Callable, on_result: Optional[Callable] = None) -> list[dict[str, Any]]:
     """Process multiple files in parallel using a request function.
 
+    Files are submitted in a window bounded by common.MAX_INFLIGHT_REQUESTS and by
+    common.MAX_INFLIGHT_BYTES of estimated payload, so memory use does not grow with
+    the size of the directory. A file larger than the byte budget is sent on its own.
+
     Args:
         dir_path: A Path object representing the directory containing files to process.
         request_function: A callable that processes each file.
+        on_result: Optional callable that receives each result as it comes in instead of it being collected.
 
     Returns:
-        A list of dictionaries containing results for each file.
+        A list of dictionaries containing results for each file. Empty when on_result is given.
     """
-    request_output: list = []
-    
     # Create a dictionary of valid files to process
     file_dict: dict[str, Path] = get_file_dict(dir_path)
     # chec if dict is empty, if so raise value error
     if not file_dict:
         raise ValueError("No valid files found in the directory.")
+    return parallel_process_files(file_dict, request_function, on_result)
 
-    with ThreadPoolExecutor(max_workers=common.MAX_THREAD_WORKERS) as executor:
-        future_to_file = {executor.submit(request_function, file): label for label, file in file_dict.items()}
-        
-        for future in tqdm(concurrent.futures.as_completed(future_to_file), total=len(future_to_file), desc="Processing items"):
-            label: str = future_to_file[future]  # Retrieve label for the current file
-            try:
-                result = future.result()
-                if result is not None:
-                    verbose_print(f"    {label} processed.")  # Use label to indicate file name
-                    request_output.append(result)
-            except Exception as e:
-                print(f'{label} generated an exception: {e}')  # Corrected to use label for error reporting
-
-    return request_output
\ No newline at end of file
+def parallel_process_files(file_dict: dict[str, Path], request_function: Callable, on_result: Optional[Callable] = None) -> list[dict[str, Any]]:
+    """Process the given files in parallel using a request function, with the same limits as parallel_process.
+
+    Args:
+        file_dict: The files to process, keyed by the label used in the results.
+        request_function: A callable that processes each file.
+        on_result: Optional callable that receives each result as it comes in instead of it being collected.
+
+    Returns:
+        A list of dictionaries containing results for each file. Empty when on_result is given.
+    """
+    from tqdm import tqdm
+    request_output: list = []
+
+    collect: Callable = on_result or request_output.append
+    pending: dict[Future, tuple[str, int]] = {}
+    inflight_bytes: int = 0
+    with ThreadPoolExecutor(max_workers=common.MAX_THREAD_WORKERS) as executor, \
+            tqdm(total=len(file_dict), desc="Processing items") as progress:
+        for label, file in file_dict.items():
+            payload_size: int = estimate_payload_size(file)
+            # Wait for running requests to finish while either limit would be exceeded
+            while pending and (len(pending) >= common.MAX_INFLIGHT_REQUESTS or
+                               inflight_bytes + payload_size > common.MAX_INFLIGHT_BYTES):
+                inflight_bytes -= collect_completed(pending, collect, progress)
+            pending[executor.submit(request_function, file)] = (label, payload_size)
+            inflight_bytes += payload_size
+
+        while pending:
+            inflight_bytes -= collect_completed(pending, collect, progress)
+
+    return request_output
+
+def collect_completed(pending: dict[Future, tuple[str, int]], on_result: Callable, progress: "tqdm") -> int:
+    """Wait for at least one pending request to finish and collect the results of all finished requests.
+
+    Args:
+        pending: Running futures mapped to their file label and estimated payload size. Finished futures are removed.
+        on_result: Callable that receives each successful result.
+        progress: The progress bar to advance for each finished request.
+
+    Returns:
+        The total estimated payload size released by the finished requests.
+    """
+    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+    released: int = 0
+    for future in done:
+        label, payload_size = pending.pop(future)  # Retrieve label for the current file
+        released += payload_size
+        progress.update(1)
+        try:
+            result = future.result()
+            if result is not None:
+                verbose_print(f"    {label} processed.")  # Use label to indicate file name
+                on_result(result)
+        except Exception as e:
+            print(f'{label} generated an exception: {e}')  # Corrected to use label for error reporting
+    return released
+
+def watch_model(model_name: str, file_path_str: str, run_files: Optional[Callable] = None, command: str = "watch") -> None:
+    """Watches a directory and processes new or changed files with a model as they arrive.
+
+    Each batch of new files is recorded as its own run in the results store, and its
+    results are made readable in the output as soon as the batch finishes. Parquet files
+    are only readable once closed, so each batch of a Parquet output is its own file.
+
+    Args:
+        model_name: The name of the model to process.
+        file_path_str: The path to the directory to watch.
+        run_files: Optional callable taking the model names and the files keyed by label and
+            returning their results. Defaults to processing the files with each model.
+        command: The command recorded with each run in the results store.
+    """
+    common.use_image_manipulation()
+    from watch import watch
+    verbose_print(f"Watching for model: {model_name}")
+    if model_name not in common.LLMS:
+        print("Invalid model name")
+        sys.exit(1)
+    file_path: Path = Path(file_path_str)
+    if not file_path.is_dir():
+        print(f"{file_path} is not a directory.")
+        sys.exit(1)
+
+    models: list[str] = ["chatgpt", "gemini", "claude"] if model_name == "all" else [model_name]
+    if run_files is None:
+        run_files = lambda model_names, file_dict: [result for model in model_names
+                                                    for result in parallel_process_files(file_dict, REQUEST_FUNCTIONS[model])]
+    sink = open_output_sink()
+    if sink is None:
+        return
+
+    def process_new_files(new_files: list[Path]) -> None:
+        file_dict: dict[str, Path] = {path.name: path for path in new_files}
+        verbose_print(f"Processing new files: {', '.join(file_dict)}")
+        results: list[dict[str, Any]] = run_files(models, file_dict)
+        for result in results:
+            sink.write(result)
+        sink.checkpoint()  # The daemon is usually stopped by being killed, so nothing is left for close
+        save_results(begin_run(command, model_name, file_path, file_dict=file_dict), results)
+
+    try:
+        watch(file_path, common.VALID_EXTENSIONS, process_new_files)
+    finally:
+        sink.close()
@@ -0,0 +1,227 @@
+import common
+from common import verbose_print
+from typing import Any
+from pathlib import Path
+import importlib.util
+import csv
+
+# Parquet output is optional and pyarrow is slow to load, so it is only imported by ParquetSink
+PYARROW_AVAILABLE: bool = importlib.util.find_spec("pyarrow") is not None
+
+
+def result_row(single_data: dict[str, Any]) -> dict[str, Any]:
+    """Builds an output row from a single result, using the same column layout for every output format.
+
+    Args:
+        single_data: The result dictionary returned by a request function.
+
+    Returns:
+        The row with File_name and Model first, then the AnalysisResponse fields, then any extra keys capitalised.
+    """
+    row: dict[str, Any] = {
+        'File_name': single_data.get('file_name', ""),
+        'Model': single_data.get('model', ""),
+    }
+    for response_column in common.AnalysisResponse.model_fields.keys():
+        row[response_column] = single_data.get(response_column, "")
+
+    for key, value in single_data.items():
+        if key not in row:
+            row[key.capitalize()] = value
+    return row
+
+
+def part_path(output_path: str, part: int) -> str:
+    """Names a part of the output once results are written to more than one file.
+
+    Args:
+        output_path: The path chosen for the output.
+        part: The number of the part, from 0.
+
+    Returns:
+        output_path for the first part, then output_path with '-{part}' added to its name.
+    """
+    if part == 0:
+        return output_path
+    path: Path = Path(output_path)
+    return str(path.with_name(f"{path.stem}-{part}{path.suffix}"))
+
+
+class ParquetSink:
+    """Writes results to a Parquet file as Arrow record batches while they come in.
+
+    The Model column and the AnalysisResponse columns repeat the same few values
+    across rows, so they are stored dictionary-encoded. A Parquet file is only readable
+    once it is closed, so checkpoint closes the file and later results go to a new part.
+    Results with columns the open file does not have also start a new part, rather than
+    losing those columns.
+    """
+    extension: str = ".parquet"
+    filetypes: list[tuple[str, str]] = [("Parquet format", "*.parquet"), ("All files", "*.*")]
+
+    def __init__(self, output_path: str, batch_rows: int = None):
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for Parquet output. Install it with 'pip install pyarrow'.")
+        self.base_path: str = output_path
+        self.output_path: str = output_path
+        self.paths: list[str] = []
+        self.batch_rows: int = batch_rows or common.PARQUET_BATCH_ROWS
+        self.rows: list[dict[str, Any]] = []
+        self.schema = None
+        self.writer = None
+        self.rows_written: int = 0
+
+    def write(self, result: dict[str, Any]) -> None:
+        """Adds a single result to the sink, flushing a record batch once enough rows are buffered.
+
+        Args:
+            result: The result dictionary returned by a request function.
+        """
+        self.rows.append(result_row(result))
+        if len(self.rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered rows to the Parquet file as one record batch."""
+        if not self.rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        column_names: list[str] = list(dict.fromkeys(name for row in self.rows for name in row))
+        if self.writer is not None and not set(column_names) <= set(self.schema.names):
+            new_columns: list[str] = [name for name in column_names if name not in self.schema.names]
+            print(f"Results have new columns {new_columns}, continuing in a new file.")
+            self.close_part()
+        if self.writer is None:
+            # Later parts keep the earlier columns, so every part can be read as one table
+            self.schema = self.build_schema(list(dict.fromkeys([*(self.schema.names if self.schema else []), *column_names])))
+            self.output_path = part_path(self.base_path, len(self.paths))
+            self.writer = pq.ParquetWriter(self.output_path, self.schema)
+            self.paths.append(self.output_path)
+
+        columns: dict[str, list] = {name: [] for name in self.schema.names}
+        for row in self.rows:
+            for name in columns:
+                value = row.get(name, "")
+                columns[name].append(value if value is None or isinstance(value, str) else str(value))
+
+        arrays: list = []
+        for field in self.schema:
+            array = pa.array(columns[field.name], type=pa.string())
+            if pa.types.is_dictionary(field.type):
+                array = array.dictionary_encode()
+            arrays.append(array)
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows_written += len(self.rows)
+        self.rows = []
+
+    def close_part(self) -> None:
+        """Closes the open file, writing its footer so it can be read."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def checkpoint(self) -> None:
+        """Makes every result written so far readable, closing the file so later results go to a new part."""
+        self.flush()
+        self.close_part()
+
+    def close(self) -> bool:
+        """Flushes any remaining rows and closes the file.
+
+        Returns:
+            True if a file was written, False if there were no results.
+        """
+        self.checkpoint()
+        if not self.paths:
+            print("No results to write.")
+            return False
+        verbose_print(f"{self.rows_written} results saved to {', '.join(self.paths)}")
+        return True
+
+    @staticmethod
+    def build_schema(column_names: list[str]):
+        """Builds the Arrow schema for the output columns.
+
+        Args:
+            column_names: The output column names in order.
+
+        Returns:
+            The schema with File_name and extra columns as strings and Model and response columns dictionary-encoded.
+        """
+        import pyarrow as pa
+        dictionary_columns: set[str] = {'Model', *common.AnalysisResponse.model_fields.keys()}
+        return pa.schema([
+            pa.field(name, pa.dictionary(pa.int32(), pa.string()) if name in dictionary_columns else pa.string())
+            for name in column_names
+        ])
+
+
+class CsvSink:
+    """Writes results to a CSV file as they come in, with the same columns as the CSV output.
+
+    The columns of the first result fix the header. Results with columns the header does
+    not have start a new part with the extended header, as for Parquet output.
+    """
+    extension: str = ".csv"
+    filetypes: list[tuple[str, str]] = [("CSV format", "*.csv"), ("All files", "*.*")]
+
+    def __init__(self, output_path: str):
+        self.base_path: str = output_path
+        self.output_path: str = output_path
+        self.paths: list[str] = []
+        self.file = None
+        self.writer = None
+        self.rows_written: int = 0
+
+    def write(self, result: dict[str, Any]) -> None:
+        """Adds a single result to the file.
+
+        Args:
+            result: The result dictionary returned by a request function.
+        """
+        row: dict[str, Any] = result_row(result)
+        field_names: list[str] = []
+        if self.writer is not None:
+            field_names = self.writer.fieldnames
+            new_columns: list[str] = [name for name in row if name not in field_names]
+            if new_columns:
+                print(f"Results have new columns {new_columns}, continuing in a new file.")
+                self.file.close()
+                self.writer = None
+        if self.writer is None:
+            self.output_path = part_path(self.base_path, len(self.paths))
+            self.file = open(self.output_path, "w", newline="")
+            self.writer = csv.DictWriter(self.file, fieldnames=list(dict.fromkeys([*field_names, *row])))
+            self.writer.writeheader()
+            self.paths.append(self.output_path)
+        self.writer.writerow(row)
+        self.rows_written += 1
+
+    def flush(self) -> None:
+        """Makes the results written so far visible in the file."""
+        if self.file is not None:
+            self.file.flush()
+
+    def checkpoint(self) -> None:
+        """Makes every result written so far readable. Rows are appended, so the file stays open."""
+        self.flush()
+
+    def close(self) -> bool:
+        """Closes the file.
+
+        Returns:
+            True if a file was written, False if there were no results.
+        """
+        if self.file is None:
+            print("No results to write.")
+            return False
+        self.file.close()
+        verbose_print(f"{self.rows_written} results saved to {', '.join(self.paths)}")
+        return True
+
+
+OUTPUT_SINKS: dict[str, type] = {
+    "csv": CsvSink,
+    "parquet": ParquetSink,
+}
@@ -0,0 +1,351 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+import common
+from common import verbose_print
+from utils import get_file_dict
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    command TEXT NOT NULL,
+    model TEXT,
+    source TEXT,
+    prompt_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS prompts (
+    prompt_hash TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    run_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    file_path TEXT,
+    file_hash TEXT,
+    PRIMARY KEY (run_id, file_name)
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    file_hash TEXT,
+    frame INTEGER,
+    model TEXT,
+    prompt_hash TEXT,
+    effect TEXT,
+    strength REAL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_file_hash ON results (file_hash, model, frame);
+CREATE INDEX IF NOT EXISTS idx_results_model ON results (model);
+CREATE INDEX IF NOT EXISTS idx_results_prompt_hash ON results (prompt_hash);
+CREATE INDEX IF NOT EXISTS idx_results_run_id ON results (run_id);
+CREATE INDEX IF NOT EXISTS idx_files_file_hash ON files (file_hash);
+"""
+# Created after stores from before the perturbation columns are migrated, as they index them
+PERTURBATION_INDEXES: str = """
+CREATE INDEX IF NOT EXISTS idx_results_effect ON results (effect, strength);
+"""
+PERTURBATION_COLUMNS: dict[str, str] = {"effect": "TEXT", "strength": "REAL"}  # Effect variant of perturbed results
+
+AGGREGATE_COLUMNS: tuple[str, ...] = ("model", "prompt_hash", "run_id", "file_hash", "effect", "strength")
+
+
+def connect(db_path: Optional[Path] = None) -> sqlite3.Connection:
+    """Opens the results store, creating it and its tables if needed.
+
+    Args:
+        db_path: Path to the SQLite database. Defaults to common.RESULTS_DB_PATH.
+
+    Returns:
+        The open connection.
+    """
+    db_path = Path(db_path or common.RESULTS_DB_PATH)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    existing: set[str] = {row[1] for row in connection.execute("PRAGMA table_info(results)")}
+    for column, column_type in PERTURBATION_COLUMNS.items():
+        if column not in existing:
+            connection.execute(f"ALTER TABLE results ADD COLUMN {column} {column_type}")
+    connection.executescript(PERTURBATION_INDEXES)
+    return connection
+
+def hash_prompt(prompt: str) -> str:
+    """Hashes a prompt so results can be grouped by the prompt that produced them.
+
+    Args:
+        prompt: The system prompt sent with the requests.
+
+    Returns:
+        The first 16 hex digits of the SHA-256 of the prompt.
+    """
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+def new_run_id() -> str:
+    """Creates a unique, time-sortable run ID for a processing run.
+
+    Returns:
+        The run ID.
+    """
+    return f"run_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+def start_run(command: str, model_name: str, source: Path, file_dict: dict[str, Path],
+              run_id: Optional[str] = None, db_path: Optional[Path] = None) -> str:
+    """Records a run, its prompt and the content hash of every input file.
+
+    Args:
+        command: The command that started the run ('process' or 'batch').
+        model_name: The name of the model processing the files.
+        source: The file or directory given on the command line.
+        file_dict: The files of the run, keyed by the name used in the results.
+        run_id: The ID of the run, such as a batch ID. A new ID is created if None.
+        db_path: Path to the SQLite database. Defaults to common.RESULTS_DB_PATH.
+
+    Returns:
+        The ID of the run.
+    """
+    common.use_image_manipulation()
+    from hashing import hash_file  # Shared with the build manifest of the image manipulation program
+    run_id = run_id or new_run_id()
+    prompt_hash: str = hash_prompt(common.prompt)
+    file_rows: list[tuple] = [(run_id, label, str(path), hash_file(path)) for label, path in file_dict.items()]
+    with connect(db_path) as connection:
+        connection.execute("INSERT OR IGNORE INTO prompts VALUES (?, ?)", (prompt_hash, common.prompt))
+        connection.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                           (run_id, time.strftime("%Y-%m-%dT%H:%M:%S"), command, model_name, str(source), prompt_hash))
+        connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", file_rows)
+    connection.close()
+    verbose_print(f"Recording results of run {run_id} to {db_path or common.RESULTS_DB_PATH}")
+    return run_id
+
+def record_results(run_id: str, results: list[dict[str, Any]], db_path: Optional[Path] = None) -> None:
+    """Stores results of a run, linking each to the content hash of its input file.
+
+    Video frames exported from a batch are named '{file}_{frame}', so they are linked to the hash of their video
+    and keep their frame number. The effect and strength of perturbed results are stored in their own columns,
+    as every variant of a file shares its name and hash.
+
+    Args:
+        run_id: The ID of the run the results belong to.
+        results: The result dictionaries returned by the request functions or a batch export.
+        db_path: Path to the SQLite database. Defaults to common.RESULTS_DB_PATH.
+    """
+    if not results:
+        return
+    with connect(db_path) as connection:
+        file_hashes: dict[str, str] = dict(connection.execute(
+            "SELECT file_name, file_hash FROM files WHERE run_id = ?", (run_id,)))
+        run = connection.execute("SELECT prompt_hash FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if run is None:
+            # Batches created before the store existed have no recorded run
+            prompt_hash: str = hash_prompt(common.prompt)
+            connection.execute("INSERT OR IGNORE INTO prompts VALUES (?, ?)", (prompt_hash, common.prompt))
+            connection.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                               (run_id, time.strftime("%Y-%m-%dT%H:%M:%S"), "export", None, None, prompt_hash))
+        else:
+            prompt_hash: str = run[0]
+
+        rows: list[tuple] = []
+        for result in results:
+            file_name: str = str(result.get("file_name", ""))
+            file_hash: Optional[str] = file_hashes.get(file_name)
+            frame: Optional[int] = None
+            label, _, suffix = file_name.rpartition("_")
+            if file_hash is None and label in file_hashes and suffix.isdigit():
+                file_hash, frame = file_hashes[label], int(suffix)
+            strength: Any = result.get("strength")
+            response: dict = {key: value for key, value in result.items()
+                              if key not in ("file_name", "model", "effect", "strength")}
+            rows.append((run_id, file_name, file_hash, frame, result.get("model"), prompt_hash, result.get("effect"),
+                         None if strength in (None, "") else float(strength), json.dumps(response, default=str)))
+        connection.executemany(
+            "INSERT INTO results (run_id, file_name, file_hash, frame, model, prompt_hash, effect, strength, response) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows)
+    connection.close()
+
+def begin_run(command: str, model_name: str, source: Path, run_id: Optional[str] = None,
+              file_dict: Optional[dict[str, Path]] = None) -> Optional[str]:
+    """Records the start of a run if storing results is enabled.
+
+    Errors are reported but never stop the run itself.
+
+    Args:
+        command: The command that started the run ('process' or 'batch').
+        model_name: The name of the model processing the files.
+        source: The file or directory given on the command line.
+        run_id: The ID of the run, such as a batch ID. A new ID is created if None.
+        file_dict: The files of the run, keyed by the name used in the results. Defaults to every file in source.
+
+    Returns:
+        The ID of the run, or None if the run is not being stored.
+    """
+    if not common.store_results:
+        return None
+    try:
+        return start_run(command, model_name, source, file_dict or get_file_dict(Path(source)), run_id)
+    except Exception as e:
+        print(f"Could not record the run in the results store: {e}")
+        return None
+
+def save_results(run_id: Optional[str], results: list[dict[str, Any]]) -> None:
+    """Stores results of a run if storing results is enabled.
+
+    Errors are reported but never stop the run itself.
+
+    Args:
+        run_id: The ID of the run the results belong to. Nothing is stored if None.
+        results: The result dictionaries to store.
+    """
+    if run_id is None or not common.store_results:
+        return
+    try:
+        record_results(run_id, results)
+    except Exception as e:
+        print(f"Could not save results to the results store: {e}")
+
+def list_runs(connection: sqlite3.Connection) -> tuple[list[str], list[tuple]]:
+    """Lists every run with the number of results it produced.
+
+    Args:
+        connection: The open results store.
+
+    Returns:
+        The column names and rows of the listing.
+    """
+    query: str = """
+        SELECT runs.run_id, runs.started_at, runs.command, runs.model, runs.prompt_hash, COUNT(results.id) AS results
+        FROM runs LEFT JOIN results ON results.run_id = runs.run_id
+        GROUP BY runs.run_id ORDER BY runs.started_at"""
+    return run_query(connection, query)
+
+def diff_runs(connection: sqlite3.Connection, run_a: str, run_b: str, field: str) -> tuple[list[str], list[tuple]]:
+    """Finds the files whose response field differs between two runs.
+
+    Files are matched by content hash, frame, model, effect and strength, so renamed or moved files are still
+    compared and each perturbed variant is only compared with the same variant of the other run.
+
+    Args:
+        connection: The open results store.
+        run_a: The ID of the first run.
+        run_b: The ID of the second run.
+        field: The response field to compare, such as 'action'.
+
+    Returns:
+        The column names and rows of the differences.
+    """
+    query: str = """
+        SELECT a.file_name, a.effect, a.strength, a.model, json_extract(a.response, '$.' || :field) AS run_a,
+               json_extract(b.response, '$.' || :field) AS run_b
+        FROM results a JOIN results b
+            ON a.file_hash = b.file_hash AND a.frame IS b.frame AND a.model = b.model
+               AND a.effect IS b.effect AND a.strength IS b.strength
+        WHERE a.run_id = :run_a AND b.run_id = :run_b AND run_a IS NOT run_b
+        ORDER BY a.file_name, a.effect, a.strength"""
+    return run_query(connection, query, {"run_a": run_a, "run_b": run_b, "field": field})
+
+def aggregate_results(connection: sqlite3.Connection, group_by: str, field: str) -> tuple[list[str], list[tuple]]:
+    """Counts the values of a response field across all runs.
+
+    Args:
+        connection: The open results store.
+        group_by: The column to group by, one of AGGREGATE_COLUMNS.
+        field: The response field to count, such as 'action'.
+
+    Returns:
+        The column names and rows of the counts.
+    """
+    if group_by not in AGGREGATE_COLUMNS:
+        raise ValueError(f"Cannot group by {group_by}. Choose from {', '.join(AGGREGATE_COLUMNS)}")
+    query: str = f"""
+        SELECT {group_by}, json_extract(response, '$.' || :field) AS value, COUNT(*) AS count
+        FROM results GROUP BY 1, 2 ORDER BY 1, 3 DESC"""
+    return run_query(connection, query, {"field": field})
+
+def run_query(connection: sqlite3.Connection, query: str, parameters: dict | tuple = ()) -> tuple[list[str], list[tuple]]:
+    """Runs a query against the results store.
+
+    Args:
+        connection: The open results store.
+        query: The SQL query.
+        parameters: Parameters bound to the query.
+
+    Returns:
+        The column names and rows of the result.
+    """
+    cursor: sqlite3.Cursor = connection.execute(query, parameters)
+    columns: list[str] = [description[0] for description in cursor.description or []]
+    return columns, cursor.fetchall()
+
+def print_table(columns: list[str], rows: list[tuple]) -> None:
+    """Prints query results as a tab-separated table.
+
+    Args:
+        columns: The column names.
+        rows: The rows to print.
+    """
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+    verbose_print(f"{len(rows)} rows")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse the arguments from the command line.
+
+    Returns:
+        The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Query the results stored across processing runs.")
+    parser.add_argument("--db", metavar="DB_PATH", default=str(common.RESULTS_DB_PATH),
+                        help="Path to the results database. Default is Results/results.db.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("runs", help="List all runs.")
+
+    diff_parser = subparsers.add_parser("diff", help="Show files whose response changed between two runs.")
+    diff_parser.add_argument("run_a", help="ID of the first run.")
+    diff_parser.add_argument("run_b", help="ID of the second run.")
+    diff_parser.add_argument("-f", "--field", default="action", help="Response field to compare. Default is action.")
+
+    aggregate_parser = subparsers.add_parser("aggregate", help="Count response values per group.")
+    aggregate_parser.add_argument("-g", "--group-by", choices=AGGREGATE_COLUMNS, default="model",
+                                  help="Column to group by. Default is model.")
+    aggregate_parser.add_argument("-f", "--field", default="action", help="Response field to count. Default is action.")
+
+    sql_parser = subparsers.add_parser("sql", help="Run an SQL query against the results, runs, files and prompts tables.")
+    sql_parser.add_argument("query", help="The SQL query to run.")
+
+    return parser.parse_args()
+
+def main():
+    """Main function that runs the query selected on the command line."""
+    args: argparse.Namespace = parse_arguments()
+    if args.verbose:
+        common.set_verbose()
+    connection: sqlite3.Connection = connect(Path(args.db))
+    match args.command:
+        case "runs":
+            columns, rows = list_runs(connection)
+        case "diff":
+            columns, rows = diff_runs(connection, args.run_a, args.run_b, args.field)
+        case "aggregate":
+            columns, rows = aggregate_results(connection, args.group_by, args.field)
+        case "sql":
+            columns, rows = run_query(connection, args.query)
+    print_table(columns, rows)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,8 @@
-import tkinter as tk
-from tkinter import filedialog
 from pathlib import Path
 from pydantic import BaseModel, create_model
 from typing import List, Dict
 from common import AnalysisResponse, verbose_print
 import common
-import cv2
 import base64
 import os
 import sys
@@ -29,16 +26,19 @@ def check_file_size(file_path: str) -> bool:
         return False
     return True
 
-def ask_save_location(default_filename: str):
+def ask_save_location(default_filename: str, extension: str = ".csv", filetypes: list[tuple[str, str]] = None):
     """Prompt the user to select a location to save a file. If no location is selected, return a default path.
 
     Args:
         default_filename: The default filename to use if the user does not provide one.
-        default_directory: The default directory to use if the user does not provide a location.
+        extension: The extension added to the selected filename if it has none.
+        filetypes: The file types offered by the dialog. Defaults to CSV, text and all files.
 
     Returns:
         The path selected by the user or the default path if canceled.
     """
+    import tkinter as tk  # Imported on first use as only saving results needs a dialog
+    from tkinter import filedialog
     currentDir = Path(os.path.dirname(os.path.abspath(__file__)))
     default_directory: Path =  currentDir.parents[1]
 
@@ -49,8 +49,8 @@ def ask_save_location(default_filename: str):
     root.update()
     
     file_path = filedialog.asksaveasfilename(
-        defaultextension=".csv",
-        filetypes=[("CSV format", "*.csv"),("Text files", "*.txt"), ("All files", "*.*")],
+        defaultextension=extension,
+        filetypes=filetypes or [("CSV format", "*.csv"),("Text files", "*.txt"), ("All files", "*.*")],
         initialfile=default_filename,
         initialdir=default_directory,
         title="Select location to save your file"
@@ -116,6 +116,36 @@ def get_media_type(file_path: Path) -> str:
         return media_types[ext]
     raise ValueError(f"Unsupported file extension: {ext}")
 
+def estimate_payload_size(file_path: Path) -> int:
+    """Estimates the size of the base64 payload a request will hold for a file.
+
+    Images are sent as-is, so the estimate is exact. Videos are estimated from the
+    number of frames encode_video will sample and their raw size after JPEG compression.
+
+    Args:
+        file_path: The path to the image or video file.
+
+    Returns:
+        The estimated payload size in bytes.
+    """
+    if file_path.suffix not in common.VIDEO_EXTENSIONS:
+        return (os.path.getsize(file_path) + 2) // 3 * 4
+
+    import cv2
+    cam = cv2.VideoCapture(str(file_path))
+    fps: int = int(cam.get(cv2.CAP_PROP_FPS))
+    frame_count: int = int(cam.get(cv2.CAP_PROP_FRAME_COUNT))
+    width: int = int(cam.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height: int = int(cam.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cam.release()
+
+    if fps < 1 or frame_count < 1:
+        # Unknown metadata, fall back to the size of the file itself
+        return (os.path.getsize(file_path) + 2) // 3 * 4
+    sampled_frames: int = -(-frame_count // fps)
+    frame_bytes: int = width * height * 3 // common.JPEG_COMPRESSION_ESTIMATE
+    return sampled_frames * (frame_bytes + 2) // 3 * 4
+
 def encode_image(image_path: Path) -> str:
     """Encodes an image stored locally into a base64 string.
     
@@ -136,7 +166,24 @@ def encode_video(video_path: Path, frame_rate_divisor: int = 2) -> list[str]:
         
     Returns:
         The base64-encoded list of image strings."""
+    import cv2  # Imported on first use as it is slow to load
     images: list[str] = []
+    if common.frame_cache_dir is not None:
+        # The sampled frames come from the frame cache, decoded once for every model and run
+        common.use_image_manipulation()
+        from frame_cache import FrameSource
+        source = FrameSource(video_path, sampled=True, cache_dir=common.frame_cache_dir)
+        try:
+            frame = source.read()
+            while frame is not None:
+                success, buffer = cv2.imencode('.jpg', frame)
+                if success:
+                    images.append(base64.b64encode(buffer).decode('utf-8'))
+                frame = source.read()
+        finally:
+            source.close()
+        return images
+
     cam = cv2.VideoCapture(str(video_path))
     
     # Get the video's original frame rate
@@ -0,0 +1,272 @@
+from PIL import Image
+from filters import (
+    darkness_filter,
+    brightness_filter,
+    gaussian_blur_filter,
+    intensity_filter,
+    motion_blur_filter,
+    darkness_array,
+    brightness_array,
+    gaussian_blur_array,
+    intensity_array,
+    motion_blur_array,
+    apply_point_filters,
+    point_table,
+    luma_mean,
+    POINT_FILTERS
+)
+
+from overlay import (
+    process_image_overlay,
+    process_array_overlay
+)
+
+from typing import Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import numpy as np
+import cv2
+
+FILTERS: Dict[str, Callable[[Image.Image, float], Image.Image]] = {
+    "darkness": darkness_filter,
+    "brightness": brightness_filter,
+    "gaussian": gaussian_blur_filter,
+    "intensity": intensity_filter,
+    "motion": motion_blur_filter,
+}
+
+# Array versions of the filters, used for video frames so they never leave NumPy
+ARRAY_FILTERS: Dict[str, Callable[[np.ndarray, float], np.ndarray]] = {
+    "darkness": darkness_array,
+    "brightness": brightness_array,
+    "gaussian": gaussian_blur_array,
+    "intensity": intensity_array,
+    "motion": motion_blur_array,
+}
+
+# Define overlay paths, relative to this file so the effects work from any directory
+OVERLAY_DIR: Path = Path(__file__).resolve().parent / "overlay_images"
+OVERLAYS: Dict[str, Path] = {
+    "rain": OVERLAY_DIR / "rain.png",
+    "fog": OVERLAY_DIR / "fog.png",
+    "graffiti": OVERLAY_DIR / "graffiti.png",
+    "lens-flare": OVERLAY_DIR / "lens_flare.png",
+    "wet-filter": OVERLAY_DIR / "wet_filter.png"
+}
+
+CHAIN_SEPARATOR: str = "+"  # Separates the stages of an effect chain, e.g. fog+motion@0.3+darkness@0.6
+STRENGTH_SEPARATOR: str = "@"  # Separates a stage from its own strength
+RANGE_SEPARATOR: str = ":"  # Separates the start, stop and step of a strength sweep, e.g. 0.1:1.0:0.1
+
+Variant = Tuple[str, str, float]  # Output name prefix, effect or effect chain, and default strength
+
+def parse_chain(effect_chain: str, default_strength: float) -> List[Tuple[str, float]]:
+    """Splits an effect chain into its stages.
+
+    Args:
+        effect_chain: A single effect name, or effect names joined with CHAIN_SEPARATOR, each
+            optionally followed by STRENGTH_SEPARATOR and its own strength.
+        default_strength: Strength of the stages that do not give one.
+
+    Returns:
+        The (effect name, strength) pairs in the order they are applied.
+
+    Raises:
+        ValueError: If an effect is unknown or a strength is not a number.
+    """
+    chain: List[Tuple[str, float]] = []
+    for stage in effect_chain.split(CHAIN_SEPARATOR):
+        effect_name, _, strength = stage.partition(STRENGTH_SEPARATOR)
+        if effect_name not in FILTERS and effect_name not in OVERLAYS:
+            raise ValueError(f"Unknown effect '{effect_name}'. Choose from {', '.join([*FILTERS, *OVERLAYS])}.")
+        try:
+            chain.append((effect_name, float(strength) if strength else default_strength))
+        except ValueError:
+            raise ValueError(f"Invalid strength '{strength}' for effect '{effect_name}'.")
+    return chain
+
+def stage_effect(effect_name: str, strength: float) -> Callable[..., np.ndarray]:
+    """Gets the function applying a single effect to an image array.
+
+    Args:
+        effect_name: Name of the effect to apply.
+        strength: Strength of the filter effect.
+
+    Returns:
+        A function taking an image array, and optionally the position of the frame in its video,
+        and returning the processed image array.
+    """
+    filter_func = ARRAY_FILTERS.get(effect_name)
+    overlay_path = OVERLAYS.get(effect_name)
+
+    if filter_func:
+        return lambda frame, frame_index=None: filter_func(frame, strength)
+    elif overlay_path:
+        return lambda frame, frame_index=None: process_array_overlay(frame, effect_name, overlay_path, frame_index)
+    raise ValueError(f"Unknown effect: {effect_name}")
+
+def chain_effect(chain: List[Tuple[str, float]]) -> Callable[..., np.ndarray]:
+    """Fuses the stages of an effect chain into one function applied in memory.
+
+    Consecutive point filters are merged into a single lookup table.
+
+    Args:
+        chain: The (effect name, strength) pairs in the order they are applied.
+
+    Returns:
+        A function taking an image array, and optionally the position of the frame in its video,
+        and returning the processed image array.
+    """
+    stages: List[Callable[..., np.ndarray]] = []
+    point_steps: List[Tuple[str, float]] = []
+    for effect_name, strength in chain:
+        if effect_name in POINT_FILTERS:
+            point_steps.append((effect_name, strength))
+            continue
+        if point_steps:
+            stages.append(lambda frame, frame_index=None, steps=point_steps: apply_point_filters(frame, steps))
+            point_steps = []
+        stages.append(stage_effect(effect_name, strength))
+    if point_steps:
+        stages.append(lambda frame, frame_index=None, steps=point_steps: apply_point_filters(frame, steps))
+
+    def apply_chain(frame: np.ndarray, frame_index: Optional[int] = None) -> np.ndarray:
+        for stage in stages:
+            frame = stage(frame, frame_index)
+        return frame
+    return apply_chain
+
+def frame_effect(effect_name: str, strength: float) -> Callable[..., np.ndarray]:
+    """Gets the function applying the given effect or effect chain to a single video frame.
+
+    Args:
+        effect_name: Name of the effect or effect chain to apply.
+        strength: Strength of the stages that do not give their own.
+
+    Returns:
+        A function taking a frame array, and optionally its position in the video, and returning
+        the processed frame array.
+    """
+    return chain_effect(parse_chain(effect_name, strength))
+
+def apply_image_effect(image: Image.Image, effect_name: str, strength: float) -> Image.Image:
+    """Applies the given effect or effect chain to an image.
+
+    A single effect goes through its PIL filter or overlay. A chain is applied to the
+    image's RGB array in one pass, so it is decoded and encoded only once.
+
+    Args:
+        image: The image to be processed.
+        effect_name: Name of the effect or effect chain to apply.
+        strength: Strength of the stages that do not give their own.
+
+    Returns:
+        The processed image.
+    """
+    chain: List[Tuple[str, float]] = parse_chain(effect_name, strength)
+    if len(chain) > 1:
+        return Image.fromarray(chain_effect(chain)(np.array(image.convert("RGB"))))
+
+    effect_name, strength = chain[0]
+    if effect_name in FILTERS:
+        return FILTERS[effect_name](image, strength)
+    return process_image_overlay(image, effect_name, OVERLAYS[effect_name])
+
+def parse_strengths(value: str) -> List[float]:
+    """Expands a strength sweep into its strengths.
+
+    Args:
+        value: Either start:stop:step, where stop is included if the steps reach it, or a
+            comma-separated list of strengths.
+
+    Returns:
+        The strengths in order, rounded so steps such as 0.1 do not drift.
+
+    Raises:
+        ValueError: If the value cannot be parsed or the step is not positive.
+    """
+    if RANGE_SEPARATOR not in value:
+        return [float(strength) for strength in value.split(",") if strength]
+
+    parts: List[str] = value.split(RANGE_SEPARATOR)
+    if len(parts) != 3:
+        raise ValueError(f"Strength range '{value}' must be start:stop:step.")
+    start, stop, step = (float(part) for part in parts)
+    if step <= 0:
+        raise ValueError(f"The step of strength range '{value}' must be positive.")
+    count: int = int(round((stop - start) / step, 9)) + 1
+    return [round(start + i * step, 9) for i in range(max(count, 0))]
+
+def uses_strength(effect_name: str) -> bool:
+    """Checks whether the default strength changes the result of an effect or effect chain.
+
+    Args:
+        effect_name: Name of the effect or effect chain.
+
+    Returns:
+        True if a filter stage of the chain does not give its own strength.
+    """
+    for stage in effect_name.split(CHAIN_SEPARATOR):
+        stage_name, _, strength = stage.partition(STRENGTH_SEPARATOR)
+        if stage_name in FILTERS and not strength:
+            return True
+    return False
+
+def effect_variants(effect_names: List[str], strengths: List[float], sweep: bool = False) -> List[Variant]:
+    """Lists the effect variants to apply to every file.
+
+    Args:
+        effect_names: The effects or effect chains to apply.
+        strengths: The default strengths to apply them at.
+        sweep: Whether outputs are named after the strength as well as the effect. Without a
+            sweep only the first effect and strength are used, keeping the {effect}_{file} names.
+
+    Returns:
+        The (name, effect, strength) variants. In a sweep, effects the strength does not
+        change, such as overlays, are listed once under their own name.
+    """
+    if not sweep:
+        return [(effect_names[0], effect_names[0], strengths[0])]
+
+    variants: List[Variant] = []
+    for effect_name in effect_names:
+        if not uses_strength(effect_name):
+            variants.append((effect_name, effect_name, strengths[0]))
+            continue
+        for strength in strengths:
+            variants.append((f"{effect_name}{STRENGTH_SEPARATOR}{strength:g}", effect_name, strength))
+    return variants
+
+def variants_effect(variants: List[Variant]) -> Callable[..., List[np.ndarray]]:
+    """Gets the function applying every effect variant to the same frame.
+
+    Variants that are a single point filter share one pass over the frame: their tables
+    are built once, and the mean used by intensity is measured once per frame for all of
+    its strengths.
+
+    Args:
+        variants: The (name, effect, strength) variants to apply.
+
+    Returns:
+        A function taking a frame array, and optionally its position in the video, and returning
+        the processed frame of every variant, in order.
+    """
+    stages: List[Tuple[Optional[str], float, Optional[Callable[..., np.ndarray]]]] = []
+    for _, effect_name, strength in variants:
+        chain: List[Tuple[str, float]] = parse_chain(effect_name, strength)
+        if len(chain) == 1 and chain[0][0] in POINT_FILTERS:
+            stages.append((chain[0][0], chain[0][1], None))
+        else:
+            stages.append((None, strength, chain_effect(chain)))
+
+    def apply_variants(frame: np.ndarray, frame_index: Optional[int] = None) -> List[np.ndarray]:
+        mean: Optional[int] = None
+        results: List[np.ndarray] = []
+        for point_name, strength, apply_chain in stages:
+            if apply_chain is not None:
+                results.append(apply_chain(frame, frame_index))
+                continue
+            if point_name == "intensity" and mean is None:
+                mean = luma_mean(frame)
+            results.append(cv2.LUT(frame, point_table(point_name, strength, mean or 0)))
+        return results
+    return apply_variants
@@ -0,0 +1,169 @@
+from PIL import Image
+
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import threading
+import numpy as np
+import cv2
+
+# Formats image outputs can be converted to, by name on the command line
+IMAGE_FORMATS: Dict[str, str] = {
+    "jpg": ".jpg",
+    "png": ".png",
+    "webp": ".webp",
+    "bmp": ".bmp",
+    "tiff": ".tiff"
+}
+# Lossless formats OpenCV encodes faster than PIL, giving the same pixels
+OPENCV_EXTENSIONS: Tuple[str, ...] = ('.png', '.bmp')
+OPENCV_MODES: Tuple[str, ...] = ("L", "RGB", "RGBA")  # Image modes with an OpenCV equivalent
+JPEG_EXTENSIONS: Tuple[str, ...] = ('.jpg', '.jpeg')
+DEFAULT_JPEG_QUALITY: int = 75  # PIL's default, which OpenCV is also given so both encode JPEG images the same
+DEFAULT_COMPRESSION: int = 6  # PIL's default PNG compression level, from 0 (fastest) to 9 (smallest)
+WRITER_THREADS: int = 2  # Threads encoding and saving images, PIL and OpenCV release the GIL while they encode
+WRITER_QUEUE_SIZE: int = 8  # Images waiting to be saved before processing waits for the writer
+
+output_format: Optional[str] = None  # One of IMAGE_FORMATS for image outputs, None keeps the format of the input
+quality: Optional[int] = None  # Quality of JPEG and WebP outputs from 1 to 100, None keeps the encoder's default
+compression: int = DEFAULT_COMPRESSION  # Compression level of PNG outputs
+writer_threads: int = WRITER_THREADS  # Threads saving image outputs in the background, 0 saves them before moving on
+
+
+def set_output_options(format_name: Optional[str] = None, quality_value: Optional[int] = None,
+                       compression_value: int = DEFAULT_COMPRESSION, threads: int = WRITER_THREADS) -> None:
+    """Sets the format and encoder settings of image outputs.
+
+    Args:
+        format_name: One of IMAGE_FORMATS, or None to keep the format of each input.
+        quality_value: Quality of JPEG and WebP outputs from 1 to 100, or None for the encoder's default.
+        compression_value: Compression level of PNG outputs from 0 to 9.
+        threads: Threads saving image outputs in the background, 0 saves each output before moving on.
+    """
+    global output_format, quality, compression, writer_threads
+    output_format = format_name
+    quality = quality_value
+    compression = compression_value
+    writer_threads = threads
+
+def output_options() -> Dict[str, Any]:
+    """Gets the settings image outputs are encoded with, as recorded in the build manifest.
+
+    Returns:
+        The format, quality and compression level.
+    """
+    return {"format": output_format, "quality": quality, "compression": compression}
+
+def image_output_name(file_name: str) -> str:
+    """Gets the name an image output is saved under, in the chosen output format.
+
+    Args:
+        file_name: Name of the input image, or of an output named after it.
+
+    Returns:
+        The name with the extension of the output format, unchanged if no format was chosen.
+    """
+    if output_format is None:
+        return file_name
+    return f"{Path(file_name).stem}{IMAGE_FORMATS[output_format]}"
+
+def opencv_params(extension: str) -> List[int]:
+    """Gets the cv2.imwrite and cv2.imencode parameters of a format.
+
+    Args:
+        extension: The lowercase extension of the output, with its dot.
+
+    Returns:
+        The flattened (parameter, value) pairs.
+    """
+    if extension in JPEG_EXTENSIONS:
+        return [cv2.IMWRITE_JPEG_QUALITY, quality or DEFAULT_JPEG_QUALITY]
+    if extension == ".png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, compression]
+    if extension == ".webp" and quality is not None:
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    return []
+
+def pil_params(extension: str) -> Dict[str, Any]:
+    """Gets the Image.save parameters of a format.
+
+    Args:
+        extension: The lowercase extension of the output, with its dot.
+
+    Returns:
+        The keyword arguments of Image.save.
+    """
+    if extension == ".png":
+        return {"compress_level": compression}
+    if extension in JPEG_EXTENSIONS + (".webp",) and quality is not None:
+        return {"quality": quality}
+    return {}
+
+def save_image(image: Image.Image, output_path: Path) -> None:
+    """Encodes an image with the faster of OpenCV and PIL for its format and saves it.
+
+    Lossless formats go through cv2.imencode, which gives the same pixels as PIL in less
+    time. Images with a colour profile are left to PIL, which keeps it. PIL encodes JPEG
+    images as fast as OpenCV and byte for byte the same, so they stay with PIL.
+
+    Args:
+        image: The image to save.
+        output_path: Path of the image file.
+    """
+    extension: str = output_path.suffix.lower()
+    if extension in JPEG_EXTENSIONS and image.mode not in ("L", "RGB", "CMYK"):
+        image = image.convert("RGB")  # Only reached when converting an image with alpha to JPEG
+
+    if extension in OPENCV_EXTENSIONS and image.mode in OPENCV_MODES and "icc_profile" not in image.info:
+        array: np.ndarray = np.asarray(image)
+        if image.mode == "RGB":
+            array = cv2.cvtColor(array, cv2.COLOR_RGB2BGR)
+        elif image.mode == "RGBA":
+            array = cv2.cvtColor(array, cv2.COLOR_RGBA2BGRA)
+        encoded, buffer = cv2.imencode(extension, array, opencv_params(extension))
+        if not encoded:
+            raise OSError(f"Could not encode {output_path}")
+        buffer.tofile(str(output_path))
+        return
+    image.save(output_path, **pil_params(extension))
+
+class ImageWriter:
+    """Saves images on background threads, so the next image is processed while the last ones are encoded.
+
+    At most queue_size images wait to be saved. Submitting another waits until one of them
+    is done, so memory stays bounded however slow the disk is. Errors are collected and
+    reported per input by close, like errors raised while processing.
+    """
+
+    def __init__(self, threads: int = WRITER_THREADS, queue_size: int = WRITER_QUEUE_SIZE):
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="writer")
+        self.slots: threading.Semaphore = threading.Semaphore(queue_size)
+        self.pending: List[Tuple[Path, Future]] = []
+
+    def submit(self, file_path: Path, image: Image.Image, output_path: Path) -> None:
+        """Queues an image to be saved.
+
+        Args:
+            file_path: Path to the input the image was made from, which failures are reported against.
+            image: The image to save. It must not be modified afterwards.
+            output_path: Path of the image file.
+        """
+        self.slots.acquire()
+        future: Future = self.executor.submit(save_image, image, output_path)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.pending.append((file_path, future))
+
+    def close(self) -> List[Tuple[Path, str]]:
+        """Waits for every queued image to be saved and stops the threads.
+
+        Returns:
+            The input path and error message of every input with an image that could not be saved.
+        """
+        self.executor.shutdown(wait=True)
+        errors: Dict[Path, str] = {}
+        for file_path, future in self.pending:
+            error: Optional[BaseException] = future.exception()
+            if error is not None and file_path not in errors:
+                errors[file_path] = f"{type(error).__name__}: {error}"
+        self.pending = []
+        return list(errors.items())
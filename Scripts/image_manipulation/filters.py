@@ -1,7 +1,28 @@
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image, ImageEnhance, ImageFilter, ImageStat
+from typing import List, Tuple
+from functools import lru_cache
+import math
 import numpy as np
 import cv2
 
+POINT_FILTERS: Tuple[str, ...] = ("darkness", "brightness", "intensity")  # Filters that map each pixel value on its own
+TABLE_CACHE_SIZE: int = 256  # Lookup tables kept in memory, one per filter factor and image mean
+ARRAY_MODES: Tuple[str, ...] = ("L", "RGB", "RGBA")  # Image modes that lookup tables and OpenCV kernels apply to per band
+PYRAMID_MIN_SIGMA: float = 4.0  # Large blurs run on a downsampled image while the remaining sigma stays above this
+
+motion_angle: float = 0.0  # Direction of the motion blur in degrees, 0.0 is horizontal
+
+
+def set_motion_angle(angle: float) -> None:
+    """Sets the direction of the motion blur filter.
+
+    Args:
+        angle: The direction in degrees, anticlockwise from horizontal.
+    """
+    global motion_angle
+    motion_angle = angle
+
+
 def darkness_filter(image: Image.Image, strength: float) -> Image.Image:
     """Applies a darkness filter to the image.
     
@@ -12,8 +33,9 @@ def darkness_filter(image: Image.Image, strength: float) -> Image.Image:
     Returns:
         The processed image with the darkness filter applied.
     """
-    enhancer: ImageEnhance.Brightness = ImageEnhance.Brightness(image)
-    return enhancer.enhance(1.0 - strength)
+    if image.mode not in ARRAY_MODES:
+        return ImageEnhance.Brightness(image).enhance(1.0 - strength)
+    return apply_image_table(image, point_table("darkness", strength))
 
 
 def brightness_filter(image: Image.Image, strength: float) -> Image.Image:
@@ -26,8 +48,9 @@ def brightness_filter(image: Image.Image, strength: float) -> Image.Image:
     Returns:
         The processed image with the brightness filter applied.
     """
-    enhancer: ImageEnhance.Brightness = ImageEnhance.Brightness(image)
-    return enhancer.enhance(strength * 2 + 1.0)
+    if image.mode not in ARRAY_MODES:
+        return ImageEnhance.Brightness(image).enhance(strength * 2 + 1.0)
+    return apply_image_table(image, point_table("brightness", strength))
 
 
 def gaussian_blur_filter(image: Image.Image, strength: float) -> Image.Image:
@@ -40,7 +63,9 @@ def gaussian_blur_filter(image: Image.Image, strength: float) -> Image.Image:
     Returns:
         The processed image with the Gaussian blur filter applied.
     """
-    return image.filter(ImageFilter.GaussianBlur(radius=strength * 5))
+    if image.mode not in ARRAY_MODES:
+        return image.filter(ImageFilter.GaussianBlur(radius=strength * 5))
+    return Image.fromarray(gaussian_blur_array(np.array(image), strength))
 
 
 def intensity_filter(image: Image.Image, strength: float) -> Image.Image:
@@ -53,8 +78,11 @@ def intensity_filter(image: Image.Image, strength: float) -> Image.Image:
     Returns:
         The processed image with the contrast filter applied.
     """
-    enhancer: ImageEnhance.Contrast = ImageEnhance.Contrast(image)
-    return enhancer.enhance(strength * 2 + 1)
+    if image.mode not in ARRAY_MODES:
+        return ImageEnhance.Contrast(image).enhance(strength * 2 + 1)
+    # The mean of the greyscale image is the only part that depends on the image contents
+    mean: int = int(ImageStat.Stat(image.convert("L")).mean[0] + 0.5)
+    return apply_image_table(image, point_table("intensity", strength, mean))
 
 
 def motion_blur_filter(image: Image.Image, strength: float) -> Image.Image:
@@ -67,19 +95,244 @@ def motion_blur_filter(image: Image.Image, strength: float) -> Image.Image:
     Returns:
         The processed image with the motion blur filter applied.
     """
-    kernel_size: int = int(strength * image.size[0] / 20)
+    return Image.fromarray(motion_blur_array(np.array(image), strength))
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def blend_table(degenerate: int, factor: float) -> np.ndarray:
+    """Builds the lookup table for blending pixel values with a flat degenerate value the way ImageEnhance does.
+
+    Args:
+        degenerate: The value the image fades to at a factor of 0.0.
+        factor: The enhancement factor, where 1.0 returns the original image.
+
+    Returns:
+        The 256-entry uint8 table, truncated like PIL. It is shared, so it must not be modified.
+    """
+    table: np.ndarray = np.arange(256, dtype=np.float32)
+    table -= np.float32(degenerate)
+    table *= np.float32(factor)
+    table += np.float32(degenerate)
+    table = np.clip(table, 0, 255).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+def point_table(effect_name: str, strength: float, mean: int = 0) -> np.ndarray:
+    """Gets the lookup table for a point filter at the given strength.
+
+    Args:
+        effect_name: One of POINT_FILTERS.
+        strength: Strength of the filter, between 0.0 and 1.0.
+        mean: The mean greyscale value of the image, only used by the intensity filter.
+
+    Returns:
+        The 256-entry uint8 table for the filter.
+    """
+    if effect_name == "darkness":
+        return blend_table(0, 1.0 - strength)
+    if effect_name == "brightness":
+        return blend_table(0, strength * 2 + 1.0)
+    if effect_name == "intensity":
+        return blend_table(mean, strength * 2 + 1)
+    raise ValueError(f"{effect_name} is not a point filter")
+
+
+def apply_image_table(image: Image.Image, table: np.ndarray) -> Image.Image:
+    """Applies a lookup table to the colour bands of an image, keeping alpha as ImageEnhance does.
+
+    Args:
+        image: The image to be processed, in one of ARRAY_MODES.
+        table: The 256-entry table to apply.
+
+    Returns:
+        The processed image.
+    """
+    band_tables: List[int] = []
+    for band in image.getbands():
+        band_tables.extend(table.tolist() if band != "A" else range(256))
+    return image.point(band_tables)
+
+
+def apply_point_filters(image: np.ndarray, steps: List[Tuple[str, float]]) -> np.ndarray:
+    """Applies several point filters to an image array in a single lookup.
+
+    The tables of consecutive filters are combined into one. Intensity depends on the mean
+    of the image it receives, so any filters before it are applied first to measure it.
+
+    Args:
+        image: The image array to be processed.
+        steps: The (filter name, strength) pairs in the order they are applied.
+
+    Returns:
+        The processed image array.
+    """
+    table: np.ndarray = None
+    for effect_name, strength in steps:
+        if effect_name == "intensity":
+            if table is not None:
+                image = cv2.LUT(image, table)
+                table = None
+            step_table: np.ndarray = point_table(effect_name, strength, luma_mean(image))
+        else:
+            step_table = point_table(effect_name, strength)
+        table = step_table if table is None else step_table[table]
+    return image if table is None else cv2.LUT(image, table)
+
+
+def luma_total(image: np.ndarray) -> int:
+    """Sums the greyscale values of an image array, matching PIL's conversion to mode "L".
+
+    Sums of the tiles of an image add up to the sum of the whole image.
+
+    Args:
+        image: The image array with three channels in RGB order.
+
+    Returns:
+        The sum of the luma of every pixel.
+    """
+    channels: np.ndarray = image.reshape(-1, 3)
+    luma: np.ndarray = channels[:, 0] * np.uint32(19595)
+    luma += channels[:, 1] * np.uint32(38470)
+    luma += channels[:, 2] * np.uint32(7471)
+    luma += 0x8000
+    luma >>= 16
+    return int(luma.sum(dtype=np.uint64))
+
+
+def luma_mean(image: np.ndarray) -> int:
+    """Calculates the mean greyscale value of an image array, matching PIL's conversion to mode "L".
+
+    Args:
+        image: The image array with three channels in RGB order.
+
+    Returns:
+        The mean luma rounded to the nearest integer.
+    """
+    return int(luma_total(image) / (image.shape[0] * image.shape[1]) + 0.5)
+
+
+def darkness_array(image: np.ndarray, strength: float) -> np.ndarray:
+    """Applies a darkness filter to an image array, matching darkness_filter.
     
-    if kernel_size < 1:
-        return image  # No blur if intensity is too low
+    Args:
+        image: The image array to be processed.
+        strength: Strength of the darkness effect, between 0.0 and 1.0.
+
+    Returns:
+        The processed image array with the darkness filter applied.
+    """
+    return cv2.LUT(image, point_table("darkness", strength))
+
+
+def brightness_array(image: np.ndarray, strength: float) -> np.ndarray:
+    """Applies a brightness filter to an image array, matching brightness_filter.
     
-    # Create a horizontal motion blur kernel
-    kernel: np.ndarray = np.zeros((kernel_size, kernel_size))
-    kernel[int((kernel_size - 1) / 2), :] = np.ones(kernel_size)
-    kernel = kernel / kernel_size
+    Args:
+        image: The image array to be processed.
+        strength: Strength of the brightness effect, between 0.0 and 1.0.
+
+    Returns:
+        The processed image array with the brightness filter applied.
+    """
+    return cv2.LUT(image, point_table("brightness", strength))
+
+
+def gaussian_blur_array(image: np.ndarray, strength: float) -> np.ndarray:
+    """Applies a Gaussian blur filter to an image array, matching gaussian_blur_filter.
+
+    PIL's blur radius is the standard deviation of the Gaussian, so it is passed to
+    OpenCV as sigma. Edges are extended the same way PIL extends them. Radii of at
+    least twice PYRAMID_MIN_SIGMA are blurred on a downsampled copy and scaled back up.
     
-    # Convert the PIL image to a numpy array to apply cv2 filter and back again
-    image_array: np.ndarray = np.array(image)
-    blurred_array: np.ndarray = cv2.filter2D(image_array, -1, kernel)
-    blurred_image: Image.Image = Image.fromarray(blurred_array)
+    Args:
+        image: The image array to be processed.
+        strength: Strength of the blur effect, affects the radius of the blur.
+
+    Returns:
+        The processed image array with the Gaussian blur filter applied.
+    """
+    radius: float = strength * 5
+    if radius <= 0:
+        return image
+
+    scale: int = 1
+    while radius / (scale * 2) >= PYRAMID_MIN_SIGMA:
+        scale *= 2
+    if scale == 1:
+        return cv2.GaussianBlur(image, (0, 0), radius, borderType=cv2.BORDER_REPLICATE)
+
+    height, width = image.shape[:2]
+    small: np.ndarray = cv2.resize(image, (max(1, round(width / scale)), max(1, round(height / scale))),
+                                   interpolation=cv2.INTER_AREA)
+    # Area downsampling and linear upsampling already spread the image by about scale / 2 pixels
+    sigma: float = math.sqrt(max(radius ** 2 - scale ** 2 / 4, 0.0)) / scale
+    small = cv2.GaussianBlur(small, (0, 0), sigma, borderType=cv2.BORDER_REPLICATE)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def intensity_array(image: np.ndarray, strength: float) -> np.ndarray:
+    """Applies an intensity (contrast) filter to an image array, matching intensity_filter.
     
-    return blurred_image
+    Args:
+        image: The image array to be processed.
+        strength: Strength of the contrast effect, between 0.0 and 1.0.
+
+    Returns:
+        The processed image array with the contrast filter applied.
+    """
+    return cv2.LUT(image, point_table("intensity", strength, luma_mean(image)))
+
+
+def motion_kernel_size(strength: float, width: int) -> int:
+    """Gets the length of the motion blur kernel, which grows with the width of the image.
+
+    Args:
+        strength: Strength of the motion blur effect.
+        width: Width of the image in pixels.
+
+    Returns:
+        The kernel size in pixels, 0 if the blur is too weak to apply.
+    """
+    return int(strength * width / 20)
+
+
+def motion_blur_array(image: np.ndarray, strength: float, angle: float = None, width: int = None) -> np.ndarray:
+    """Applies a motion blur filter to an image array.
+
+    Horizontal blur is a 1-D box filter along each row. Other angles convolve with a
+    line kernel rotated to the given direction.
+    
+    Args:
+        image: The image array to be processed.
+        strength: Strength of the motion blur effect, affects the kernel size.
+        angle: Direction of the blur in degrees. Defaults to the angle set with set_motion_angle.
+        width: Width of the whole image, when the array is one of its tiles. Defaults to the width of the array.
+
+    Returns:
+        The processed image array with the motion blur filter applied.
+    """
+    kernel_size: int = motion_kernel_size(strength, image.shape[1] if width is None else width)
+    angle = motion_angle if angle is None else angle
+    
+    if kernel_size < 1:
+        return image  # No blur if intensity is too low
+
+    if angle % 180 == 0:
+        blurred: np.ndarray = cv2.blur(image, (kernel_size, 1))
+        if kernel_size % 2 == 0:
+            # An even kernel is centred one row below the blurred row, so it picks up the row above
+            shifted: np.ndarray = np.empty_like(blurred)
+            shifted[1:] = blurred[:-1]
+            shifted[0] = blurred[1] if len(blurred) > 1 else blurred[0]
+            blurred = shifted
+        return blurred
+
+    # Rotate a horizontal line kernel to the direction of the blur
+    kernel: np.ndarray = np.zeros((kernel_size, kernel_size), dtype=np.float32)
+    kernel[int((kernel_size - 1) / 2), :] = 1.0
+    centre: Tuple[float, float] = ((kernel_size - 1) / 2, (kernel_size - 1) / 2)
+    kernel = cv2.warpAffine(kernel, cv2.getRotationMatrix2D(centre, angle, 1.0), (kernel_size, kernel_size))
+    kernel /= kernel.sum()
+
+    return cv2.filter2D(image, -1, kernel)
@@ -0,0 +1,220 @@
+from pipeline import sample_interval, sampled_reader
+
+from typing import Any, Callable, Dict, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import cv2
+
+FRAME_CACHE_MAX_BYTES: int = 20 * 1024 ** 3  # Least recently used videos are evicted once the cache grows past this
+FRAMES_SUFFIX: str = ".frames"  # Raw uint8 frames, one after another
+INDEX_SUFFIX: str = ".json"  # Sidecar index with the shape of the frames and the source they were decoded from
+
+frame_cache_dir: Optional[Path] = None  # Directory of the frame cache, None decodes every video each time
+
+
+def set_frame_cache_dir(cache_dir: Optional[Path]) -> None:
+    """Sets the directory decoded video frames are cached in.
+
+    Args:
+        cache_dir: The directory, created when the first video is cached. None disables the cache.
+    """
+    global frame_cache_dir
+    frame_cache_dir = cache_dir
+
+
+def cache_name(file_path: Path, sampled: bool) -> str:
+    """Names the cache entry of a video.
+
+    Args:
+        file_path: Path to the video file.
+        sampled: Whether the entry holds only the frames sent to the models.
+
+    Returns:
+        The file name of the entry without its suffix.
+    """
+    digest: str = hashlib.sha256(str(file_path.resolve()).encode()).hexdigest()[:16]
+    return f"{file_path.stem}-{digest}-{'sampled' if sampled else 'full'}"
+
+
+def load_cached(cache_dir: Path, file_path: Path, sampled: bool) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+    """Maps the cached frames of a video, if they were decoded from its current contents.
+
+    Args:
+        cache_dir: Directory of the frame cache.
+        file_path: Path to the video file.
+        sampled: Whether only the frames sent to the models are wanted.
+
+    Returns:
+        The read-only (frames, height, width, 3) array and the index, or None if the video is not cached.
+        Sampled frames are also served from an entry holding every frame.
+    """
+    stat = file_path.stat()
+    for entry_sampled in ((True, False) if sampled else (False,)):
+        index_path: Path = cache_dir / f"{cache_name(file_path, entry_sampled)}{INDEX_SUFFIX}"
+        try:
+            with open(index_path) as file:
+                index: Dict[str, Any] = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+            continue  # The video changed since it was cached
+        shape: Tuple[int, ...] = tuple(index["shape"])
+        frames: np.ndarray = np.memmap(index_path.with_suffix(FRAMES_SUFFIX), dtype=np.uint8, mode="r", shape=shape) \
+            if shape[0] else np.empty(shape, dtype=np.uint8)
+        os.utime(index_path)  # Marks the entry as recently used
+        if sampled and not entry_sampled:
+            frames = frames[::sample_interval(index["fps"])]
+        return frames, index
+    return None
+
+
+def prune_cache(cache_dir: Path, max_bytes: int = FRAME_CACHE_MAX_BYTES) -> None:
+    """Deletes the least recently used entries until the cache fits in max_bytes.
+
+    Args:
+        cache_dir: Directory of the frame cache.
+        max_bytes: The largest total size of the cached frames.
+    """
+    times: Dict[Path, float] = {}
+    sizes: Dict[Path, int] = {}
+    for index_path in cache_dir.glob(f"*{INDEX_SUFFIX}"):
+        try:
+            times[index_path] = index_path.stat().st_mtime
+            sizes[index_path] = index_path.with_suffix(FRAMES_SUFFIX).stat().st_size
+        except FileNotFoundError:
+            continue  # Evicted by another process sharing the cache
+    entries = sorted(times, key=times.get)
+    total: int = sum(sizes.values())
+    for index_path in entries:
+        if total <= max_bytes:
+            break
+        total -= sizes.get(index_path, 0)
+        index_path.unlink(missing_ok=True)
+        index_path.with_suffix(FRAMES_SUFFIX).unlink(missing_ok=True)
+
+
+class FrameSource:
+    """Reads the frames of a video, or only those sent to the models, from the frame cache when it holds them.
+
+    Otherwise the video is decoded, and with a cache directory every frame read is also
+    appended to a new cache entry. The entry is only kept if the whole video was read,
+    so the next run on the same video skips decoding entirely. Each reader writes to its
+    own temporary file, so processes decoding the same video into a shared cache do not
+    clash. Videos whose frames would not fit in FRAME_CACHE_MAX_BYTES are not cached, and
+    caching stops without failing the video if the disk fills up.
+    """
+
+    def __init__(self, file_path: Path, sampled: bool = False, cache_dir: Optional[Path] = None):
+        self.file_path: Path = file_path
+        self.sampled: bool = sampled
+        self.cache_dir: Optional[Path] = cache_dir
+        self.frames: Optional[np.ndarray] = None  # Cached frames, read without copying
+        self.position: int = 0
+        self.cap: Optional[cv2.VideoCapture] = None
+        self.cache_file = None
+        self.temp_path: Optional[str] = None
+        self.count: int = 0
+        self.shape: Tuple[int, ...] = ()
+        self.finished: bool = False
+
+        cached = load_cached(cache_dir, file_path, sampled) if cache_dir is not None else None
+        if cached is not None:
+            self.frames, index = cached
+            self.fps: float = index["fps"]
+            self.size: Tuple[int, int] = (index["width"], index["height"])
+            return
+
+        self.cap = cv2.VideoCapture(str(file_path))
+        if not self.cap.isOpened():
+            raise IOError(f"Error opening video file {file_path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.decode: Callable[[], Optional[np.ndarray]] = sampled_reader(self.cap, sample_interval(self.fps) if sampled else 1)
+        frame_count: float = max(self.cap.get(cv2.CAP_PROP_FRAME_COUNT), 0) / (sample_interval(self.fps) if sampled else 1)
+        if cache_dir is not None and frame_count * self.size[0] * self.size[1] * 3 <= FRAME_CACHE_MAX_BYTES:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self.entry_path: Path = cache_dir / cache_name(file_path, sampled)
+            descriptor, self.temp_path = tempfile.mkstemp(dir=cache_dir, prefix=f"{self.entry_path.name}.", suffix=f"{FRAMES_SUFFIX}.tmp")
+            self.cache_file = os.fdopen(descriptor, "wb")
+
+    @property
+    def cached(self) -> bool:
+        """Whether the frames come from the cache instead of the decoder."""
+        return self.frames is not None
+
+    def read(self) -> Optional[np.ndarray]:
+        """Reads the next frame.
+
+        Returns:
+            The frame in BGR order, or None at the end of the video. Cached frames are read-only views.
+        """
+        if self.frames is not None:
+            if self.position >= len(self.frames):
+                return None
+            self.position += 1
+            return self.frames[self.position - 1]
+
+        frame: Optional[np.ndarray] = self.decode()
+        if frame is None:
+            self.finished = True
+        elif self.cache_file is not None:
+            if (self.count + 1) * frame.nbytes > FRAME_CACHE_MAX_BYTES:
+                self.discard_entry()  # The frame count was wrong and the video would not fit after all
+                return frame
+            try:
+                self.cache_file.write(np.ascontiguousarray(frame).data)
+            except OSError:
+                self.discard_entry()  # The disk is full, the video is still processed without caching it
+                return frame
+            self.count += 1
+            self.shape = frame.shape
+        return frame
+
+    def discard_entry(self) -> None:
+        """Stops caching the video and deletes the frames written so far."""
+        if self.cache_file is None:
+            return
+        try:
+            self.cache_file.close()
+        except OSError:
+            pass  # Flushing the last frames fails the same way when the disk is full
+        os.remove(self.temp_path)
+        self.cache_file = None
+
+    def close(self) -> None:
+        """Releases the video and, if every frame was read, stores the new cache entry."""
+        if self.cap is not None:
+            self.cap.release()
+        if self.cache_file is None:
+            return
+        if not self.finished or load_cached(self.cache_dir, self.file_path, self.sampled) is not None:
+            self.discard_entry()  # Only part of the video was read, or another process cached it first
+            return
+        try:
+            self.cache_file.close()
+        except OSError:
+            self.discard_entry()
+            return
+        self.cache_file = None
+        stat = self.file_path.stat()
+        index: Dict[str, Any] = {
+            "source": str(self.file_path.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sampled": self.sampled,
+            "fps": self.fps,
+            "width": self.size[0],
+            "height": self.size[1],
+            "shape": [self.count, *(self.shape or (self.size[1], self.size[0], 3))],
+        }
+        os.replace(self.temp_path, f"{self.entry_path}{FRAMES_SUFFIX}")
+        # The index is written last, so an entry without one is never read
+        descriptor, index_temp = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{self.entry_path.name}.", suffix=f"{INDEX_SUFFIX}.tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(index, file)
+        os.replace(index_temp, f"{self.entry_path}{INDEX_SUFFIX}")
+        prune_cache(self.cache_dir)
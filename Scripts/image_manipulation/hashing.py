@@ -0,0 +1,21 @@
+from pathlib import Path
+import hashlib
+
+HASH_CHUNK_SIZE: int = 1024 * 1024  # Bytes read at a time when hashing a file
+
+
+def hash_file(file_path: Path, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """Computes the SHA-256 of a file's contents without loading it into memory.
+
+    Args:
+        file_path: The path to the file.
+        chunk_size: The number of bytes read at a time.
+
+    Returns:
+        The hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
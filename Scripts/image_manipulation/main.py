@@ -1,39 +1,72 @@
 import argparse
 from PIL import Image
-from filters import (
-    darkness_filter, 
-    brightness_filter, 
-    gaussian_blur_filter, 
-    intensity_filter, 
-    motion_blur_filter
+import filters
+from filters import set_motion_angle
+
+from effects import (
+    FILTERS,
+    OVERLAYS,
+    Variant,
+    parse_chain,
+    parse_strengths,
+    effect_variants,
+    variants_effect,
+    apply_image_effect
+)
+
+from pipeline import (
+    run_pipeline,
+    format_stats,
+    sample_interval,
+    StageStats
+)
+
+from manifest import (
+    load_manifest,
+    save_manifest,
+    plan_builds,
+    built_outputs
 )
 
-from overlay import (
-    process_image_overlay
+from watch import watch
+import frame_cache
+from frame_cache import FrameSource, set_frame_cache_dir
+from tiles import process_image_tiles
+import overlay
+from overlay import set_animate_overlays
+import encoders
+from encoders import (
+    ImageWriter,
+    save_image,
+    set_output_options,
+    image_output_name,
+    IMAGE_FORMATS,
+    DEFAULT_COMPRESSION,
+    WRITER_THREADS
+)
+import profiling
+from profiling import (
+    set_profiling,
+    start_profile,
+    finish_profile,
+    profile_file,
+    stage,
+    PROFILERS
 )
 
-from typing import Callable, Dict, Tuple, Iterator
+from typing import Any, Callable, Dict, Tuple, Iterable, Iterator, List, Optional
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import time
 import cv2
 import numpy as np
 
-FILTERS: Dict[str, Callable[[Image.Image, float], Image.Image]] = {
-    "darkness": darkness_filter,
-    "brightness": brightness_filter,
-    "gaussian": gaussian_blur_filter,
-    "intensity": intensity_filter,
-    "motion": motion_blur_filter,
-}
-
-# Define overlay paths
-OVERLAYS = {
-    "rain": Path("overlay_images/rain.png"),
-    "fog": Path("overlay_images/fog.png"),
-    "graffiti": Path("overlay_images/graffiti.png"),
-    "lens-flare": Path("overlay_images/lens_flare.png"),
-    "wet-filter": Path("overlay_images/wet_filter.png")
-}
-
 IMAGE_EXTENSIONS: Tuple[str, ...] = (
     '.jpg', '.jpeg', '.png', '.bmp', '.gif', 
     '.tiff', '.tif', '.webp', '.heic', '.heif'
@@ -43,6 +76,60 @@ VIDEO_EXTENSIONS: Tuple[str, ...] = (
     '.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv'
 )
 
+VIDEO_CODEC: str = 'mp4v'
+SAMPLE_EXTENSION: str = '.jpg'  # Format of the sampled frames, the one the api sends to the models
+LOSSLESS_CODEC: Tuple[str, str] = ('HFYU', '.avi')  # Segments that are re-encoded when joined, so they are not compressed twice
+
+IMAGE_CHUNK_SIZE: int = 8  # Images sent to a worker process at a time, videos are always sent alone
+MIN_SEGMENT_FRAMES: int = 100  # Shortest segment worth the cost of seeking, joining and starting a process
+PROFILE_DIR_NAME: str = "profile"  # Kept in the output directory when profiling
+
+def effect_chain(value: str) -> str:
+    """Checks an effect or effect chain given on the command line.
+
+    Args:
+        value: The effect argument.
+
+    Returns:
+        The effect argument unchanged.
+
+    Raises:
+        argparse.ArgumentTypeError: If an effect is unknown or a strength is not a number.
+    """
+    try:
+        parse_chain(value, 0.0)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+def effect_list(value: str) -> List[str]:
+    """Checks a comma-separated list of effects or effect chains given on the command line.
+
+    Args:
+        value: The effects argument.
+
+    Returns:
+        The effects in the order given.
+    """
+    return [effect_chain(effect_name) for effect_name in value.split(",") if effect_name]
+
+def strength_range(value: str) -> List[float]:
+    """Checks a range or list of strengths given on the command line.
+
+    Args:
+        value: The strengths argument.
+
+    Returns:
+        The strengths in the order given.
+
+    Raises:
+        argparse.ArgumentTypeError: If the strengths cannot be parsed.
+    """
+    try:
+        return parse_strengths(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
 def parse_arguments() -> argparse.Namespace:
     """Parses command-line arguments for applying filters to an image or video.
     
@@ -55,20 +142,103 @@ def parse_arguments() -> argparse.Namespace:
                         help="Path to the input directory or file."
     )
     parser.add_argument("effect",
-                        type=str,
-                        choices=list(FILTERS.keys()) + list(OVERLAYS.keys()),
-                        help="Which filter or overlay will be applied to the image or video."
+                        type=effect_chain,
+                        nargs="?",
+                        help="Which filter or overlay will be applied to the image or video, from "
+                             f"{', '.join(list(FILTERS.keys()) + list(OVERLAYS.keys()))}. Join several with '+' to apply "
+                             "them in one pass, optionally with their own strength, e.g. fog+motion@0.3+darkness@0.6."
     )
     parser.add_argument("-s", "--strength",
                         type=float,
                         default=0.5,
                         help="If a filter is chosen, the strength of the filter from 0.0 to 1.0. Default is 0.5."
     )
+    parser.add_argument("--effects",
+                        type=effect_list,
+                        help="Comma-separated effects or effect chains to sweep instead of a single effect, e.g. darkness,gaussian,rain."
+    )
+    parser.add_argument("--strengths",
+                        type=strength_range,
+                        help="Strengths to sweep as start:stop:step (inclusive) or a comma-separated list, e.g. 0.1:1.0:0.1. "
+                             "Each output is named {effect}@{strength}_{file name}."
+    )
     parser.add_argument("-o", "--output_path",
                         type=str,
                         default="Output",
                         help="Optional output directory to save processed files. Default is './Output'."
     )
+    parser.add_argument("-a", "--angle",
+                        type=float,
+                        default=0.0,
+                        help="If the motion filter is chosen, the direction of the blur in degrees. Default is 0.0 (horizontal)."
+    )
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=1,
+                        help="Number of worker processes. 0 uses every core. Default is 1."
+    )
+    parser.add_argument("--segments",
+                        type=int,
+                        default=1,
+                        help="Number of time segments each video is split into and processed in parallel. 0 uses every core. Default is 1."
+    )
+    parser.add_argument("--sampled",
+                        action="store_true",
+                        help="Only process the video frames sent to the models, one per second, and save them as images "
+                             "named {effect}_{video name}_{frame}.jpg instead of re-encoding the whole video."
+    )
+    parser.add_argument("--frame-cache",
+                        type=Path,
+                        help="Directory to cache decoded video frames in, so later runs on the same videos skip decoding."
+    )
+    parser.add_argument("--animate-overlays",
+                        action="store_true",
+                        help="Make rain and wet-filter overlays fall across videos instead of staying still, cycling "
+                             "through positions precomputed once per video size."
+    )
+    parser.add_argument("--tile-size",
+                        type=int,
+                        default=0,
+                        help="Process images larger than this many pixels across in tiles of this size, so memory use is "
+                             "bounded by the tile size rather than the image size. Default is 0, which processes whole images."
+    )
+    parser.add_argument("--format",
+                        choices=IMAGE_FORMATS,
+                        help="Format to save processed images in. Default is the format of each input image."
+    )
+    parser.add_argument("--quality",
+                        type=int,
+                        help="Quality of JPEG and WebP outputs from 1 to 100. Default is the encoder's, 75 for JPEG."
+    )
+    parser.add_argument("--compression",
+                        type=int,
+                        default=DEFAULT_COMPRESSION,
+                        help=f"Compression level of PNG outputs from 0 (fastest) to 9 (smallest). Default is {DEFAULT_COMPRESSION}."
+    )
+    parser.add_argument("--writers",
+                        type=int,
+                        default=WRITER_THREADS,
+                        help="Number of threads saving processed images in the background while the next ones are processed. "
+                             f"0 saves each image before moving on. Default is {WRITER_THREADS}."
+    )
+    parser.add_argument("--profile",
+                        action="store_true",
+                        help=f"Record the wall time of each stage of every file, print a summary table and save it with a "
+                             f"JSON trace to the {PROFILE_DIR_NAME} folder of the output directory."
+    )
+    parser.add_argument("--profiler",
+                        choices=PROFILERS,
+                        help="Also run every file under cProfile or tracemalloc, saving the merged statistics or the peak "
+                             "memory of each file with the profile. Implies --profile."
+    )
+    parser.add_argument("--force",
+                        action="store_true",
+                        help="Rebuild every output, even those already built from the same input, effect, strength and code."
+    )
+    parser.add_argument("--watch",
+                        action="store_true",
+                        help="Keep running and process new or changed files in the input directory as they arrive."
+    )
     parser.add_argument("-v", "--verbose",
                         action="store_true",
                         help="Enable verbose output."
@@ -97,6 +267,22 @@ def directory_iterator(directory: Path, verbose: bool = False) -> Iterator[Path]
                     print(f"Processing file: {path}")
                 yield path
 
+def output_path_for(file_path: Path, variant_name: str, output_dir: Path) -> Path:
+    """Builds the path a processed file is saved to.
+
+    Args:
+        file_path: Path to the input file.
+        variant_name: Name of the effect variant, used as the prefix of the file name.
+        output_dir: Directory where processed files are saved.
+
+    Returns:
+        The output path. Images are saved in the chosen output format.
+    """
+    output_name: str = f"{variant_name}_{file_path.name}"
+    if file_path.suffix.lower() in IMAGE_EXTENSIONS:
+        output_name = image_output_name(output_name)
+    return output_dir / output_name
+
 def process_image(file_path: Path, effect_name: str, strength: float, output_dir: Path, verbose: bool = False) -> None:
     """Applies the given effect to an image and saves it to the specified output directory.
     
@@ -107,25 +293,55 @@ def process_image(file_path: Path, effect_name: str, strength: float, output_dir
         output_dir: Directory where the processed image will be saved.
         verbose: Whether to print detailed output during processing.
     """
+    process_image_variants(file_path, effect_variants([effect_name], [strength]), output_dir, verbose)
+
+def process_image_variants(file_path: Path, variants: List[Variant], output_dir: Path, verbose: bool = False, tile_size: int = 0,
+                           writer: Optional[ImageWriter] = None) -> None:
+    """Applies every effect variant to an image, decoding it once, and saves each result.
+
+    Args:
+        file_path: Path to the input image file.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed images will be saved.
+        verbose: Whether to print detailed output during processing.
+        tile_size: Width and height of the tiles images larger than one tile are processed in. 0 processes whole images.
+        writer: Saves the processed images in the background. None saves them before returning.
+    """
     output_dir.mkdir(parents=True, exist_ok=True)  # Create output directory if it doesn't exist
-    output_path = output_dir / f"{effect_name}_{file_path.name}"
 
     image: Image.Image = Image.open(file_path)
+    if tile_size and max(image.size) > tile_size:
+        image.close()
+        if verbose:
+            print(f"Applying {len(variants)} effects to image {file_path} in tiles of {tile_size} pixels")
+        output_paths: List[Path] = [output_path_for(file_path, variant[0], output_dir) for variant in variants]
+        with stage("tiles"):
+            process_image_tiles(file_path, variants, output_paths, tile_size)
+        if verbose:
+            print(f"Saved processed images to {', '.join(str(path) for path in output_paths)}")
+        return
+    with stage("decode"):
+        image.load()  # Decode once for every variant
 
-    if effect_name in FILTERS:
-        filter_func: Callable[[Image.Image, float], Image.Image] = FILTERS[effect_name]
+    # Each result is saved, or queued for the writer, before the next is made, so a sweep does not hold every variant
+    for variant_name, effect_name, strength in variants:
         if verbose:
             print(f"Applying {effect_name} effect to image {file_path} with strength {strength}")
-        image = filter_func(image, strength)
-    elif effect_name in OVERLAYS:
-        if verbose:
-            print(f"Applying {effect_name} effect to image {file_path}")
-        image = process_image_overlay(image, effect_name, OVERLAYS[effect_name])
-    
-    image.save(output_path)
+        with stage("effect"):
+            processed_image: Image.Image = apply_image_effect(image, effect_name, strength)
 
-    if verbose:
-        print(f"Saved processed image to {output_path}")
+        output_path: Path = output_path_for(file_path, variant_name, output_dir)
+        if writer is not None:
+            with stage("encode queue"):
+                writer.submit(file_path, processed_image, output_path)
+            if verbose:
+                print(f"Saving processed image to {output_path}")
+            continue
+        with stage("encode"):
+            save_image(processed_image, output_path)
+
+        if verbose:
+            print(f"Saved processed image to {output_path}")
 
 def process_video(file_path: Path, effect_name: str, strength: float, output_dir: Path, verbose: bool = False) -> None:
     """Applies the given effect to a video and saves it to the specified output directory.
@@ -137,54 +353,538 @@ def process_video(file_path: Path, effect_name: str, strength: float, output_dir
         output_dir: Directory where the processed video will be saved.
         verbose: Whether to print detailed output during processing.
     """
-    cap = cv2.VideoCapture(str(file_path))
-    if not cap.isOpened():
-        print(f"Error opening video file {file_path}")
+    process_video_variants(file_path, effect_variants([effect_name], [strength]), output_dir, verbose)
+
+def open_writers(output_paths: List[Path], codec: str, fps: float, size: Tuple[int, int]) -> List[cv2.VideoWriter]:
+    """Opens a video writer for each output path.
+
+    Args:
+        output_paths: Paths the videos will be saved to.
+        codec: FourCC of the codec the videos are encoded with.
+        fps: Frame rate of the videos.
+        size: The (width, height) of the videos.
+
+    Returns:
+        The writers, in the order of output_paths.
+    """
+    fourcc: int = cv2.VideoWriter_fourcc(*codec)
+    return [cv2.VideoWriter(str(output_path), fourcc, fps, size) for output_path in output_paths]
+
+def write_variants(writers: List[cv2.VideoWriter]) -> Callable[[List[np.ndarray]], None]:
+    """Gets the function writing one processed frame of every variant to its writer.
+
+    Args:
+        writers: The writers, in the order of the variants.
+
+    Returns:
+        A function taking the processed frames of every variant.
+    """
+    def write_frames(frames: List[np.ndarray]) -> None:
+        for writer, frame in zip(writers, frames):
+            writer.write(frame)
+    return write_frames
+
+def process_video_variants(file_path: Path, variants: List[Variant], output_dir: Path, verbose: bool = False) -> None:
+    """Applies every effect variant to a video, decoding each frame once, and saves each result.
+
+    Args:
+        file_path: Path to the input video file.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed videos will be saved.
+        verbose: Whether to print detailed output during processing.
+    """
+    try:
+        with stage("open"):
+            source: FrameSource = FrameSource(file_path, cache_dir=frame_cache.frame_cache_dir)
+    except IOError as e:
+        print(e)
         return
 
-    fps: int = int(cap.get(cv2.CAP_PROP_FPS))
-    width: int = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height: int = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps: float = source.fps  # Kept fractional so 29.97 fps footage keeps its timing
 
     output_dir.mkdir(parents=True, exist_ok=True)  # Create output directory if it doesn't exist
-    output_path = output_dir / f"{effect_name}_{file_path.name}"
-
-    fourcc: int = cv2.VideoWriter_fourcc(*'mp4v')
-    out: cv2.VideoWriter = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+    output_paths: List[Path] = [output_path_for(file_path, variant_name, output_dir) for variant_name, _, _ in variants]
+    with stage("open"):
+        writers: List[cv2.VideoWriter] = open_writers(output_paths, VIDEO_CODEC, fps, source.size)
 
-    if effect_name in FILTERS:
-        if verbose:
+    if verbose:
+        for _, effect_name, strength in variants:
             print(f"Applying {effect_name} effect to video {file_path} with strength {strength}")
-    elif effect_name in OVERLAYS:
-        if verbose:
-            print(f"Applying {effect_name} effect to video {file_path}")
 
-    filter_func = FILTERS.get(effect_name)
-    overlay_path = OVERLAYS.get(effect_name)
+    start: float = time.perf_counter()
+    try:
+        stats: List[StageStats] = run_pipeline(source.read, variants_effect(variants), write_variants(writers), first_frame=0)
+    finally:
+        with stage("close"):
+            source.close()
+            for writer in writers:
+                writer.release()
 
-    ret: bool
-    frame: np.ndarray
-    ret, frame = cap.read()
-    while ret:
-        pil_image: Image.Image = Image.fromarray(frame)
+    if verbose:
+        print(f"Pipeline for {file_path.name}{' from the frame cache' if source.cached else ''}: "
+              f"{format_stats(stats, time.perf_counter() - start)}")
+        for output_path in output_paths:
+            print(f"Saved processed video to {output_path}")
+
+def process_video_samples(file_path: Path, variants: List[Variant], output_dir: Path, verbose: bool = False) -> None:
+    """Applies every effect variant to the frames of a video sent to the models and saves them as images.
+
+    Frames are sampled like encode_video in the api, one per second, so the frames in
+    between are never filtered or encoded. The sampled frames are numbered from 1, as
+    in the custom IDs of batch requests.
+
+    Args:
+        file_path: Path to the input video file.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the sampled frames will be saved.
+        verbose: Whether to print detailed output during processing.
+    """
+    try:
+        with stage("open"):
+            source: FrameSource = FrameSource(file_path, sampled=True, cache_dir=frame_cache.frame_cache_dir)
+    except IOError as e:
+        print(e)
+        return
+
+    interval: int = sample_interval(source.fps)
+    output_dir.mkdir(parents=True, exist_ok=True)  # Create output directory if it doesn't exist
+    if verbose:
+        for _, effect_name, strength in variants:
+            print(f"Applying {effect_name} effect to one frame in {interval} of video {file_path} with strength {strength}")
+
+    frame_number: List[int] = [0]
+
+    def write_frames(frames: List[np.ndarray]) -> None:
+        frame_number[0] += 1
+        for (variant_name, _, _), frame in zip(variants, frames):
+            output_path: Path = output_dir / f"{variant_name}_{file_path.stem}_{frame_number[0]}{SAMPLE_EXTENSION}"
+            if not cv2.imwrite(str(output_path), frame):
+                raise IOError(f"Could not write {output_path}")
+
+    start: float = time.perf_counter()
+    try:
+        stats: List[StageStats] = run_pipeline(source.read, variants_effect(variants), write_frames, first_frame=0, frame_step=interval)
+    finally:
+        with stage("close"):
+            source.close()
 
-        if filter_func:
-            filtered_image: Image.Image = filter_func(pil_image, strength)
-        elif overlay_path:
-            filtered_image: Image.Image = process_image_overlay(pil_image, effect_name, overlay_path)
-        else:
-            raise ValueError(f"Unknown effect: {effect_name}")
+    if verbose:
+        print(f"Pipeline for {file_path.name}{' from the frame cache' if source.cached else ''}: "
+              f"{format_stats(stats, time.perf_counter() - start)}")
+        print(f"Saved {frame_number[0]} sampled frames of each variant to {output_dir}")
+
+def seek_video(file_path: Path, start_frame: int) -> Tuple[cv2.VideoCapture, Optional[np.ndarray]]:
+    """Opens a video and reads the frame at start_frame, as reading the video from the start would give it.
 
-        cv_image: np.ndarray = np.array(filtered_image)
+    OpenCV seeks by frame number through the nearest keyframe, which can land a few frames
+    away on long-GOP or B-frame video while still reporting the requested position. The
+    timestamp of the first decoded frame is checked instead, and if it is not the one of
+    start_frame the video is opened again and decoded from the start up to start_frame.
+
+    Args:
+        file_path: Path to the video file.
+        start_frame: Index of the frame to read first.
 
-        out.write(cv_image)
+    Returns:
+        The open capture, positioned after the frame, and the frame, or None if the video ends before it.
+    """
+    cap = cv2.VideoCapture(str(file_path))
+    if not cap.isOpened():
+        raise IOError(f"Error opening video file {file_path}")
+    if start_frame:
+        fps: float = cap.get(cv2.CAP_PROP_FPS)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
         ret, frame = cap.read()
+        # Timestamps are within half a frame of the frame they belong to
+        if ret and fps > 0 and abs(cap.get(cv2.CAP_PROP_POS_MSEC) - start_frame * 1000 / fps) < 500 / fps:
+            return cap, frame
+        cap.release()
+        cap = cv2.VideoCapture(str(file_path))
+        for _ in range(start_frame):
+            if not cap.grab():
+                return cap, None
+    ret, frame = cap.read()
+    return cap, frame if ret else None
+
+def process_segment(file_path: Path, variants: List[Variant], segment_paths: List[Path], codec: str, start_frame: int, frame_count: Optional[int]) -> int:
+    """Applies every effect variant to one time segment of a video and saves each as its own video.
 
+    Args:
+        file_path: Path to the input video file.
+        variants: The (name, effect, strength) variants to apply.
+        segment_paths: Paths the processed segment of each variant will be saved to.
+        codec: FourCC of the codec the segments are encoded with.
+        start_frame: Index of the first frame of the segment.
+        frame_count: Number of frames in the segment, or None to read until the end of the video.
+
+    Returns:
+        The number of frames written per variant.
+    """
+    with profile_file(f"{file_path} from frame {start_frame}"):
+        cap, first = seek_video(file_path, start_frame)
+        size: Tuple[int, int] = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        writers: List[cv2.VideoWriter] = open_writers(segment_paths, codec, cap.get(cv2.CAP_PROP_FPS), size)
+        pending: List[Optional[np.ndarray]] = [first]
+
+        def read_frame() -> Optional[np.ndarray]:
+            if pending:
+                return pending.pop()
+            ret, frame = cap.read()
+            return frame if ret else None
+
+        try:
+            stats: List[StageStats] = run_pipeline(read_frame, variants_effect(variants), write_variants(writers), max_frames=frame_count, first_frame=start_frame)
+        finally:
+            cap.release()
+            for writer in writers:
+                writer.release()
+        return stats[-1].frames
+
+def join_segments(segment_paths: List[Path], output_path: Path, fps: float, size: Tuple[int, int], ffmpeg: Optional[str]) -> None:
+    """Joins processed video segments into one video, in order.
+
+    With ffmpeg the segments are concatenated without re-encoding. Otherwise their
+    frames are decoded and written to the output again.
+
+    Args:
+        segment_paths: Paths to the segments in playback order.
+        output_path: Path the joined video will be saved to.
+        fps: Frame rate of the video.
+        size: The (width, height) of the video.
+        ffmpeg: Path to the ffmpeg executable, or None if it is not installed.
+    """
+    if ffmpeg:
+        list_path: Path = segment_paths[0].parent / "segments.txt"
+        list_path.write_text("".join(f"file '{path.resolve()}'\n" for path in segment_paths))
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", str(list_path),
+                        "-c", "copy", str(output_path)], check=True)
+        return
+
+    out = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*VIDEO_CODEC), fps, size)
+    try:
+        for segment_path in segment_paths:
+            cap = cv2.VideoCapture(str(segment_path))
+            ret, frame = cap.read()
+            while ret:
+                out.write(frame)
+                ret, frame = cap.read()
+            cap.release()
+    finally:
+        out.release()
+
+def process_video_segments(file_path: Path, variants: List[Variant], output_dir: Path, segments: int, verbose: bool = False) -> None:
+    """Applies every effect variant to a video by splitting it into time segments processed in parallel.
+
+    Each segment seeks to its first frame in its own process and is saved separately, and
+    the segments are then joined in order. The last segment reads until the end of the
+    video, so the output has every input frame even if the container's frame count is off.
+    Without ffmpeg to join them as they are, segments are saved losslessly and encoded
+    once when joined, giving the same output as processing the video whole.
+
+    Args:
+        file_path: Path to the input video file.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed videos will be saved.
+        segments: Number of segments and worker processes. 0 uses every core.
+        verbose: Whether to print detailed output during processing.
+    """
+    cap = cv2.VideoCapture(str(file_path))
+    if not cap.isOpened():
+        print(f"Error opening video file {file_path}")
+        return
+    fps: float = cap.get(cv2.CAP_PROP_FPS)
+    size: Tuple[int, int] = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    total_frames: int = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     cap.release()
-    out.release()
 
+    segments = min(segments or os.cpu_count() or 1, max(total_frames // MIN_SEGMENT_FRAMES, 1))
+    if segments <= 1:
+        process_video_variants(file_path, variants, output_dir, verbose)
+        return
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_paths: List[Path] = [output_path_for(file_path, variant_name, output_dir) for variant_name, _, _ in variants]
+    bounds: List[int] = [total_frames * i // segments for i in range(segments + 1)]
     if verbose:
-        print(f"Saved processed video to {output_path}")
+        for _, effect_name, strength in variants:
+            print(f"Applying {effect_name} effect to video {file_path} with strength {strength} in {segments} segments")
+
+    ffmpeg: Optional[str] = shutil.which("ffmpeg")
+    codec, suffix = (VIDEO_CODEC, file_path.suffix) if ffmpeg else LOSSLESS_CODEC
+
+    start: float = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=output_dir) as segment_dir:
+        # segment_paths[i][v] is segment i of variant v
+        segment_paths: List[List[Path]] = [
+            [Path(segment_dir) / f"segment_{i:04d}_{v}{suffix}" for v in range(len(variants))] for i in range(segments)
+        ]
+        with ProcessPoolExecutor(max_workers=segments, initializer=init_worker, initargs=worker_settings()) as executor:
+            futures = [
+                executor.submit(process_segment, file_path, variants, segment_paths[i], codec, bounds[i],
+                                bounds[i + 1] - bounds[i] if i < segments - 1 else None)
+                for i in range(segments)
+            ]
+            frame_counts: List[int] = [future.result() for future in futures]
+
+        for i, frame_count in enumerate(frame_counts[:-1]):
+            if frame_count != bounds[i + 1] - bounds[i]:
+                raise IOError(f"Segment {i} of {file_path} has {frame_count} frames instead of {bounds[i + 1] - bounds[i]}")
+        with stage("join"):
+            for v, output_path in enumerate(output_paths):
+                join_segments([paths[v] for paths in segment_paths], output_path, fps, size, ffmpeg)
+
+    if verbose:
+        elapsed: float = time.perf_counter() - start
+        for output_path in output_paths:
+            print(f"Saved processed video to {output_path}: {sum(frame_counts)} frames in {elapsed:.1f}s")
+
+def process_file(file_path: Path, variants: List[Variant], output_dir: Path, verbose: bool = False, sampled: bool = False, tile_size: int = 0,
+                 writer: Optional[ImageWriter] = None) -> None:
+    """Applies every effect variant to an image or video depending on its extension.
+
+    Args:
+        file_path: Path to the input file.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed files will be saved.
+        verbose: Whether to print detailed output during processing.
+        sampled: Whether only the video frames sent to the models are processed.
+        tile_size: Width and height of the tiles large images are processed in. 0 processes whole images.
+        writer: Saves processed images in the background. None saves them before returning.
+    """
+    file_extension = file_path.suffix.lower()
+
+    if file_extension in VIDEO_EXTENSIONS and sampled:
+        process_video_samples(file_path, variants, output_dir, verbose)
+    elif file_extension in VIDEO_EXTENSIONS:
+        process_video_variants(file_path, variants, output_dir, verbose)
+    elif file_extension in IMAGE_EXTENSIONS:
+        process_image_variants(file_path, variants, output_dir, verbose, tile_size, writer)
+
+def process_chunk(file_paths: List[Path], variants: List[Variant], output_dir: Path, verbose: bool = False, sampled: bool = False, tile_size: int = 0,
+                  writer: Optional[ImageWriter] = None) -> List[Tuple[Path, str]]:
+    """Applies every effect variant to several files, carrying on past files that fail.
+
+    Args:
+        file_paths: Paths to the input files.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed files will be saved.
+        verbose: Whether to print detailed output during processing.
+        sampled: Whether only the video frames sent to the models are processed.
+        tile_size: Width and height of the tiles large images are processed in. 0 processes whole images.
+        writer: Saves processed images in the background, and reports the files it fails to save when
+            closed. None saves them before moving on.
+
+    Returns:
+        The path and error message of every file that failed while it was processed.
+    """
+    errors: List[Tuple[Path, str]] = []
+    for file_path in file_paths:
+        try:
+            with profile_file(str(file_path)):
+                process_file(file_path, variants, output_dir, verbose, sampled, tile_size, writer)
+        except Exception as e:
+            errors.append((file_path, f"{type(e).__name__}: {e}"))
+    return errors
+
+def process_chunks(chunks: Iterable[List[Path]], variants: List[Variant], output_dir: Path, verbose: bool = False, sampled: bool = False,
+                   tile_size: int = 0) -> List[Tuple[Path, str]]:
+    """Applies every effect variant to chunks of files, saving images with one writer for every chunk.
+
+    The writer is only closed once the last chunk is processed, so images are still being
+    saved in the background while the first files of the next chunk are processed.
+
+    Args:
+        chunks: The chunks of input files, in processing order.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed files will be saved.
+        verbose: Whether to print detailed output during processing.
+        sampled: Whether only the video frames sent to the models are processed.
+        tile_size: Width and height of the tiles large images are processed in. 0 processes whole images.
+
+    Returns:
+        The path and error message of every file that failed, saving its outputs included.
+    """
+    errors: List[Tuple[Path, str]] = []
+    writer: Optional[ImageWriter] = ImageWriter(encoders.writer_threads) if encoders.writer_threads else None
+    try:
+        for chunk in chunks:
+            errors += process_chunk(chunk, variants, output_dir, verbose, sampled, tile_size, writer)
+    finally:
+        if writer is not None:
+            failed: set = {file_path for file_path, _ in errors}
+            errors += [error for error in writer.close() if error[0] not in failed]
+    return errors
+
+def process_queued_chunks(chunks: "queue.Queue[Optional[List[Path]]]", variants: List[Variant], output_dir: Path, verbose: bool = False,
+                          sampled: bool = False, tile_size: int = 0) -> List[Tuple[Path, str]]:
+    """Runs in a worker process, taking chunks of files from a queue shared with the other workers until it gets None.
+
+    Args:
+        chunks: The queue of chunks, with a None for every worker after the last chunk.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed files will be saved.
+        verbose: Whether to print detailed output during processing.
+        sampled: Whether only the video frames sent to the models are processed.
+        tile_size: Width and height of the tiles large images are processed in. 0 processes whole images.
+
+    Returns:
+        The path and error message of every file the worker failed on, saving its outputs included.
+    """
+    return process_chunks(iter(chunks.get, None), variants, output_dir, verbose, sampled, tile_size)
+
+def init_worker(angle: float, cache_dir: Optional[Path] = None, animate: bool = False,
+                profile_dir: Optional[Path] = None, profiler: Optional[str] = None,
+                output_options: Tuple[Optional[str], Optional[int], int, int] = (None, None, DEFAULT_COMPRESSION, WRITER_THREADS)) -> None:
+    """Prepares a worker process, which does not inherit settings made in the main process on every platform.
+
+    Args:
+        angle: Direction of the motion blur in degrees.
+        cache_dir: Directory of the frame cache, None if videos are not cached.
+        animate: Whether overlays are animated on video.
+        profile_dir: Directory of the profile, None if the run is not profiled.
+        profiler: The profiler wrapping each file, None for stage timings only.
+        output_options: The format, quality, compression level and writer threads of image outputs.
+    """
+    set_motion_angle(angle)
+    set_frame_cache_dir(cache_dir)
+    set_animate_overlays(animate)
+    set_profiling(profile_dir, profiler)
+    set_output_options(*output_options)
+    cv2.setNumThreads(1)  # The pool already uses every core, so OpenCV's own threads would compete with it
+
+def worker_settings() -> Tuple[Any, ...]:
+    """Collects the settings made in this process that init_worker passes on to worker processes.
+
+    Returns:
+        The arguments of init_worker.
+    """
+    return (filters.motion_angle, frame_cache.frame_cache_dir, overlay.animate_overlays, profiling.profile_dir, profiling.profiler,
+            (encoders.output_format, encoders.quality, encoders.compression, encoders.writer_threads))
+
+def unique_outputs(file_paths: List[Path]) -> List[Path]:
+    """Drops files whose outputs would be overwritten by a later file with the same name.
+
+    Args:
+        file_paths: Paths to the input files, in processing order.
+
+    Returns:
+        The files to process, in the same order.
+    """
+    # Named as an output without a prefix, so images converted to the same format also clash
+    names: Dict[Path, str] = {file_path: output_path_for(file_path, "", Path()).name for file_path in file_paths}
+    last_by_name: Dict[str, Path] = {names[file_path]: file_path for file_path in file_paths}
+    for file_path in file_paths:
+        if last_by_name[names[file_path]] != file_path:
+            print(f"Skipping {file_path}: its outputs are written by {last_by_name[names[file_path]]}")
+    return [file_path for file_path in file_paths if last_by_name[names[file_path]] == file_path]
+
+def process_files(file_paths: List[Path], variants: List[Variant], output_dir: Path, verbose: bool = False, jobs: int = 1, segments: int = 1, sampled: bool = False, tile_size: int = 0) -> List[Tuple[Path, str]]:
+    """Applies every effect variant to every file, spreading the work over worker processes.
+
+    Videos are sent to a worker each and first, as they take the longest. Images are
+    sent in chunks of IMAGE_CHUNK_SIZE so small files do not pay for a round trip each.
+    Each worker takes the next chunk from a shared queue as it finishes the last one, and
+    keeps one image writer for the whole run.
+    When videos are split into segments, they are processed one at a time before the
+    images, each spread over its own segment processes.
+
+    Args:
+        file_paths: Paths to the input files.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed files will be saved.
+        verbose: Whether to print detailed output during processing.
+        jobs: Number of worker processes. 0 uses every core and 1 processes the files in this process.
+        segments: Number of time segments each video is split into. 0 uses every core and 1 keeps videos whole.
+            Ignored for sampled videos, which only decode a frame per second.
+        sampled: Whether only the video frames sent to the models are processed.
+        tile_size: Width and height of the tiles large images are processed in. 0 processes whole images.
+
+    Returns:
+        The path and error message of every file that failed, in the order of file_paths.
+    """
+    videos: List[Path] = [path for path in file_paths if path.suffix.lower() in VIDEO_EXTENSIONS]
+    images: List[Path] = [path for path in file_paths if path.suffix.lower() not in VIDEO_EXTENSIONS]
+    results: List[List[Tuple[Path, str]]] = []
+    chunks: List[List[Path]] = []
+    if segments == 1 or sampled:
+        chunks += [[video] for video in videos]
+    else:
+        for video in videos:
+            try:
+                with profile_file(str(video)):
+                    process_video_segments(video, variants, output_dir, segments, verbose)
+            except Exception as e:
+                results.append([(video, f"{type(e).__name__}: {e}")])
+    chunks += [images[i:i + IMAGE_CHUNK_SIZE] for i in range(0, len(images), IMAGE_CHUNK_SIZE)]
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        results.append(process_chunks(chunks, variants, output_dir, verbose, sampled, tile_size))
+    elif chunks:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        workers: int = min(jobs, len(chunks))
+        with multiprocessing.Manager() as manager, \
+                ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=worker_settings()) as executor:
+            chunk_queue: "queue.Queue[Optional[List[Path]]]" = manager.Queue()
+            for chunk in [*chunks, *[None] * workers]:
+                chunk_queue.put(chunk)
+            futures = [executor.submit(process_queued_chunks, chunk_queue, variants, output_dir, verbose, sampled, tile_size)
+                       for _ in range(workers)]
+            results += [future.result() for future in futures]
+
+    order: Dict[Path, int] = {file_path: i for i, file_path in enumerate(file_paths)}
+    return sorted((error for chunk_errors in results for error in chunk_errors), key=lambda error: order[error[0]])
+
+def build_files(file_paths: List[Path], variants: List[Variant], output_dir: Path, verbose: bool = False, jobs: int = 1, segments: int = 1, sampled: bool = False, force: bool = False, tile_size: int = 0) -> List[Tuple[Path, str]]:
+    """Applies the effect variants whose outputs are missing or out of date, and records what was built.
+
+    Outputs are recorded in a manifest in the output directory with the content hash of
+    their input, their effect settings and the code version, so running the same command
+    again only rebuilds the outputs of new or changed inputs.
+
+    Args:
+        file_paths: Paths to the input files.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed files will be saved.
+        verbose: Whether to print detailed output during processing.
+        jobs: Number of worker processes. 0 uses every core and 1 processes the files in this process.
+        segments: Number of time segments each video is split into. 0 uses every core and 1 keeps videos whole.
+        sampled: Whether only the video frames sent to the models are processed.
+        force: Whether every output is rebuilt, even if it is up to date.
+        tile_size: Width and height of the tiles large images are processed in. 0 processes whole images.
+
+    Returns:
+        The path and error message of every file that failed, in the order of file_paths.
+    """
+    manifest: Dict[str, dict] = load_manifest(output_dir)
+    builds, entries = plan_builds(file_paths, variants, output_dir, {} if force else manifest, sampled)
+
+    total: int = len(file_paths) * len(variants)
+    stale: int = sum(len(stale_variants) * len(stale_files) for stale_variants, stale_files in builds.items())
+    if verbose or stale < total:
+        print(f"{total - stale} of {total} outputs are up to date, building {stale}.")
+
+    errors: List[Tuple[Path, str]] = []
+    for stale_variants, stale_files in builds.items():
+        errors += process_files(stale_files, list(stale_variants), output_dir, verbose, jobs, segments, sampled, tile_size)
+
+    failed: set = {file_path for file_path, _ in errors}
+    for stale_variants, stale_files in builds.items():
+        for file_path in stale_files:
+            frames: bool = sampled and file_path.suffix.lower() in VIDEO_EXTENSIONS
+            for variant in stale_variants:
+                key: str = f"{variant[0]}_{file_path.name}"
+                if file_path in failed:
+                    entries.pop(key)  # Built again next time
+                else:
+                    entries[key]["outputs"] = built_outputs(file_path, variant, output_dir, frames,
+                                                            file_path.suffix.lower() in IMAGE_EXTENSIONS)
+    if entries:
+        manifest.update(entries)
+        save_manifest(output_dir, manifest)
+
+    order: Dict[Path, int] = {file_path: i for i, file_path in enumerate(file_paths)}
+    return sorted(errors, key=lambda error: order[error[0]])
 
 def main() -> None:
     """Main function to parse arguments, apply the selected filter to images or videos, and save the results."""
@@ -194,14 +894,44 @@ def main() -> None:
     if not input_path.is_absolute():
         print("Please provide full path to the input.")
         exit(1)
+    set_motion_angle(args.angle)
+    set_frame_cache_dir(args.frame_cache)
+    set_animate_overlays(args.animate_overlays)
+    if args.profile or args.profiler:
+        set_profiling(output_dir / PROFILE_DIR_NAME, args.profiler)
+        start_profile()
     
-    for file_path in directory_iterator(input_path, args.verbose):
-        file_extension = file_path.suffix.lower()
+    if args.jobs < 0 or args.segments < 0 or args.tile_size < 0 or args.writers < 0:
+        print("The number of jobs, segments and writers and the tile size cannot be negative.")
+        exit(1)
+    if args.quality is not None and not 1 <= args.quality <= 100 or not 0 <= args.compression <= 9:
+        print("The quality must be from 1 to 100 and the compression level from 0 to 9.")
+        exit(1)
+    set_output_options(args.format, args.quality, args.compression, args.writers)
+
+    if args.effect is None and args.effects is None:
+        print("Please provide an effect, or a list of effects with --effects.")
+        exit(1)
+    effect_names: List[str] = args.effects or [args.effect]
+    strengths: List[float] = args.strengths or [args.strength]
+    variants: List[Variant] = effect_variants(effect_names, strengths, sweep=bool(args.effects or args.strengths))
 
-        if file_extension in VIDEO_EXTENSIONS:
-            process_video(file_path, args.effect, args.strength, output_dir, args.verbose)
-        elif file_extension in IMAGE_EXTENSIONS:
-            process_image(file_path, args.effect, args.strength, output_dir, args.verbose)
+    if args.watch and not input_path.is_dir():
+        print("Only a directory can be watched.")
+        exit(1)
+
+    def build(file_paths: List[Path]) -> List[Tuple[Path, str]]:
+        errors: List[Tuple[Path, str]] = build_files(unique_outputs(sorted(file_paths)), variants, output_dir, args.verbose, args.jobs, args.segments, args.sampled, args.force, args.tile_size)
+        for file_path, error in errors:
+            print(f"Error processing {file_path}: {error}")
+        finish_profile()
+        return errors
+
+    if args.watch:
+        # Existing files are built first, then new ones as they arrive, skipping outputs that are up to date
+        watch(input_path, IMAGE_EXTENSIONS + VIDEO_EXTENSIONS, build, exclude=output_dir.resolve(), include_existing=True)
+    elif build(list(directory_iterator(input_path, args.verbose))):
+        exit(1)
 
 if __name__ == "__main__":
     main()
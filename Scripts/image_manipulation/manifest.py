@@ -0,0 +1,158 @@
+from effects import Variant, uses_strength, OVERLAY_DIR
+import filters
+import overlay
+import encoders
+from encoders import image_output_name
+from hashing import hash_file
+
+from typing import Any, Dict, List, Tuple
+from pathlib import Path
+from functools import lru_cache
+import hashlib
+import json
+import os
+
+MANIFEST_NAME: str = ".manifest.json"  # Kept in the output directory, next to the outputs it describes
+SOURCE_DIR: Path = Path(__file__).resolve().parent
+# Modules that decide the pixels of the outputs, so editing the command line or the build itself rebuilds nothing
+OUTPUT_MODULES: Tuple[str, ...] = ("filters.py", "overlay.py", "effects.py", "tiles.py", "encoders.py")
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """Hashes the modules in OUTPUT_MODULES and the overlay images, which decide what the outputs look like.
+
+    Any change to them gives a new version, so every output is rebuilt with the new code.
+
+    Returns:
+        The hex digest of the sources and overlay images.
+    """
+    digest = hashlib.sha256()
+    for path in [SOURCE_DIR / name for name in OUTPUT_MODULES] + sorted(OVERLAY_DIR.glob("*")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+def load_manifest(output_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Loads the record of the outputs built in a directory.
+
+    Args:
+        output_dir: The output directory.
+
+    Returns:
+        The entry of every output, keyed by output name. Empty if there is no readable manifest.
+    """
+    try:
+        with open(output_dir / MANIFEST_NAME) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(output_dir: Path, manifest: Dict[str, Dict[str, Any]]) -> None:
+    """Saves the record of the outputs built in a directory, replacing the old one in one step.
+
+    Args:
+        output_dir: The output directory.
+        manifest: The entry of every output, keyed by output name.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    temp_path: Path = output_dir / f"{MANIFEST_NAME}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(temp_path, output_dir / MANIFEST_NAME)
+
+def variant_settings(variant: Variant, sampled: bool) -> Dict[str, Any]:
+    """Lists the settings an output of an effect variant depends on.
+
+    Args:
+        variant: The (name, effect, strength) variant.
+        sampled: Whether only the video frames sent to the models are processed.
+
+    Returns:
+        The settings. The strength, motion angle and overlay animation are left out when they do not change the output.
+    """
+    _, effect_name, strength = variant
+    return {
+        "effect": effect_name,
+        "strength": strength if uses_strength(effect_name) else None,
+        "angle": filters.motion_angle if "motion" in effect_name else None,
+        "animated": overlay.animate_overlays if any(name in effect_name for name in overlay.ANIMATION_FRAMES) else None,
+        "sampled": sampled,
+        "output": encoders.output_options(),
+        "version": code_version(),
+    }
+
+def input_state(file_path: Path, previous: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Gets the content hash of an input, reusing a recorded hash if the file was not modified since.
+
+    Args:
+        file_path: Path to the input file.
+        previous: Earlier manifest entries of outputs built from this input.
+
+    Returns:
+        The hash, size and modification time of the input.
+    """
+    stat = file_path.stat()
+    for entry in previous:
+        if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("input_hash"):
+            return {"input_hash": entry["input_hash"], "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return {"input_hash": hash_file(file_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def plan_builds(file_paths: List[Path], variants: List[Variant], output_dir: Path, manifest: Dict[str, Dict[str, Any]],
+                sampled: bool = False) -> Tuple[Dict[Tuple[Variant, ...], List[Path]], Dict[str, Dict[str, Any]]]:
+    """Finds the outputs that are missing or were built from another input, effect, strength or code version.
+
+    Args:
+        file_paths: Paths to the input files.
+        variants: The (name, effect, strength) variants to apply.
+        output_dir: Directory where the processed files are saved.
+        manifest: The entries of the outputs already built, keyed by output name.
+        sampled: Whether only the video frames sent to the models are processed.
+
+    Returns:
+        The files to process grouped by the variants they still need, and the manifest entry
+        of every output once it is built, keyed by output name.
+    """
+    builds: Dict[Tuple[Variant, ...], List[Path]] = {}
+    entries: Dict[str, Dict[str, Any]] = {}
+    for file_path in file_paths:
+        keys: List[str] = [f"{variant[0]}_{file_path.name}" for variant in variants]
+        state: Dict[str, Any] = input_state(file_path, [manifest[key] for key in keys if key in manifest])
+
+        stale: List[Variant] = []
+        for key, variant in zip(keys, variants):
+            settings: Dict[str, Any] = variant_settings(variant, sampled)
+            entry: Dict[str, Any] = {**state, **settings}
+            previous: Dict[str, Any] = manifest.get(key, {})
+            outputs: List[str] = previous.get("outputs", [])
+            # Touching an input without changing it keeps its outputs, as only the content hash is compared
+            if previous.get("input_hash") == state["input_hash"] and \
+                    all(previous.get(name) == value for name, value in settings.items()) and \
+                    outputs and all((output_dir / output).exists() for output in outputs):
+                entry["outputs"] = outputs
+            else:
+                stale.append(variant)
+            entries[key] = entry
+        if stale:
+            builds.setdefault(tuple(stale), []).append(file_path)
+    return builds, entries
+
+def built_outputs(file_path: Path, variant: Variant, output_dir: Path, frames: bool = False, image: bool = False) -> List[str]:
+    """Lists the output files of an input built with an effect variant.
+
+    Args:
+        file_path: Path to the input file.
+        variant: The (name, effect, strength) variant.
+        output_dir: Directory where the processed files are saved.
+        frames: Whether the input is a video saved as its sampled frames.
+        image: Whether the input is an image, saved in the chosen output format.
+
+    Returns:
+        The names of the output files that exist.
+    """
+    if frames:
+        prefix: str = f"{variant[0]}_{file_path.stem}_"
+        return sorted(path.name for path in output_dir.glob(f"{prefix}*") if path.stem[len(prefix):].isdigit())
+    output_name: str = f"{variant[0]}_{file_path.name}"
+    if image:
+        output_name = image_output_name(output_name)
+    return [output_name] if (output_dir / output_name).exists() else []
@@ -1,6 +1,9 @@
 from PIL import Image, ImageEnhance, ImageFilter
-from typing import Dict, Tuple
+from profiling import stage
+from typing import Dict, Optional, Tuple
 from pathlib import Path
+from functools import lru_cache
+import numpy as np
 
 OVERLAY_FUNCTIONS: Dict[str, Tuple[float, int]] = {
     "graffiti": (1.2, 15),
@@ -10,12 +13,33 @@ OVERLAY_FUNCTIONS: Dict[str, Tuple[float, int]] = {
     "wet-filter": (1.0, 20)
 }
 
-def enhance_overlay(overlay: Image.Image, effect_type: str) -> Image.Image:
+OVERLAY_CACHE_SIZE: int = 32  # Prepared overlays kept in memory, one per effect and image size
+
+# Overlays that move on video, with the number of frames they take to fall by the height of the frame
+ANIMATION_FRAMES: Dict[str, int] = {
+    "rain": 24,
+    "wet-filter": 240
+}
+
+animate_overlays: bool = False  # Whether the overlays in ANIMATION_FRAMES move from one video frame to the next
+
+def set_animate_overlays(enabled: bool) -> None:
+    """Sets whether overlays are animated on video.
+
+    Args:
+        enabled: Whether the overlays in ANIMATION_FRAMES move from one video frame to the next.
+    """
+    global animate_overlays
+    animate_overlays = enabled
+
+def enhance_overlay(overlay: Image.Image, effect_type: str, mean: Optional[int] = None) -> Image.Image:
     """Enhances the overlay image based on the specified effect type using PIL.
     
     Args:
         overlay: The overlay image to enhance.
         effect_type: The type of effect ('rain', 'fog', 'graffiti', 'lens-flare', 'wet-filter').
+        mean: The mean greyscale value the contrast is adjusted around, when the overlay is a region
+            of a larger overlay. Defaults to the mean of the overlay itself, as ImageEnhance uses.
 
     Returns:
         The enhanced overlay image.
@@ -28,10 +52,123 @@ def enhance_overlay(overlay: Image.Image, effect_type: str) -> Image.Image:
     overlay = enhancer.enhance(alpha)
     
     # Adjusting contrast for a more pronounced effect
-    enhancer = ImageEnhance.Contrast(overlay)
-    overlay = enhancer.enhance(beta / 10.0)
+    if mean is None:
+        enhancer = ImageEnhance.Contrast(overlay)
+        return enhancer.enhance(beta / 10.0)
+
+    # Blend with a flat image of the given mean, keeping alpha, the way ImageEnhance.Contrast does
+    degenerate: Image.Image = Image.new("L", overlay.size, mean).convert(overlay.mode)
+    degenerate.putalpha(overlay.getchannel("A"))
+    return Image.blend(degenerate, overlay, beta / 10.0)
+
+@lru_cache(maxsize=len(OVERLAY_FUNCTIONS))
+def load_overlay(overlay_path: str) -> Image.Image:
+    """Loads an overlay image from disk and converts it to RGBA, once per path.
     
-    return overlay
+    Args:
+        overlay_path: Path to the overlay image.
+
+    Returns:
+        The overlay image in RGBA mode.
+    """
+    with Image.open(overlay_path) as overlay:
+        return overlay.convert("RGBA")
+
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def prepare_overlay(effect_type: str, overlay_path: str, size: Tuple[int, int]) -> Image.Image:
+    """Resizes and enhances an overlay for images of the given size, once per effect and size.
+
+    Images and video frames of the same resolution share the prepared overlay, so the
+    resize and enhancement passes only run the first time a size is seen.
+    
+    Args:
+        effect_type: The type of effect ('rain', 'fog', 'graffiti', 'lens-flare', 'wet-filter').
+        overlay_path: Path to the overlay image.
+        size: The (width, height) of the images the overlay will be applied to.
+
+    Returns:
+        The resized and enhanced overlay in RGBA mode. It is shared, so it must not be modified.
+    """
+    with stage("overlay preparation"):
+        overlay = load_overlay(overlay_path)
+
+        if effect_type == "fog":
+            new_size = (int(size[0] * 1.8), int(size[1] * 1.8))
+            overlay = overlay.resize(new_size, Image.Resampling.LANCZOS)
+            start_x = (overlay.size[0] - size[0]) // 2
+            start_y = (overlay.size[1] - size[1]) // 2
+            overlay = overlay.crop((start_x, start_y, start_x + size[0], start_y + size[1]))
+        else:
+            overlay = overlay.resize(size, Image.Resampling.LANCZOS)
+
+        return enhance_overlay(overlay, effect_type)
+
+def resize_overlay_region(effect_type: str, overlay_path: str, size: Tuple[int, int], box: Tuple[int, int, int, int]) -> Image.Image:
+    """Resizes only the region of an overlay that covers part of an image, before it is enhanced.
+
+    The region is resampled from the matching part of the overlay image, so the overlay for
+    the whole image never has to be held in memory.
+
+    Args:
+        effect_type: The type of effect ('rain', 'fog', 'graffiti', 'lens-flare', 'wet-filter').
+        overlay_path: Path to the overlay image.
+        size: The (width, height) of the whole image.
+        box: The (left, top, right, bottom) region of the image.
+
+    Returns:
+        The region of the resized overlay in RGBA mode, matching prepare_overlay before enhancement
+        up to rounding at a few pixels.
+    """
+    overlay = load_overlay(overlay_path)
+    left, top, right, bottom = box
+    resized_size: Tuple[int, int] = size
+
+    if effect_type == "fog":
+        resized_size = (int(size[0] * 1.8), int(size[1] * 1.8))
+        start_x = (resized_size[0] - size[0]) // 2
+        start_y = (resized_size[1] - size[1]) // 2
+        left, top, right, bottom = left + start_x, top + start_y, right + start_x, bottom + start_y
+
+    scale_x: float = overlay.size[0] / resized_size[0]
+    scale_y: float = overlay.size[1] / resized_size[1]
+    return overlay.resize((right - left, bottom - top), Image.Resampling.LANCZOS,
+                          box=(left * scale_x, top * scale_y, right * scale_x, bottom * scale_y))
+
+def premultiply_overlay(overlay: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Splits an RGBA overlay array into the fixed-point terms composite_array uses.
+
+    Args:
+        overlay: The (height, width, 4) uint8 overlay array.
+
+    Returns:
+        The colour premultiplied by alpha plus the rounding term of the division by 255, and
+        255 minus alpha repeated for each colour channel, both uint16 with three channels.
+    """
+    alpha: np.ndarray = overlay[:, :, 3:].astype(np.uint16)
+    premultiplied: np.ndarray = overlay[:, :, :3] * alpha
+    premultiplied += 128
+    return premultiplied, np.repeat(255 - alpha, 3, axis=2)
+
+def composite_array(background: np.ndarray, premultiplied: np.ndarray, inverse_alpha: np.ndarray) -> np.ndarray:
+    """Composites a premultiplied overlay onto an opaque background array in integer arithmetic.
+
+    Every term fits in uint16: colour * alpha + background * (255 - alpha) is at most 255 * 255.
+    The division by 255 rounds the way Image.alpha_composite does for an opaque background,
+    so the result matches PIL exactly.
+
+    Args:
+        background: The (height, width, 3) uint8 background array.
+        premultiplied: The first array returned by premultiply_overlay.
+        inverse_alpha: The second array returned by premultiply_overlay.
+
+    Returns:
+        The composited uint8 array.
+    """
+    blended: np.ndarray = background * inverse_alpha
+    blended += premultiplied
+    blended += blended >> 8
+    blended >>= 8
+    return blended.astype(np.uint8)
 
 def process_image_overlay(background: Image.Image, effect_type: str, overlay_path: str) -> Image.Image:
     """Adds a specified overlay effect to a background image using PIL.
@@ -44,21 +181,73 @@ def process_image_overlay(background: Image.Image, effect_type: str, overlay_pat
     Returns:
         The processed Image object with the overlay applied.
     """
-    overlay = Image.open(overlay_path).convert("RGBA")
+    if not background.has_transparency_data:
+        # Opaque images are composited in RGB, without converting to RGBA and back
+        return Image.fromarray(process_array_overlay(np.asarray(background.convert("RGB")), effect_type, overlay_path))
 
-    if effect_type == "fog":
-        new_size = (int(background.size[0] * 1.8), int(background.size[1] * 1.8))
-        overlay = overlay.resize(new_size, Image.Resampling.LANCZOS)
-        start_x = (overlay.size[0] - background.size[0]) // 2
-        start_y = (overlay.size[1] - background.size[1]) // 2
-        overlay = overlay.crop((start_x, start_y, start_x + background.size[0], start_y + background.size[1]))
-    else:
-        overlay = overlay.resize(background.size, Image.Resampling.LANCZOS)
-
-    overlay = enhance_overlay(overlay, effect_type)
+    overlay = prepare_overlay(effect_type, str(overlay_path), background.size)
 
     # Blend the overlay and background
     blended = Image.alpha_composite(background.convert("RGBA"), overlay)
     
     return blended.convert("RGB")
 
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def prepare_overlay_array(effect_type: str, overlay_path: str, size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Splits a prepared overlay into the arrays used to composite it onto image arrays.
+    
+    Args:
+        effect_type: The type of effect ('rain', 'fog', 'graffiti', 'lens-flare', 'wet-filter').
+        overlay_path: Path to the overlay image.
+        size: The (width, height) of the images the overlay will be applied to.
+
+    Returns:
+        The premultiplied overlay colour and the inverse alpha, as returned by premultiply_overlay.
+        They are shared, so they must not be modified.
+    """
+    return premultiply_overlay(np.asarray(prepare_overlay(effect_type, overlay_path, size)))
+
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def prepare_overlay_ring(effect_type: str, overlay_path: str, size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, Tuple[int, ...]]:
+    """Precomputes the ring of positions an animated overlay cycles through, once per effect and size.
+
+    The prepared overlay is stacked on top of itself, so every position is a view of the
+    stack starting a few rows higher than the last. The overlay falls and wraps around
+    without being shifted or copied per frame, and is back at the start after a full cycle.
+
+    Args:
+        effect_type: The type of effect, one of ANIMATION_FRAMES.
+        overlay_path: Path to the overlay image.
+        size: The (width, height) of the frames the overlay will be applied to.
+
+    Returns:
+        The premultiplied colour and inverse alpha of the stacked overlay, as returned by
+        premultiply_overlay, and the first row of each position in the ring.
+        They are shared, so they must not be modified.
+    """
+    overlay: np.ndarray = np.asarray(prepare_overlay(effect_type, overlay_path, size))
+    premultiplied, inverse_alpha = premultiply_overlay(np.concatenate((overlay, overlay)))
+    frames, height = ANIMATION_FRAMES[effect_type], size[1]
+    return premultiplied, inverse_alpha, tuple(height - position * height // frames for position in range(frames))
+
+def process_array_overlay(background: np.ndarray, effect_type: str, overlay_path: str, frame_index: Optional[int] = None) -> np.ndarray:
+    """Adds a specified overlay effect to a background image array without converting it to PIL.
+    
+    Args:
+        background: The background image as an array with three channels.
+        effect_type: The type of effect to apply ('rain', 'fog', 'graffiti', 'lens-flare', 'wet-filter').
+        overlay_path: Path to the overlay image.
+        frame_index: Position of the frame in its video, which picks the position of an animated
+            overlay. None, or animation turned off, applies the overlay as it is.
+
+    Returns:
+        The processed image array with the overlay applied.
+    """
+    height, width = background.shape[:2]
+    if frame_index is not None and animate_overlays and effect_type in ANIMATION_FRAMES:
+        premultiplied, inverse_alpha, starts = prepare_overlay_ring(effect_type, str(overlay_path), (width, height))
+        start: int = starts[frame_index % len(starts)]
+        return composite_array(background, premultiplied[start:start + height], inverse_alpha[start:start + height])
+
+    premultiplied, inverse_alpha = prepare_overlay_array(effect_type, str(overlay_path), (width, height))
+    return composite_array(background, premultiplied, inverse_alpha)
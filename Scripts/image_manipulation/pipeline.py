@@ -0,0 +1,244 @@
+from profiling import profiled, record
+
+from typing import Callable, Dict, List, Optional, Tuple
+import queue
+import threading
+import time
+import numpy as np
+import cv2
+
+PIPELINE_QUEUE_SIZE: int = 8  # Frames buffered between two stages
+FILTER_THREADS: int = 2  # Threads filtering frames, OpenCV and NumPy release the GIL while they work
+QUEUE_POLL_SECONDS: float = 0.1  # How often a blocked stage checks whether the pipeline was stopped
+
+def sample_interval(fps: float) -> int:
+    """Gets the number of frames between the frames sent to the models.
+
+    Matches encode_video in the api, which keeps one frame per second of video.
+
+    Args:
+        fps: Frame rate of the video.
+
+    Returns:
+        The interval in frames, at least 1.
+    """
+    return max(int(fps), 1)
+
+def sampled_reader(cap: cv2.VideoCapture, interval: int) -> Callable[[], Optional[np.ndarray]]:
+    """Gets a function reading every interval-th frame of a video, starting with the first.
+
+    The frames in between are grabbed but never retrieved, so they are not converted or copied.
+
+    Args:
+        cap: The opened video.
+        interval: Number of frames between two sampled frames.
+
+    Returns:
+        A function returning the next sampled frame, or None at the end of the video.
+    """
+    position: List[int] = [0]
+
+    def read_frame() -> Optional[np.ndarray]:
+        while cap.grab():
+            index: int = position[0]
+            position[0] += 1
+            if index % interval == 0:
+                ret, frame = cap.retrieve()
+                return frame if ret else None
+        return None
+    return read_frame
+
+class StageStats:
+    """Counts the frames a pipeline stage handled and the time its threads spent on them."""
+
+    def __init__(self, name: str, threads: int = 1):
+        self.name: str = name
+        self.threads: int = threads
+        self.frames: int = 0
+        self.seconds: float = 0.0
+        self.lock: threading.Lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        """Records one frame handled by the stage.
+
+        Args:
+            seconds: Time spent on the frame.
+        """
+        with self.lock:
+            self.frames += 1
+            self.seconds += seconds
+
+    def throughput(self) -> float:
+        """Calculates the frames per second the stage could sustain with all of its threads busy.
+
+        Returns:
+            The frames per second, or 0.0 if no time was recorded.
+        """
+        if self.seconds <= 0:
+            return 0.0
+        return self.frames * self.threads / self.seconds
+
+def format_stats(stats: List[StageStats], elapsed: float) -> str:
+    """Formats the throughput of every stage and marks the slowest one.
+
+    Args:
+        stats: The statistics of each stage, in pipeline order.
+        elapsed: Wall-clock time of the whole pipeline in seconds.
+
+    Returns:
+        A single line summarising the pipeline.
+    """
+    busy_stats: List[StageStats] = [stage for stage in stats if stage.seconds > 0]
+    bottleneck: Optional[StageStats] = min(busy_stats, key=lambda stage: stage.throughput(), default=None)
+    parts: List[str] = []
+    for stage in stats:
+        marker: str = " (bottleneck)" if stage is bottleneck else ""
+        parts.append(f"{stage.name} {stage.throughput():.1f} fps{marker}")
+    frames: int = stats[-1].frames if stats else 0
+    overall: float = frames / elapsed if elapsed > 0 else 0.0
+    return f"{frames} frames at {overall:.1f} fps: " + ", ".join(parts)
+
+def put_until_stopped(target: queue.Queue, item, stop: threading.Event) -> bool:
+    """Puts an item on a bounded queue, giving up if the pipeline is stopped while waiting.
+
+    Args:
+        target: The queue to put the item on.
+        item: The item to put.
+        stop: Event set when the pipeline is stopping.
+
+    Returns:
+        True if the item was queued.
+    """
+    while True:
+        try:
+            target.put(item, timeout=QUEUE_POLL_SECONDS)
+            return True
+        except queue.Full:
+            if stop.is_set():
+                return False
+
+def run_pipeline(read_frame: Callable[[], Optional[np.ndarray]],
+                 filter_frame: Callable[..., np.ndarray],
+                 write_frame: Callable[[np.ndarray], None],
+                 filter_threads: int = FILTER_THREADS,
+                 max_frames: Optional[int] = None,
+                 first_frame: Optional[int] = None,
+                 frame_step: int = 1) -> List[StageStats]:
+    """Decodes, filters and encodes frames in overlapping stages while keeping their order.
+
+    A decode thread reads frames into a bounded queue, filter threads take frames from it
+    and the calling thread writes the filtered frames back in their original order. The
+    number of frames between decoding and encoding is bounded, so memory stays at a few
+    frames per stage however slow one of them is.
+
+    Args:
+        read_frame: Returns the next frame, or None at the end of the input.
+        filter_frame: Applies the effect to a frame.
+        write_frame: Encodes a filtered frame.
+        filter_threads: Number of threads running filter_frame.
+        max_frames: Stop after this many frames. Defaults to reading until the end of the input.
+        first_frame: If given, filter_frame is also passed the position of each frame in the video,
+            counting from first_frame for the first frame read.
+        frame_step: Frames of the video between two frames read, for readers that skip frames.
+
+    Returns:
+        The statistics of the decode, filter and encode stages.
+
+    Raises:
+        Any exception raised by one of the stages, after the pipeline has shut down.
+    """
+    decode_stats = StageStats("decode")
+    filter_stats = StageStats("filter", filter_threads)
+    encode_stats = StageStats("encode")
+
+    decoded: queue.Queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    filtered: queue.Queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    in_flight = threading.Semaphore(2 * PIPELINE_QUEUE_SIZE + filter_threads)  # Frames read but not yet written
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def fail(error: BaseException) -> None:
+        errors.append(error)
+        stop.set()
+
+    def decode() -> None:
+        index: int = 0
+        try:
+            while not stop.is_set() and (max_frames is None or index < max_frames):
+                if not in_flight.acquire(timeout=QUEUE_POLL_SECONDS):
+                    continue
+                start: float = time.perf_counter()
+                frame: Optional[np.ndarray] = read_frame()
+                if frame is None:
+                    in_flight.release()
+                    break
+                decode_stats.add(time.perf_counter() - start)
+                if not put_until_stopped(decoded, (index, frame), stop):
+                    break
+                index += 1
+        except BaseException as e:
+            fail(e)
+        finally:
+            for _ in range(filter_threads):
+                decoded.put(None)  # The filter threads keep draining, so this never blocks for long
+
+    def apply_filter() -> None:
+        try:
+            while True:
+                item: Optional[Tuple[int, np.ndarray]] = decoded.get()
+                if item is None:
+                    break
+                if stop.is_set():
+                    in_flight.release()
+                    continue
+                index, frame = item
+                start: float = time.perf_counter()
+                try:
+                    result: np.ndarray = filter_frame(frame) if first_frame is None \
+                        else filter_frame(frame, first_frame + index * frame_step)
+                except BaseException as e:
+                    in_flight.release()
+                    fail(e)
+                    continue
+                filter_stats.add(time.perf_counter() - start)
+                filtered.put((index, result))
+        finally:
+            filtered.put(None)
+
+    threads: List[threading.Thread] = [threading.Thread(target=profiled(decode), name="decode", daemon=True)]
+    threads += [threading.Thread(target=profiled(apply_filter), name=f"filter-{i}", daemon=True) for i in range(filter_threads)]
+    for thread in threads:
+        thread.start()
+
+    # Frames can finish filtering out of order, so they wait here until the earlier ones are written
+    pending: Dict[int, np.ndarray] = {}
+    next_index: int = 0
+    finished_threads: int = 0
+    while finished_threads < filter_threads:
+        item = filtered.get()
+        if item is None:
+            finished_threads += 1
+            continue
+        pending[item[0]] = item[1]
+        while next_index in pending:
+            frame = pending.pop(next_index)
+            next_index += 1
+            if not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    write_frame(frame)
+                    encode_stats.add(time.perf_counter() - start)
+                except BaseException as e:
+                    fail(e)
+            in_flight.release()
+    # Frames after one that failed to filter never become writable, but still hold their slot
+    for _ in pending:
+        in_flight.release()
+
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    for stats in (decode_stats, filter_stats, encode_stats):
+        record(stats.name, stats.seconds)  # Summed over the threads of the stage, when profiling
+    return [decode_stats, filter_stats, encode_stats]
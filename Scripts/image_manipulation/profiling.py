@@ -0,0 +1,215 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from pathlib import Path
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+PROFILERS: Tuple[str, ...] = ("cprofile", "tracemalloc")  # Profilers a run can be wrapped in, besides the stage timings
+TRACE_NAME: str = "trace.jsonl"  # One line per file, appended by every process as its files finish
+SUMMARY_NAME: str = "profile.json"  # The trace and the totals of every stage, written once the run is over
+STATS_NAME: str = "profile.prof"  # Merged cProfile statistics, readable with pstats or snakeviz
+TOP_ENTRIES: int = 15  # Functions listed in the summary of a cProfile run
+
+profile_dir: Optional[Path] = None  # Directory the profile is written to, None when not profiling
+profiler: Optional[str] = None  # One of PROFILERS, or None to record only the stage timings
+
+stage_times: Dict[str, float] = {}  # Seconds spent in each stage on the current file
+thread_profiles: List[cProfile.Profile] = []  # cProfile results of every file and pipeline thread in this process
+lock: threading.Lock = threading.Lock()
+
+
+def set_profiling(directory: Optional[Path], profiler_name: Optional[str] = None) -> None:
+    """Sets where stage timings are written and which profiler wraps each file.
+
+    Args:
+        directory: The directory of the profile, created when the first file is recorded. None turns profiling off.
+        profiler_name: One of PROFILERS, or None to record only the stage timings.
+    """
+    global profile_dir, profiler
+    profile_dir = directory
+    profiler = profiler_name if directory is not None else None
+    if profiler == "tracemalloc" and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif profiler != "tracemalloc" and tracemalloc.is_tracing():
+        tracemalloc.stop()  # Tracing slows every allocation down, so it only runs while needed
+
+def record(name: str, seconds: float) -> None:
+    """Adds time spent in a stage to the current file.
+
+    Args:
+        name: Name of the stage.
+        seconds: Wall time spent in it.
+    """
+    if profile_dir is None:
+        return
+    with lock:
+        stage_times[name] = stage_times.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Records the wall time of the block as a stage of the current file, when profiling.
+
+    Args:
+        name: Name of the stage.
+    """
+    if profile_dir is None:
+        yield
+        return
+    start: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def profiled(target: Callable[[], None]) -> Callable[[], None]:
+    """Wraps the target of a thread, so cProfile also sees threads other than the one processing the file.
+
+    Args:
+        target: The function run by the thread.
+
+    Returns:
+        The function to run instead, or target itself when cProfile is not in use.
+    """
+    if profiler != "cprofile":
+        return target
+
+    def run() -> None:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            target()
+        finally:
+            profile.disable()
+            with lock:
+                thread_profiles.append(profile)
+    return run
+
+@contextmanager
+def profile_file(name: str) -> Iterator[None]:
+    """Profiles the processing of one file and appends its entry to the trace, when profiling.
+
+    Args:
+        name: Name of the entry, usually the path of the file.
+    """
+    if profile_dir is None:
+        yield
+        return
+    with lock:
+        stage_times.clear()
+    if profiler == "tracemalloc":
+        tracemalloc.reset_peak()
+    profile: Optional[cProfile.Profile] = cProfile.Profile() if profiler == "cprofile" else None
+    start: float = time.perf_counter()
+    if profile is not None:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+        entry: Dict[str, Any] = {"file": name, "pid": os.getpid(), "total": time.perf_counter() - start}
+        with lock:
+            entry["stages"] = dict(stage_times)
+            if profile is not None:
+                thread_profiles.append(profile)
+        if profiler == "tracemalloc":
+            entry["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        # Short appends are not interleaved, so worker processes can share the trace
+        with open(profile_dir / TRACE_NAME, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+        if profile is not None:
+            stats_path: Path = profile_dir / f"stats-{os.getpid()}.prof"
+            with lock:
+                # Merged into the statistics of the earlier files of this process
+                stats = pstats.Stats(*([str(stats_path)] if stats_path.exists() else []), *thread_profiles)
+                stats.dump_stats(stats_path)
+                thread_profiles.clear()
+
+def start_profile() -> None:
+    """Clears the trace and statistics left by an earlier run in the profile directory."""
+    if profile_dir is None or not profile_dir.exists():
+        return
+    (profile_dir / TRACE_NAME).unlink(missing_ok=True)
+    (profile_dir / STATS_NAME).unlink(missing_ok=True)
+    for path in profile_dir.glob("stats-*.prof"):
+        path.unlink()
+
+def load_trace(directory: Path) -> List[Dict[str, Any]]:
+    """Reads the entries appended to the trace.
+
+    Args:
+        directory: The directory of the profile.
+
+    Returns:
+        The entry of every file, in the order they finished.
+    """
+    trace_path: Path = directory / TRACE_NAME
+    if not trace_path.exists():
+        return []
+    with open(trace_path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def format_summary(entries: List[Dict[str, Any]]) -> str:
+    """Formats the stage timings of every file as a table.
+
+    Args:
+        entries: The entries of the trace.
+
+    Returns:
+        The table, one row per file and a last row with the totals. Stages such as overlay
+        preparation are also counted in the stage they run within, and video segments
+        processed in parallel get their own rows as well as counting towards the video.
+    """
+    stages: List[str] = list(dict.fromkeys(name for entry in entries for name in entry["stages"]))
+    memory: bool = any("peak_bytes" in entry for entry in entries)
+    width: int = max([len(Path(entry["file"]).name) for entry in entries] + [len("Total")]) + 2
+    columns: List[str] = ["Wall (s)", *(f"{name} (s)" for name in stages)] + (["Peak (MB)"] if memory else [])
+    lines: List[str] = [f"{'File':<{width}}" + "".join(f"{column:>{max(len(column) + 2, 10)}}" for column in columns)]
+
+    def row(name: str, values: List[float], peak: Optional[int]) -> str:
+        cells: List[str] = [f"{value:.2f}" for value in values] + ([f"{(peak or 0) / 1024 ** 2:.1f}"] if memory else [])
+        return f"{name:<{width}}" + "".join(f"{cell:>{max(len(column) + 2, 10)}}" for cell, column in zip(cells, columns))
+
+    for entry in entries:
+        lines.append(row(Path(entry["file"]).name, [entry["total"], *(entry["stages"].get(name, 0.0) for name in stages)],
+                         entry.get("peak_bytes")))
+    lines.append(row("Total", [sum(entry["total"] for entry in entries),
+                               *(sum(entry["stages"].get(name, 0.0) for entry in entries) for name in stages)],
+                     max((entry.get("peak_bytes", 0) for entry in entries), default=0)))
+    return "\n".join(lines)
+
+def finish_profile() -> None:
+    """Prints the summary table and writes it with the trace as JSON, merging the cProfile statistics of every process.
+
+    It can be called again after more files are profiled, as in watch mode, and then covers every file so far.
+    """
+    if profile_dir is None:
+        return
+    entries: List[Dict[str, Any]] = load_trace(profile_dir)
+    if not entries:
+        print("No files were profiled.")
+        return
+    print(format_summary(entries))
+
+    totals: Dict[str, float] = {}
+    for entry in entries:
+        for name, seconds in entry["stages"].items():
+            totals[name] = totals.get(name, 0.0) + seconds
+    with open(profile_dir / SUMMARY_NAME, "w") as file:
+        json.dump({"profiler": profiler, "files": entries, "stages": totals}, file, indent=1)
+
+    stats_paths: List[Path] = sorted(profile_dir.glob("stats-*.prof"))
+    if stats_paths:
+        earlier: List[str] = [str(profile_dir / STATS_NAME)] if (profile_dir / STATS_NAME).exists() else []
+        stats = pstats.Stats(*earlier, *(str(path) for path in stats_paths))
+        stats.dump_stats(profile_dir / STATS_NAME)
+        for path in stats_paths:
+            path.unlink()
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+    print(f"Saved the profile to {profile_dir / SUMMARY_NAME}")
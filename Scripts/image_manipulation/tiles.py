@@ -0,0 +1,319 @@
+from PIL import Image, ImageEnhance
+from filters import (
+    gaussian_blur_array,
+    motion_blur_array,
+    motion_kernel_size,
+    point_table,
+    luma_total,
+    POINT_FILTERS
+)
+
+from overlay import (
+    resize_overlay_region,
+    enhance_overlay,
+    premultiply_overlay,
+    composite_array,
+    OVERLAY_FUNCTIONS,
+    OVERLAY_CACHE_SIZE
+)
+
+from effects import OVERLAYS, Variant, parse_chain
+from encoders import opencv_params, pil_params
+
+from typing import Callable, List, Optional, Tuple, Union
+from pathlib import Path
+from functools import lru_cache
+import tempfile
+import numpy as np
+import cv2
+
+TILE_SIZE: int = 1024  # Default width and height of a tile in pixels
+BAND_ROWS: int = 256  # Rows of a decoded image copied into its memory-mapped buffer at a time
+# Formats OpenCV encodes the same way PIL does, straight from the memory-mapped buffer
+DIRECT_WRITE_EXTENSIONS: Tuple[str, ...] = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif')
+
+Box = Tuple[int, int, int, int]  # Left, top, right and bottom of a region of an image
+# A lookup table, or a function of a tile and its box that maps each pixel on its own, such as an overlay
+Step = Union[np.ndarray, Callable[[np.ndarray, Box], np.ndarray]]
+
+def tile_boxes(width: int, height: int, tile_size: int) -> List[Box]:
+    """Splits an image into tiles, row by row.
+
+    Args:
+        width: Width of the image in pixels.
+        height: Height of the image in pixels.
+        tile_size: Width and height of a tile. Tiles on the right and bottom edges may be smaller.
+
+    Returns:
+        The box of every tile.
+    """
+    return [(left, top, min(left + tile_size, width), min(top + tile_size, height))
+            for top in range(0, height, tile_size) for left in range(0, width, tile_size)]
+
+def blur_halo(effect_name: str, strength: float, width: int) -> int:
+    """Gets how far outside a tile a blur reads, so tiles are blurred with their real neighbours.
+
+    Args:
+        effect_name: 'gaussian' or 'motion'.
+        strength: Strength of the blur.
+        width: Width of the whole image, which the motion blur kernel grows with.
+
+    Returns:
+        The margin in pixels added around every tile.
+    """
+    if effect_name == "gaussian":
+        # PIL's three box blurs and OpenCV's kernel both reach at most this far for 8-bit images
+        return 3 * (int(strength * 5) + 1)
+    return motion_kernel_size(strength, width) // 2 + 1
+
+def blur_function(effect_name: str, strength: float, width: int) -> Callable[[np.ndarray], np.ndarray]:
+    """Gets the function blurring a tile the way the whole image would be blurred.
+
+    Args:
+        effect_name: 'gaussian' or 'motion'.
+        strength: Strength of the blur.
+        width: Width of the whole image.
+
+    Returns:
+        A function taking a tile with its halo and returning it blurred.
+    """
+    if effect_name == "motion":
+        return lambda tile: motion_blur_array(tile, strength, width=width)
+    # Radii large enough for gaussian_blur_array to use a pyramid are approximated per tile
+    return lambda tile: gaussian_blur_array(tile, strength)
+
+def apply_steps(tile: np.ndarray, box: Box, steps: List[Step]) -> np.ndarray:
+    """Applies pixel-wise steps to a tile.
+
+    Args:
+        tile: The tile array.
+        box: The region of the image the tile covers.
+        steps: The lookup tables and functions to apply, in order.
+
+    Returns:
+        The processed tile array.
+    """
+    for step in steps:
+        tile = cv2.LUT(tile, step) if isinstance(step, np.ndarray) else step(tile, box)
+    return tile
+
+class TilePass:
+    """One pass over the tiles of an image: pixel-wise steps, at most one blur, then more pixel-wise steps.
+
+    Steps that map each pixel on their own need no neighbours, so they are fused into the
+    pass of the blur before or after them instead of taking a pass of their own.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        self.before: List[Step] = []
+        self.blur: Optional[Callable[[np.ndarray], np.ndarray]] = None
+        self.halo: int = 0
+        self.after: List[Step] = []
+
+    def add_step(self, step: Step) -> None:
+        """Adds a pixel-wise step after the ones already in the pass.
+
+        Args:
+            step: A lookup table, merged with a table right before it, or a function of a tile and its box.
+        """
+        steps: List[Step] = self.before if self.blur is None else self.after
+        if steps and isinstance(step, np.ndarray) and isinstance(steps[-1], np.ndarray):
+            steps[-1] = step[steps[-1]]
+        else:
+            steps.append(step)
+
+    def apply(self, source: np.ndarray, box: Box) -> np.ndarray:
+        """Processes one tile of an image.
+
+        Args:
+            source: The whole image array, usually memory-mapped.
+            box: The region of the tile.
+
+        Returns:
+            The processed tile array.
+        """
+        left, top, right, bottom = box
+        if self.blur is None:
+            return apply_steps(np.ascontiguousarray(source[top:bottom, left:right]), box, self.before)
+
+        # Read the tile with a halo of its neighbours, clipped to the image so edges are extended as before
+        outer: Box = (max(left - self.halo, 0), max(top - self.halo, 0),
+                      min(right + self.halo, self.width), min(bottom + self.halo, self.height))
+        tile: np.ndarray = np.ascontiguousarray(source[outer[1]:outer[3], outer[0]:outer[2]])
+        tile = self.blur(apply_steps(tile, outer, self.before))
+        tile = tile[top - outer[1]:bottom - outer[1], left - outer[0]:right - outer[0]]
+        return apply_steps(np.ascontiguousarray(tile), box, self.after)
+
+    def run(self, source: np.ndarray, target: np.ndarray, tile_size: int) -> None:
+        """Processes every tile of an image into another buffer of the same shape.
+
+        Args:
+            source: The whole image array.
+            target: The array the processed image is written to. It must not be source.
+            tile_size: Width and height of a tile.
+        """
+        for box in tile_boxes(self.width, self.height, tile_size):
+            target[box[1]:box[3], box[0]:box[2]] = self.apply(source, box)
+
+def tiled_luma_mean(source: np.ndarray, tile_pass: TilePass, tile_size: int) -> int:
+    """Measures the mean greyscale value of an image after a pass, one tile at a time.
+
+    Args:
+        source: The whole image array.
+        tile_pass: The pass the mean is measured after, without writing its result.
+        tile_size: Width and height of a tile.
+
+    Returns:
+        The mean luma rounded to the nearest integer, as luma_mean gives for the whole image.
+    """
+    total: int = sum(luma_total(tile_pass.apply(source, box))
+                     for box in tile_boxes(tile_pass.width, tile_pass.height, tile_size))
+    return int(total / (tile_pass.width * tile_pass.height) + 0.5)
+
+@lru_cache(maxsize=OVERLAY_CACHE_SIZE)
+def overlay_mean(effect_type: str, overlay_path: str, size: Tuple[int, int], tile_size: int) -> int:
+    """Measures the mean greyscale value of a brightened overlay, one tile at a time.
+
+    Args:
+        effect_type: The type of overlay.
+        overlay_path: Path to the overlay image.
+        size: The (width, height) of the whole image.
+        tile_size: Width and height of a tile.
+
+    Returns:
+        The mean ImageEnhance.Contrast would measure on the whole overlay.
+    """
+    histogram: np.ndarray = np.zeros(256, dtype=np.int64)
+    for box in tile_boxes(size[0], size[1], tile_size):
+        region: Image.Image = resize_overlay_region(effect_type, overlay_path, size, box)
+        region = ImageEnhance.Brightness(region).enhance(OVERLAY_FUNCTIONS[effect_type][0])
+        histogram += np.array(region.convert("L").histogram(), dtype=np.int64)
+    return int(histogram @ np.arange(256) / histogram.sum() + 0.5)
+
+def overlay_step(effect_type: str, size: Tuple[int, int], tile_size: int) -> Step:
+    """Gets the step compositing the matching region of an overlay onto each tile.
+
+    Args:
+        effect_type: The type of overlay.
+        size: The (width, height) of the whole image.
+        tile_size: Width and height of a tile.
+
+    Returns:
+        A function of a tile and its box returning the tile with the overlay applied.
+    """
+    overlay_path: str = str(OVERLAYS[effect_type])
+    mean: int = overlay_mean(effect_type, overlay_path, size, tile_size)
+
+    def apply_overlay(tile: np.ndarray, box: Box) -> np.ndarray:
+        region: Image.Image = enhance_overlay(resize_overlay_region(effect_type, overlay_path, size, box), effect_type, mean)
+        return composite_array(tile, *premultiply_overlay(np.asarray(region)))
+    return apply_overlay
+
+def apply_tiled(source: np.ndarray, target: np.ndarray, chain: List[Tuple[str, float]], tile_size: int,
+                scratch_dir: Path) -> None:
+    """Applies an effect chain to an image tile by tile, holding only a few tiles in memory.
+
+    Each blur reads a halo around every tile, so the result matches processing the whole
+    image. Pixel-wise steps ride along with the blurs, and the intermediate result between
+    two blurs goes to a memory-mapped buffer on disk. The intensity filter measures its mean
+    over every tile before it is applied.
+
+    Args:
+        source: The whole RGB image array, usually memory-mapped. It is not modified.
+        target: The array the processed image is written to.
+        chain: The (effect name, strength) pairs in the order they are applied.
+        tile_size: Width and height of a tile.
+        scratch_dir: Directory for the intermediate buffers.
+    """
+    height, width = source.shape[:2]
+    current: TilePass = TilePass(width, height)
+    buffers: int = 0
+
+    def materialize() -> np.ndarray:
+        nonlocal current, buffers
+        buffer: np.ndarray = np.memmap(scratch_dir / f"pass{buffers % 2}.raw", dtype=np.uint8, mode="w+", shape=source.shape)
+        current.run(source, buffer, tile_size)
+        current, buffers = TilePass(width, height), buffers + 1
+        return buffer
+
+    for effect_name, strength in chain:
+        if effect_name in OVERLAYS:
+            current.add_step(overlay_step(effect_name, (width, height), tile_size))
+        elif effect_name in POINT_FILTERS:
+            mean: int = 0
+            if effect_name == "intensity":
+                if current.blur is not None:
+                    source = materialize()
+                mean = tiled_luma_mean(source, current, tile_size)
+            current.add_step(point_table(effect_name, strength, mean))
+        else:
+            if current.blur is not None:
+                source = materialize()
+            current.blur = blur_function(effect_name, strength, width)
+            current.halo = blur_halo(effect_name, strength, width)
+    current.run(source, target, tile_size)
+
+def decode_image(file_path: Path, buffer_path: Path) -> np.ndarray:
+    """Decodes an image into a memory-mapped RGB buffer.
+
+    PIL decodes the whole image at once, so it is held in memory until it has been copied
+    to the buffer a band of rows at a time. Images in other modes are converted to RGB a
+    band at a time, so no second full-size copy is made.
+
+    Args:
+        file_path: Path to the image file.
+        buffer_path: Path of the file backing the buffer.
+
+    Returns:
+        The memory-mapped (height, width, 3) array.
+    """
+    with Image.open(file_path) as image:
+        buffer: np.ndarray = np.memmap(buffer_path, dtype=np.uint8, mode="w+", shape=(image.height, image.width, 3))
+        for top in range(0, image.height, BAND_ROWS):
+            bottom: int = min(top + BAND_ROWS, image.height)
+            band: Image.Image = image.crop((0, top, image.width, bottom))
+            buffer[top:bottom] = np.asarray(band if band.mode == "RGB" else band.convert("RGB"))
+    return buffer
+
+def save_image(buffer: np.ndarray, output_path: Path) -> None:
+    """Encodes a memory-mapped BGR buffer as an image file.
+
+    Formats OpenCV writes the same way as PIL are encoded straight from the buffer, so the
+    image is not copied into memory. Other formats go through PIL.
+
+    Args:
+        buffer: The (height, width, 3) array in BGR order.
+        output_path: Path of the image file.
+    """
+    extension: str = output_path.suffix.lower()
+    if extension in DIRECT_WRITE_EXTENSIONS:
+        if not cv2.imwrite(str(output_path), buffer, opencv_params(extension)):
+            raise OSError(f"Could not write {output_path}")
+    else:
+        Image.fromarray(np.ascontiguousarray(buffer[:, :, ::-1])).save(output_path, **pil_params(extension))
+
+def process_image_tiles(file_path: Path, variants: List[Variant], output_paths: List[Path], tile_size: int = TILE_SIZE) -> None:
+    """Applies every effect variant to an image tile by tile.
+
+    The image is decoded once into a memory-mapped buffer next to the outputs, so the full
+    decoded input is held in memory once while it is decoded. Each variant is then filtered
+    tile by tile into another buffer, and that is encoded without another copy in memory.
+
+    Args:
+        file_path: Path to the input image file.
+        variants: The (name, effect, strength) variants to apply.
+        output_paths: Path of the output of every variant.
+        tile_size: Width and height of a tile.
+    """
+    with tempfile.TemporaryDirectory(dir=output_paths[0].parent, prefix=".tiles-") as scratch:
+        scratch_dir: Path = Path(scratch)
+        source: np.ndarray = decode_image(file_path, scratch_dir / "input.raw")
+        output: np.ndarray = np.memmap(scratch_dir / "output.raw", dtype=np.uint8, mode="w+", shape=source.shape)
+        for (_, effect_name, strength), output_path in zip(variants, output_paths):
+            chain: List[Tuple[str, float]] = parse_chain(effect_name, strength)
+            # Writing through the reversed view stores BGR, the order OpenCV encodes
+            apply_tiled(source, output[:, :, ::-1], chain, tile_size, scratch_dir)
+            save_image(output, output_path)
+        del source, output  # Unmap the buffers before their files are deleted
@@ -0,0 +1,199 @@
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
+import importlib.util
+import threading
+import time
+
+# inotify events come through watchdog when it is installed, otherwise the tree is polled
+WATCHDOG_AVAILABLE: bool = importlib.util.find_spec("watchdog") is not None
+WATCH_POLL_SECONDS: float = 1.0  # How often new files are looked for and checked for being complete
+SETTLE_SECONDS: float = 2.0  # How long a file must stay unchanged before it is processed, so partial writes are skipped
+
+Signature = Tuple[int, int]  # Size and modification time of a file
+
+def file_signature(path: Path) -> Optional[Signature]:
+    """Gets what changes when a file is written to.
+
+    Args:
+        path: Path to the file.
+
+    Returns:
+        The size and modification time of the file, or None if it no longer exists.
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class FileWatcher:
+    """Finds new or changed files under a directory once they have stopped changing.
+
+    With watchdog installed, only the files named by inotify events are checked. Otherwise
+    the whole tree is scanned on every check.
+    """
+
+    def __init__(self, root: Path, extensions: Tuple[str, ...], exclude: Optional[Path] = None,
+                 settle_seconds: float = SETTLE_SECONDS, use_events: bool = WATCHDOG_AVAILABLE):
+        self.root: Path = root.resolve()
+        self.extensions: Tuple[str, ...] = tuple(extension.lower() for extension in extensions)
+        self.exclude: Optional[Path] = exclude.resolve() if exclude is not None else None
+        self.settle_seconds: float = settle_seconds
+        self.handled: Dict[Path, Signature] = {}  # Signature of every file when it was last reported
+        self.candidates: Dict[Path, Tuple[Optional[Signature], float]] = {}  # Signature and since when it was unchanged
+        self.events: Set[Path] = set()
+        self.lock: threading.Lock = threading.Lock()
+        self.observer = None
+        if use_events:
+            self.start_observer()
+
+    def watches(self, path: Path) -> bool:
+        """Checks whether a file is one of the watched files.
+
+        Args:
+            path: Path to the file.
+
+        Returns:
+            True if the file has a watched extension and is not in the excluded directory.
+        """
+        if path.suffix.lower() not in self.extensions:
+            return False
+        return self.exclude is None or self.exclude not in path.parents
+
+    def scan(self) -> List[Path]:
+        """Lists every watched file under the directory.
+
+        Returns:
+            The paths of the files.
+        """
+        return [path for path in self.root.rglob('*') if self.watches(path) and path.is_file()]
+
+    def mark_existing(self, include: bool = False) -> None:
+        """Records the files already in the directory.
+
+        Args:
+            include: Whether they are reported once they have settled, like new files. By default
+                only files added or changed later are reported.
+        """
+        for path in self.scan():
+            signature: Optional[Signature] = file_signature(path)
+            if signature is None:
+                continue
+            if include:
+                self.candidates[path] = (None, 0.0)
+            else:
+                self.handled[path] = signature
+
+    def start_observer(self) -> None:
+        """Starts receiving inotify events for the directory through watchdog."""
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+        watcher = self
+
+        class EventHandler(FileSystemEventHandler):
+            def on_any_event(self, event) -> None:
+                if event.is_directory:
+                    return
+                with watcher.lock:
+                    for path in (event.src_path, getattr(event, "dest_path", "")):
+                        if path:
+                            watcher.events.add(Path(path))
+
+        self.observer = Observer()
+        self.observer.schedule(EventHandler(), str(self.root), recursive=True)
+        self.observer.start()
+
+    def stop(self) -> None:
+        """Stops receiving inotify events."""
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+
+    def ready_files(self, now: float) -> List[Path]:
+        """Finds the files that changed and then stayed unchanged for settle_seconds.
+
+        Args:
+            now: The current time from time.monotonic().
+
+        Returns:
+            The paths of the files, each reported once per change.
+        """
+        if self.observer is None:
+            changed: List[Path] = self.scan()
+        else:
+            with self.lock:
+                changed = list(self.events)
+                self.events.clear()
+        for path in changed:
+            if path not in self.candidates and self.watches(path):
+                self.candidates[path] = (None, now)
+
+        ready: List[Path] = []
+        for path, (signature, since) in list(self.candidates.items()):
+            current: Optional[Signature] = file_signature(path)
+            if current is None or current == self.handled.get(path):
+                del self.candidates[path]  # Deleted, or unchanged since it was last reported
+            elif current != signature:
+                self.candidates[path] = (current, now)  # Still being written
+            elif now - since >= self.settle_seconds:
+                ready.append(path)
+                self.handled[path] = current
+                del self.candidates[path]
+        return sorted(ready)
+
+def report_failure(batch: Future) -> None:
+    """Prints the error a finished batch raised, if any.
+
+    Args:
+        batch: The finished batch.
+    """
+    error: Optional[BaseException] = batch.exception()
+    if error is not None:
+        print(f"Error processing new files: {type(error).__name__}: {error}")
+
+def watch(root: Path, extensions: Tuple[str, ...], handle_files: Callable[[List[Path]], None],
+          exclude: Optional[Path] = None, settle_seconds: float = SETTLE_SECONDS,
+          poll_seconds: float = WATCH_POLL_SECONDS, include_existing: bool = False,
+          stop: Optional[threading.Event] = None) -> None:
+    """Hands new or changed files under a directory to handle_files until stopped or interrupted.
+
+    One batch of files is handled at a time, in a background thread, so the directory keeps
+    being watched meanwhile. Files that become ready while a batch runs are handled together
+    in the next one.
+
+    Args:
+        root: The directory to watch.
+        extensions: The extensions of the files to watch.
+        handle_files: Processes a batch of files.
+        exclude: A directory under root whose files are ignored, such as the output directory.
+        settle_seconds: How long a file must stay unchanged before it is handled.
+        poll_seconds: How often the directory is checked.
+        include_existing: Whether the files already in the directory are handled too, as the first batch.
+            Watching starts before they are listed, so no file added meanwhile is missed.
+        stop: Event that stops watching when set. Defaults to watching until interrupted.
+    """
+    watcher = FileWatcher(root, extensions, exclude, settle_seconds)
+    watcher.mark_existing(include_existing)
+    stop = stop or threading.Event()
+    print(f"Watching {root} for new files using {'inotify' if watcher.observer else 'polling'}. Press Ctrl+C to stop.")
+
+    queued: List[Path] = []
+    running: Optional[Future] = None
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            while not stop.is_set():
+                queued += [path for path in watcher.ready_files(time.monotonic()) if path not in queued]
+                if running is not None and running.done():
+                    report_failure(running)
+                    running = None
+                if running is None and queued:
+                    running = executor.submit(handle_files, queued)
+                    queued = []
+                stop.wait(poll_seconds)
+        except KeyboardInterrupt:
+            print("Stopping, waiting for the files being processed.")
+        finally:
+            watcher.stop()
+    if running is not None:
+        report_failure(running)
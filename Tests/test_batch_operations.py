@@ -15,8 +15,10 @@ from unittest.mock import patch, MagicMock, mock_open
 from pathlib import Path
 import pytest
 from batch_operations import generate_batch_file, process_batch, check_batch, export_batch, list_batches, upload_batch_file, get_file_dict, delete_exported_files
+from batch_operations import find_orphaned_files, delete_files, prune_local_batch_files, list_provider_files
 from utils import get_file_dict
 import tempfile
+import time
 import openai
 
 
@@ -423,6 +425,88 @@ class TestDeleteExportedFiles(unittest.TestCase):
     
 
 
+class TestCleanupBatchFiles(unittest.TestCase):
+
+    # Case 26: Files of failed batches and unreferenced files are orphaned, files of other batches are kept
+    def test_find_orphaned_files(self):
+        mock_client = MagicMock()
+        mock_client.batches.list.return_value = [
+            MagicMock(status="completed", input_file_id="file_a", output_file_id="file_b", error_file_id=None),
+            MagicMock(status="cancelled", input_file_id="file_c", output_file_id=None, error_file_id=None),
+            MagicMock(status="in_progress", input_file_id="file_d", output_file_id=None, error_file_id=None),
+        ]
+        created_at = time.time() - 30 * 24 * 60 * 60
+        batch_files = [MagicMock(id=file_id, filename=f"road_safety_{file_id}.jsonl", created_at=created_at)
+                       for file_id in ("file_a", "file_c", "file_d", "file_e")]
+        output_files = [MagicMock(id="file_b", filename="batch_output.jsonl", created_at=created_at)]
+        mock_client.files.list.side_effect = [MagicMock(data=batch_files, has_more=False),
+                                              MagicMock(data=output_files, has_more=False)]
+
+        orphans = find_orphaned_files(mock_client)
+
+        self.assertEqual(sorted(file.id for file in orphans), ["file_c", "file_e"])
+
+    # Case 27: Provider files are listed across pages
+    def test_list_provider_files_pagination(self):
+        mock_client = MagicMock()
+        mock_client.files.list.side_effect = [
+            MagicMock(data=[MagicMock(id="file_a"), MagicMock(id="file_b")], has_more=True),
+            MagicMock(data=[MagicMock(id="file_c")], has_more=False),
+        ]
+        files = list_provider_files(mock_client, "batch")
+        self.assertEqual([file.id for file in files], ["file_a", "file_b", "file_c"])
+        self.assertEqual(mock_client.files.list.call_args_list[1].kwargs["extra_query"]["after"], "file_b")
+
+    # Case 28: Files are deleted and failures are counted as not deleted
+    def test_delete_files(self):
+        def delete(file_id):
+            if file_id == "file_b":
+                raise Exception("File not found")
+        mock_client = MagicMock()
+        mock_client.files.delete.side_effect = delete
+        deleted = delete_files(mock_client, ["file_a", "file_b", "file_c"])
+        self.assertEqual(deleted, 2)
+        self.assertEqual(mock_client.files.delete.call_count, 3)
+
+    # Case 29: Local batch files are pruned by age, then oldest first by size
+    def test_prune_local_batch_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            batch_dir = Path(temp_dir)
+            now = time.time()
+            for name, age_days in (("old", 10), ("middle", 2), ("new", 0)):
+                path = batch_dir / f"{name}.jsonl"
+                path.write_bytes(b"x" * 1024 * 1024)
+                os.utime(path, (now - age_days * 86400, now - age_days * 86400))
+
+            pruned = prune_local_batch_files(batch_dir, max_age_days=7, max_local_mb=1.5, dry_run=True)
+            self.assertEqual([path.name for path in pruned], ["old.jsonl", "middle.jsonl"])
+            self.assertEqual(len(list(batch_dir.glob("*.jsonl"))), 3)
+
+            pruned = prune_local_batch_files(batch_dir, max_age_days=7, max_local_mb=100)
+            self.assertEqual([path.name for path in pruned], ["old.jsonl"])
+            self.assertEqual(sorted(path.name for path in batch_dir.glob("*.jsonl")), ["middle.jsonl", "new.jsonl"])
+
+    # Case 30: Files of other tools, and files too new to be referenced by their batch yet, are never orphaned
+    def test_find_orphaned_files_owned_and_old(self):
+        mock_client = MagicMock()
+        mock_client.batches.list.return_value = [
+            MagicMock(status="failed", input_file_id="file_a", output_file_id=None, error_file_id="file_b"),
+            MagicMock(status="failed", input_file_id="file_c", output_file_id=None, error_file_id="file_d"),
+        ]
+        old, new = time.time() - 30 * 24 * 60 * 60, time.time() - 60
+        batch_files = [MagicMock(id="file_a", filename="road_safety_images.jsonl", created_at=old),
+                       MagicMock(id="file_c", filename="other_tool.jsonl", created_at=old),
+                       MagicMock(id="file_e", filename="road_safety_videos.jsonl", created_at=new)]
+        output_files = [MagicMock(id="file_b", filename="batch_a_error.jsonl", created_at=old),
+                        MagicMock(id="file_d", filename="batch_c_error.jsonl", created_at=old)]
+        mock_client.files.list.side_effect = [MagicMock(data=batch_files, has_more=False),
+                                              MagicMock(data=output_files, has_more=False)]
+
+        orphans = find_orphaned_files(mock_client, max_age_days=7)
+
+        self.assertEqual(sorted(file.id for file in orphans), ["file_a", "file_b"])
+
+
 if __name__ == "__main__":
     unittest.main()
 
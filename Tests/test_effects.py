@@ -0,0 +1,87 @@
+# Test cases for the effect chains of the image manipulation program
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_effects.py
+# or
+#     pytest test_effects.py
+
+import sys
+import os
+import unittest
+from unittest.mock import patch
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation')))
+import effects
+from effects import parse_chain, chain_effect, stage_effect, frame_effect, apply_image_effect, parse_strengths, effect_variants, variants_effect, FILTERS
+
+
+class TestEffectChains(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.image = rng.integers(0, 256, (45, 80, 3), dtype=np.uint8)
+
+    # Case 1: Stages without a strength take the default one
+    def test_parse_chain(self):
+        self.assertEqual(parse_chain("fog+motion@0.3+darkness@0.6", 0.5), [("fog", 0.5), ("motion", 0.3), ("darkness", 0.6)])
+        self.assertEqual(parse_chain("gaussian", 0.2), [("gaussian", 0.2)])
+
+    # Case 2: Unknown effects and invalid strengths are rejected
+    def test_parse_chain_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_chain("fog+snow", 0.5)
+        with self.assertRaises(ValueError):
+            parse_chain("darkness@high", 0.5)
+
+    # Case 3: A fused chain gives the same result as applying each stage in turn
+    def test_chain_matches_stages(self):
+        chain = [("darkness", 0.3), ("brightness", 0.2), ("motion", 0.4), ("intensity", 0.5), ("darkness", 0.1)]
+        expected = self.image
+        for effect_name, strength in chain:
+            expected = stage_effect(effect_name, strength)(expected)
+        np.testing.assert_array_equal(chain_effect(chain)(self.image), expected)
+
+    # Case 4: Consecutive point filters are applied as one lookup
+    def test_point_filters_merged(self):
+        chain = [("darkness", 0.3), ("brightness", 0.2), ("motion", 0.4), ("intensity", 0.5)]
+        with patch.object(effects, "apply_point_filters", wraps=effects.apply_point_filters) as mock_apply:
+            chain_effect(chain)(self.image)
+        self.assertEqual([call.args[1] for call in mock_apply.call_args_list],
+                         [[("darkness", 0.3), ("brightness", 0.2)], [("intensity", 0.5)]])
+
+    # Case 5: A single effect on an image still goes through its PIL filter
+    def test_single_effect_image(self):
+        image = Image.fromarray(self.image)
+        expected = np.array(FILTERS["gaussian"](image, 0.4))
+        np.testing.assert_array_equal(np.array(apply_image_effect(image, "gaussian@0.4", 0.9)), expected)
+
+
+class TestStrengthSweep(unittest.TestCase):
+
+    # Case 6: Ranges include their end without floating point drift
+    def test_parse_strengths(self):
+        self.assertEqual(parse_strengths("0.1:0.5:0.1"), [0.1, 0.2, 0.3, 0.4, 0.5])
+        self.assertEqual(parse_strengths("0.2,0.7"), [0.2, 0.7])
+        with self.assertRaises(ValueError):
+            parse_strengths("0.1:0.5:0")
+        with self.assertRaises(ValueError):
+            parse_strengths("0.1:0.5")
+
+    # Case 7: Sweep outputs are named after the strength unless it does not change the effect
+    def test_effect_variants(self):
+        self.assertEqual(effect_variants(["darkness"], [0.5]), [("darkness", "darkness", 0.5)])
+        variants = effect_variants(["darkness", "rain", "fog+motion@0.3"], [0.1, 0.2], sweep=True)
+        self.assertEqual([name for name, _, _ in variants], ["darkness@0.1", "darkness@0.2", "rain", "fog+motion@0.3"])
+
+    # Case 8: Every variant of a frame matches applying its effect alone
+    def test_variants_match_single(self):
+        image = np.random.default_rng(1).integers(0, 256, (45, 80, 3), dtype=np.uint8)
+        variants = effect_variants(["intensity", "brightness", "motion", "darkness+gaussian"], [0.3, 0.8], sweep=True)
+        for (name, effect_name, strength), result in zip(variants, variants_effect(variants)(image)):
+            np.testing.assert_array_equal(result, frame_effect(effect_name, strength)(image), err_msg=name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# Test cases for encoding and saving the outputs of the image manipulation program
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_encoders.py
+# or
+#     pytest test_encoders.py
+
+import sys
+import os
+import importlib.util
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+SCRIPT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation'))
+sys.path.append(SCRIPT_DIR)
+# The api also has a main module, so this one is loaded under its own name
+spec = importlib.util.spec_from_file_location("interference_main", os.path.join(SCRIPT_DIR, "main.py"))
+interference_main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(interference_main)
+import encoders
+from encoders import ImageWriter, save_image, set_output_options
+from effects import effect_variants
+
+
+class TestEncoders(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self.temp_dir.name)
+        rng = np.random.default_rng(0)
+        self.image = Image.fromarray(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8))
+
+    def tearDown(self):
+        set_output_options()
+        self.temp_dir.cleanup()
+
+    # Case 1: PNG images are encoded by OpenCV with the same pixels as PIL, unless PIL has to keep a colour profile
+    def test_png_pixels(self):
+        for image in (self.image, self.image.convert("L"), self.image.convert("RGBA")):
+            save_image(image, self.dir_path / "image.png")
+            with Image.open(self.dir_path / "image.png") as saved:
+                self.assertEqual(saved.mode, image.mode)
+                np.testing.assert_array_equal(np.array(saved), np.array(image))
+
+        self.image.info["icc_profile"] = b"profile"
+        with patch.object(encoders.cv2, "imencode") as mock_imencode:
+            save_image(self.image, self.dir_path / "profiled.png")
+        mock_imencode.assert_not_called()
+
+    # Case 2: The quality and compression level are passed to the encoders
+    def test_encoder_settings(self):
+        save_image(self.image, self.dir_path / "default.jpg")
+        set_output_options(quality_value=20, compression_value=0)
+        save_image(self.image, self.dir_path / "low.jpg")
+        save_image(self.image, self.dir_path / "stored.png")
+        self.assertLess((self.dir_path / "low.jpg").stat().st_size, (self.dir_path / "default.jpg").stat().st_size)
+        self.assertGreater((self.dir_path / "stored.png").stat().st_size, 48 * 64 * 3)
+
+    # Case 3: Images are converted to the chosen format and recorded under their new names
+    def test_output_format(self):
+        input_path = self.dir_path / "input" / "image.png"
+        input_path.parent.mkdir()
+        self.image.convert("RGBA").save(input_path)
+        set_output_options("jpg")
+        output_dir = self.dir_path / "output"
+        errors = interference_main.build_files([input_path], effect_variants(["darkness", "rain"], [0.5], sweep=True), output_dir)
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(path.name for path in output_dir.iterdir() if not path.name.startswith(".")),
+                         ["darkness@0.5_image.jpg", "rain_image.jpg"])
+        self.assertEqual(interference_main.unique_outputs([input_path, input_path.with_suffix(".bmp")]), [input_path.with_suffix(".bmp")])
+
+    # Case 4: Saving in the background gives the same files, and failures are reported against their input
+    def test_background_writer(self):
+        input_paths = []
+        for i in range(3):
+            input_paths.append(self.dir_path / f"image{i}.png")
+            self.image.rotate(90 * i).save(input_paths[-1])
+        variants = effect_variants(["darkness"], [0.4])
+        set_output_options(threads=0)
+        self.assertEqual(interference_main.process_files(input_paths, variants, self.dir_path / "sync"), [])
+        set_output_options(threads=2)
+        # One writer is kept across chunks and only closed after the last one
+        self.assertEqual(interference_main.process_chunks([input_paths[:2], input_paths[2:]], variants, self.dir_path / "async"), [])
+        # Other tests load main under the same name, and worker processes look its functions up by that name
+        with patch.dict(sys.modules, {"interference_main": interference_main}):
+            self.assertEqual(interference_main.process_files(input_paths, variants, self.dir_path / "workers", jobs=2), [])
+        for i in range(3):
+            name = f"darkness_image{i}.png"
+            self.assertEqual((self.dir_path / "async" / name).read_bytes(), (self.dir_path / "sync" / name).read_bytes())
+            self.assertEqual((self.dir_path / "workers" / name).read_bytes(), (self.dir_path / "sync" / name).read_bytes())
+
+        writer = ImageWriter(threads=2, queue_size=1)
+        writer.submit(input_paths[0], self.image, self.dir_path / "missing" / "image.png")
+        writer.submit(input_paths[1], self.image, self.dir_path / "image.bmp")
+        errors = writer.close()
+        self.assertEqual([path for path, _ in errors], [input_paths[0]])
+        self.assertTrue((self.dir_path / "image.bmp").exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# Test cases for the filters of the image manipulation program
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_filters.py
+# or
+#     pytest test_filters.py
+
+import sys
+import os
+import unittest
+import numpy as np
+import cv2
+from PIL import Image, ImageEnhance, ImageFilter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation')))
+from filters import (
+    darkness_filter, brightness_filter, gaussian_blur_filter, intensity_filter, motion_blur_filter,
+    darkness_array, brightness_array, gaussian_blur_array, intensity_array, motion_blur_array,
+    apply_point_filters, blend_table
+)
+
+FILTER_PAIRS = {
+    "darkness": (darkness_filter, darkness_array),
+    "brightness": (brightness_filter, brightness_array),
+    "gaussian": (gaussian_blur_filter, gaussian_blur_array),
+    "intensity": (intensity_filter, intensity_array),
+    "motion": (motion_blur_filter, motion_blur_array),
+}
+
+
+def dense_motion_blur(image: np.ndarray, strength: float) -> np.ndarray:
+    """The motion blur as applied before it became a 1-D filter."""
+    kernel_size = int(strength * image.shape[1] / 20)
+    if kernel_size < 1:
+        return image
+    kernel = np.zeros((kernel_size, kernel_size))
+    kernel[int((kernel_size - 1) / 2), :] = np.ones(kernel_size)
+    return cv2.filter2D(image, -1, kernel / kernel_size)
+
+
+class TestArrayFilters(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.image = rng.integers(0, 256, (90, 160, 3), dtype=np.uint8)
+        # PIL approximates the Gaussian with box blurs, which only differs visibly on pixel noise
+        coarse = rng.integers(0, 256, (9, 16, 3), dtype=np.uint8)
+        self.smooth_image = cv2.resize(coarse, (160, 90), interpolation=cv2.INTER_CUBIC)
+
+    def compare(self, name: str, strength: float, image: np.ndarray = None) -> int:
+        image = self.image if image is None else image
+        pil_filter, array_filter = FILTER_PAIRS[name]
+        expected = np.array(pil_filter(Image.fromarray(image), strength)).astype(int)
+        result = array_filter(image.copy(), strength)
+        self.assertEqual(result.dtype, np.uint8)
+        self.assertEqual(result.shape, image.shape)
+        return int(np.abs(result.astype(int) - expected).max())
+
+    # Case 1: Point filters give exactly the PIL output
+    def test_point_filters_exact(self):
+        for name in ("darkness", "brightness", "intensity"):
+            for strength in (0.0, 0.3, 0.5, 1.0):
+                self.assertEqual(self.compare(name, strength), 0, f"{name} at {strength}")
+
+    # Case 2: Horizontal motion blur stays within one level of the dense kernel, for odd and even sizes
+    def test_motion_blur_close(self):
+        for strength in (0.1, 0.5, 0.625, 0.75, 1.0):
+            expected = dense_motion_blur(self.image, strength).astype(int)
+            result = motion_blur_array(self.image, strength)
+            self.assertLessEqual(np.abs(result.astype(int) - expected).max(), 1, f"motion at {strength}")
+            self.assertEqual(self.compare("motion", strength), 0, f"motion at {strength}")
+
+    # Case 3: Gaussian blur stays within a few levels of PIL's box blur approximation
+    def test_gaussian_blur_close(self):
+        for strength in (0.0, 0.2, 0.5):
+            expected = np.array(Image.fromarray(self.smooth_image).filter(ImageFilter.GaussianBlur(strength * 5))).astype(int)
+            result = gaussian_blur_array(self.smooth_image, strength)
+            self.assertLessEqual(np.abs(result.astype(int) - expected).max(), 3, f"gaussian at {strength}")
+
+    # Case 4: Array filters do not modify their input
+    def test_input_unchanged(self):
+        original = self.image.copy()
+        for _, array_filter in FILTER_PAIRS.values():
+            array_filter(self.image, 0.5)
+        np.testing.assert_array_equal(self.image, original)
+
+    # Case 5: Large radii blurred through the pyramid stay close to a full-size blur
+    def test_gaussian_pyramid_close(self):
+        image = cv2.resize(self.smooth_image, (640, 360), interpolation=cv2.INTER_CUBIC)
+        for strength in (2.0, 4.0):
+            expected = cv2.GaussianBlur(image, (0, 0), strength * 5, borderType=cv2.BORDER_REPLICATE).astype(int)
+            difference = np.abs(gaussian_blur_array(image, strength).astype(int) - expected)
+            self.assertLess(difference.mean(), 1.0, f"gaussian at {strength}")
+            self.assertLessEqual(difference.max(), 10, f"gaussian at {strength}")
+
+    # Case 6: A vertical motion blur averages along columns
+    def test_motion_blur_angle(self):
+        strength = 0.625  # Odd kernel size of 5
+        expected = cv2.blur(self.smooth_image, (1, 5)).astype(int)
+        result = motion_blur_array(self.smooth_image, strength, angle=90)
+        self.assertLessEqual(np.abs(result.astype(int) - expected).max(), 1)
+
+
+class TestPointTables(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.image = rng.integers(0, 256, (60, 80, 4), dtype=np.uint8)
+
+    # Case 7: Table filters match ImageEnhance for every mode they handle, including alpha
+    def test_matches_image_enhance(self):
+        for mode in ("L", "RGB", "RGBA"):
+            image = Image.fromarray(self.image, "RGBA").convert(mode)
+            for strength in (0.2, 0.7):
+                expected = ImageEnhance.Brightness(image).enhance(1.0 - strength)
+                np.testing.assert_array_equal(np.array(darkness_filter(image, strength)), np.array(expected), err_msg=mode)
+                expected = ImageEnhance.Brightness(image).enhance(strength * 2 + 1.0)
+                np.testing.assert_array_equal(np.array(brightness_filter(image, strength)), np.array(expected), err_msg=mode)
+                expected = ImageEnhance.Contrast(image).enhance(strength * 2 + 1)
+                np.testing.assert_array_equal(np.array(intensity_filter(image, strength)), np.array(expected), err_msg=mode)
+
+    # Case 8: Chained point filters give the same result as applying them one by one
+    def test_combined_chain(self):
+        image = np.ascontiguousarray(self.image[:, :, :3])
+        steps = [("darkness", 0.3), ("brightness", 0.4), ("intensity", 0.5), ("darkness", 0.2)]
+        expected = image
+        for effect_name, strength in steps:
+            expected = {"darkness": darkness_array, "brightness": brightness_array, "intensity": intensity_array}[effect_name](expected, strength)
+        np.testing.assert_array_equal(apply_point_filters(image, steps), expected)
+
+    # Case 9: Tables are built once per factor
+    def test_table_cached(self):
+        blend_table.cache_clear()
+        for _ in range(3):
+            darkness_array(np.ascontiguousarray(self.image[:, :, :3]), 0.4)
+        self.assertEqual(blend_table.cache_info().misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
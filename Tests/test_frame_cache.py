@@ -0,0 +1,137 @@
+# Test cases for caching decoded video frames
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_frame_cache.py
+# or
+#     pytest test_frame_cache.py
+
+import sys
+import os
+import importlib.util
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import numpy as np
+import cv2
+
+SCRIPT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation'))
+sys.path.append(SCRIPT_DIR)
+# The api also has a main module, so this one is loaded under its own name
+spec = importlib.util.spec_from_file_location("interference_main", os.path.join(SCRIPT_DIR, "main.py"))
+interference_main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(interference_main)
+import frame_cache
+from frame_cache import FrameSource
+from effects import effect_variants
+
+
+def read_all(source: FrameSource) -> list:
+    frames = []
+    try:
+        frame = source.read()
+        while frame is not None:
+            frames.append(np.array(frame))
+            frame = source.read()
+    finally:
+        source.close()
+    return frames
+
+
+class TestFrameCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self.temp_dir.name)
+        self.cache_dir = self.dir_path / "cache"
+        rng = np.random.default_rng(0)
+        base = cv2.resize(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8), (64, 48))
+        self.video_path = self.dir_path / "video.mp4"
+        writer = cv2.VideoWriter(str(self.video_path), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+        for i in range(25):
+            writer.write(np.roll(base, i, axis=1))
+        writer.release()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Case 1: The first read decodes and caches the frames, later reads map them without decoding
+    def test_decode_once(self):
+        decoded = read_all(FrameSource(self.video_path))
+        self.assertEqual(len(read_all(FrameSource(self.video_path, cache_dir=self.cache_dir))), 25)
+        with patch.object(frame_cache.cv2, "VideoCapture") as mock_capture:
+            source = FrameSource(self.video_path, cache_dir=self.cache_dir)
+            self.assertTrue(source.cached)
+            self.assertEqual((source.fps, source.size), (10.0, (64, 48)))
+            cached = read_all(source)
+        mock_capture.assert_not_called()
+        np.testing.assert_array_equal(np.stack(cached), np.stack(decoded))
+
+    # Case 2: Sampled frames are served from a cache of every frame, or cached on their own
+    def test_sampled(self):
+        decoded = read_all(FrameSource(self.video_path, sampled=True))
+        self.assertEqual(len(decoded), 3)
+        read_all(FrameSource(self.video_path, sampled=True, cache_dir=self.cache_dir))
+        self.assertFalse(FrameSource(self.video_path, cache_dir=self.cache_dir).cached)  # Only the sampled frames are cached
+        source = FrameSource(self.video_path, sampled=True, cache_dir=self.cache_dir)
+        self.assertTrue(source.cached)
+        np.testing.assert_array_equal(np.stack(read_all(source)), np.stack(decoded))
+
+        read_all(FrameSource(self.video_path, cache_dir=self.cache_dir))
+        for path in self.cache_dir.glob("*sampled*"):
+            path.unlink()
+        source = FrameSource(self.video_path, sampled=True, cache_dir=self.cache_dir)
+        self.assertTrue(source.cached)
+        np.testing.assert_array_equal(np.stack(read_all(source)), np.stack(decoded))
+
+    # Case 3: Partly read videos are not cached and changed videos are decoded again
+    def test_invalidation(self):
+        source = FrameSource(self.video_path, cache_dir=self.cache_dir)
+        source.read()
+        source.close()
+        self.assertEqual(list(self.cache_dir.iterdir()), [])
+        read_all(FrameSource(self.video_path, cache_dir=self.cache_dir))
+        os.utime(self.video_path, (0, 0))
+        self.assertFalse(FrameSource(self.video_path, cache_dir=self.cache_dir).cached)
+
+    # Case 4: Videos processed from the cache match those decoded from the file
+    def test_process_video(self):
+        variants = effect_variants(["darkness", "rain"], [0.4], sweep=True)
+        interference_main.process_video_variants(self.video_path, variants, self.dir_path / "decoded")
+        with patch.object(frame_cache, "frame_cache_dir", self.cache_dir):
+            interference_main.process_video_variants(self.video_path, variants, self.dir_path / "first")
+            with patch.object(frame_cache.cv2, "VideoCapture") as mock_capture:
+                interference_main.process_video_variants(self.video_path, variants, self.dir_path / "cached")
+        mock_capture.assert_not_called()
+        for name in ("darkness@0.4_video.mp4", "rain_video.mp4"):
+            self.assertEqual((self.dir_path / "cached" / name).read_bytes(), (self.dir_path / "decoded" / name).read_bytes())
+
+    # Case 5: Two readers decoding the same video into one cache both close, and one entry is kept
+    def test_concurrent_writers(self):
+        first = FrameSource(self.video_path, cache_dir=self.cache_dir)
+        second = FrameSource(self.video_path, cache_dir=self.cache_dir)
+        for source in (first, second):
+            while source.read() is not None:
+                pass
+        first.close()
+        second.close()
+        self.assertEqual(sorted(path.suffix for path in self.cache_dir.iterdir()), [".frames", ".json"])
+        self.assertEqual(len(read_all(FrameSource(self.video_path, cache_dir=self.cache_dir))), 25)
+
+    # Case 6: Videos too large for the cache and failed writes are processed without being cached
+    def test_not_cached(self):
+        with patch.object(frame_cache, "FRAME_CACHE_MAX_BYTES", 64 * 48 * 3 * 10):
+            self.assertEqual(len(read_all(FrameSource(self.video_path, cache_dir=self.cache_dir))), 25)
+        self.assertFalse(self.cache_dir.exists())
+
+        source = FrameSource(self.video_path, cache_dir=self.cache_dir)
+        source.read()
+        with patch.object(source.cache_file, "write", side_effect=OSError("No space left on device")):
+            frames = [source.read()]
+        frames += read_all(source)
+        self.assertEqual(len(frames) + 1, 25)
+        self.assertEqual(list(self.cache_dir.iterdir()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+# Test cases for the interference program (Scripts/image_manipulation/main.py)
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_interference.py
+# or
+#     pytest test_interference.py
+
+import sys
+import os
+import importlib.util
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import numpy as np
+import cv2
+from PIL import Image
+
+IMAGE_MANIPULATION_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation'))
+sys.path.append(IMAGE_MANIPULATION_DIR)
+
+# The api also has a main module, so this one is loaded under its own name
+spec = importlib.util.spec_from_file_location("interference_main", os.path.join(IMAGE_MANIPULATION_DIR, "main.py"))
+interference_main = importlib.util.module_from_spec(spec)
+sys.modules["interference_main"] = interference_main
+spec.loader.exec_module(interference_main)
+from effects import effect_variants, frame_effect
+
+
+class TestProcessFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = Path(self.temp_dir.name) / "input"
+        (self.input_dir / "sub").mkdir(parents=True)
+        rng = np.random.default_rng(0)
+        self.file_paths = []
+        for i in range(5):
+            path = self.input_dir / f"image{i}.png"
+            Image.fromarray(rng.integers(0, 256, (30, 40, 3), dtype=np.uint8)).save(path)
+            self.file_paths.append(path)
+        self.broken = [self.input_dir / "broken_a.jpg", self.input_dir / "sub" / "broken_b.jpg"]
+        for path in self.broken:
+            path.write_bytes(b"not an image")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Case 1: Worker processes write the same files as processing in one process
+    def test_jobs_match_sequential(self):
+        file_paths = sorted(self.file_paths)
+        sequential_dir = Path(self.temp_dir.name) / "sequential"
+        parallel_dir = Path(self.temp_dir.name) / "parallel"
+        variants = effect_variants(["brightness"], [0.5])
+        self.assertEqual(interference_main.process_files(file_paths, variants, sequential_dir), [])
+        self.assertEqual(interference_main.process_files(file_paths, variants, parallel_dir, jobs=2), [])
+        for path in file_paths:
+            expected = np.array(Image.open(sequential_dir / f"brightness_{path.name}"))
+            np.testing.assert_array_equal(np.array(Image.open(parallel_dir / f"brightness_{path.name}")), expected)
+
+    # Case 2: Failed files are reported in input order without stopping the others
+    def test_errors_in_input_order(self):
+        file_paths = [self.broken[1], *self.file_paths, self.broken[0]]
+        output_dir = Path(self.temp_dir.name) / "output"
+        for jobs in (1, 3):
+            errors = interference_main.process_files(file_paths, effect_variants(["darkness"], [0.5]), output_dir, jobs=jobs)
+            self.assertEqual([path for path, _ in errors], [self.broken[1], self.broken[0]])
+        self.assertEqual(len(list(output_dir.iterdir())), len(self.file_paths))
+
+    # Case 3: Files with the same name keep only the last one, as it would overwrite the others
+    def test_unique_outputs(self):
+        duplicate = self.input_dir / "sub" / "image0.png"
+        file_paths = [self.file_paths[0], self.file_paths[1], duplicate]
+        self.assertEqual(interference_main.unique_outputs(file_paths), [self.file_paths[1], duplicate])
+
+    # Case 4: A sweep writes one file per effect and strength, matching each effect applied alone
+    def test_sweep_matches_single(self):
+        single_dir = Path(self.temp_dir.name) / "single"
+        sweep_dir = Path(self.temp_dir.name) / "sweep"
+        variants = effect_variants(["darkness", "intensity", "rain"], [0.2, 0.6], sweep=True)
+        self.assertEqual(interference_main.process_files(self.file_paths[:2], variants, sweep_dir), [])
+        self.assertEqual(len(list(sweep_dir.iterdir())), 2 * 5)
+        for name, effect_name, strength in variants:
+            interference_main.process_image(self.file_paths[0], effect_name, strength, single_dir)
+            expected = np.array(Image.open(single_dir / f"{effect_name}_{self.file_paths[0].name}"))
+            result = np.array(Image.open(sweep_dir / f"{name}_{self.file_paths[0].name}"))
+            np.testing.assert_array_equal(result, expected, err_msg=name)
+
+
+def read_frames(path: Path):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    ret, frame = cap.read()
+    while ret:
+        frames.append(frame.astype(int))
+        ret, frame = cap.read()
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return frames, fps
+
+
+class TestVideoSegments(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.video = Path(self.temp_dir.name) / "video.mp4"
+        rng = np.random.default_rng(0)
+        base = cv2.resize(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8), (64, 48))
+        writer = cv2.VideoWriter(str(self.video), cv2.VideoWriter_fourcc(*'mp4v'), 29.97, (64, 48))
+        for i in range(47):
+            writer.write(np.roll(base, i, axis=1))
+        writer.release()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def check_segments(self, tolerance: float) -> None:
+        whole_dir = Path(self.temp_dir.name) / "whole"
+        segment_dir = Path(self.temp_dir.name) / "segments"
+        interference_main.process_video(self.video, "intensity", 0.5, whole_dir)
+        interference_main.process_video_segments(self.video, effect_variants(["intensity"], [0.5]), segment_dir, 3)
+
+        whole_frames, whole_fps = read_frames(whole_dir / "intensity_video.mp4")
+        segment_frames, segment_fps = read_frames(segment_dir / "intensity_video.mp4")
+        self.assertEqual(len(segment_frames), 47)
+        self.assertEqual(len(whole_frames), 47)
+        self.assertAlmostEqual(segment_fps, 29.97, places=2)
+        self.assertAlmostEqual(whole_fps, segment_fps, places=2)
+        for whole, segment in zip(whole_frames, segment_frames):
+            self.assertLess(np.abs(whole - segment).mean(), tolerance)
+        self.assertEqual([path.name for path in segment_dir.iterdir()], ["intensity_video.mp4"])
+
+    # Case 5: A video split into segments keeps every frame, in order, at the same frame rate
+    @patch.object(interference_main, "MIN_SEGMENT_FRAMES", 10)
+    def test_segments_match_whole(self):
+        with patch.object(interference_main.shutil, "which", return_value=None):
+            self.check_segments(2.0)
+
+    # Case 6: Segments joined by ffmpeg without re-encoding also keep every frame, each segment encoded on its own
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    @patch.object(interference_main, "MIN_SEGMENT_FRAMES", 10)
+    def test_segments_match_whole_ffmpeg(self):
+        self.check_segments(4.0)
+
+    # Case 7: A seek that lands on the wrong frame is detected by its timestamp and the segment decoded from the start
+    def test_seek_video(self):
+        frames, _ = read_frames(self.video)
+        open_capture = cv2.VideoCapture
+
+        class MisseekingCapture:
+            def __init__(self, path):
+                self.cap = open_capture(path)
+
+            def set(self, prop, value):
+                return self.cap.set(prop, value - 2 if prop == cv2.CAP_PROP_POS_FRAMES else value)
+
+            def __getattr__(self, name):
+                return getattr(self.cap, name)
+
+        for capture in (open_capture, MisseekingCapture):
+            with patch.object(interference_main.cv2, "VideoCapture", capture):
+                cap, frame = interference_main.seek_video(self.video, 20)
+            np.testing.assert_array_equal(frame.astype(int), frames[20])
+            ret, next_frame = cap.read()
+            np.testing.assert_array_equal(next_frame.astype(int), frames[21])
+            cap.release()
+
+    # Case 8: Sampled mode only filters the frames sent to the models, one per second
+    def test_sampled_frames(self):
+        sample_dir = Path(self.temp_dir.name) / "samples"
+        source_frames, _ = read_frames(self.video)
+        variants = effect_variants(["darkness"], [0.3])
+        errors = interference_main.process_files([self.video], variants, sample_dir, segments=3, sampled=True)
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(path.name for path in sample_dir.iterdir()), ["darkness_video_1.jpg", "darkness_video_2.jpg"])
+        for number, index in ((1, 0), (2, 29)):
+            expected = frame_effect("darkness", 0.3)(source_frames[index].astype(np.uint8)).astype(int)
+            result = cv2.imread(str(sample_dir / f"darkness_video_{number}.jpg")).astype(int)
+            self.assertLess(np.abs(result - expected).mean(), 5.0)  # Neighbouring frames differ by more than 6
+
+
+if __name__ == '__main__':
+    unittest.main()
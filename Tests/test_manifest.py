@@ -0,0 +1,101 @@
+# Test cases for the incremental builds of the image manipulation program
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_manifest.py
+# or
+#     pytest test_manifest.py
+
+import sys
+import os
+import importlib.util
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+SCRIPT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation'))
+sys.path.append(SCRIPT_DIR)
+# The api also has a main module, so this one is loaded under its own name
+spec = importlib.util.spec_from_file_location("interference_main", os.path.join(SCRIPT_DIR, "main.py"))
+interference_main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(interference_main)
+import manifest
+from manifest import load_manifest, MANIFEST_NAME
+from effects import effect_variants
+
+
+class TestIncrementalBuilds(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = Path(self.temp_dir.name) / "input"
+        self.output_dir = Path(self.temp_dir.name) / "output"
+        self.input_dir.mkdir()
+        rng = np.random.default_rng(0)
+        self.file_paths = []
+        for i in range(3):
+            path = self.input_dir / f"image{i}.png"
+            Image.fromarray(rng.integers(0, 256, (30, 40, 3), dtype=np.uint8)).save(path)
+            self.file_paths.append(path)
+        self.variants = effect_variants(["darkness", "rain"], [0.2, 0.4], sweep=True)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def build(self, variants=None, force=False):
+        with patch.object(interference_main, "process_files", wraps=interference_main.process_files) as mock_process:
+            errors = interference_main.build_files(self.file_paths, variants or self.variants, self.output_dir, force=force)
+        self.assertEqual(errors, [])
+        return sorted((path.name, variant[0]) for call in mock_process.call_args_list
+                      for path in call.args[0] for variant in call.args[1])
+
+    # Case 1: A second run with the same inputs and settings builds nothing
+    def test_up_to_date(self):
+        self.assertEqual(len(self.build()), 3 * 3)
+        self.assertEqual(len(load_manifest(self.output_dir)), 3 * 3)
+        self.assertEqual(self.build(), [])
+
+    # Case 2: Only the outputs of a changed input, a new strength or a deleted output are rebuilt
+    def test_rebuild_changed(self):
+        self.build()
+        Image.new("RGB", (40, 30), "red").save(self.file_paths[1])
+        (self.output_dir / "darkness@0.2_image2.png").unlink()
+        self.assertEqual(self.build(), [("image1.png", "darkness@0.2"), ("image1.png", "darkness@0.4"),
+                                        ("image1.png", "rain"), ("image2.png", "darkness@0.2")])
+        variants = effect_variants(["darkness", "rain"], [0.2, 0.6], sweep=True)
+        self.assertEqual(self.build(variants), [(path.name, "darkness@0.6") for path in self.file_paths])
+
+    # Case 3: Touching an input without changing it keeps its outputs
+    def test_touch_keeps_outputs(self):
+        self.build()
+        os.utime(self.file_paths[0], (0, 0))
+        self.assertEqual(self.build(), [])
+
+    # Case 4: A new code version or --force rebuilds everything
+    def test_version_and_force(self):
+        self.build()
+        self.assertEqual(len(self.build(force=True)), 3 * 3)
+        with patch.object(manifest, "code_version", return_value="changed"):
+            self.assertEqual(len(self.build()), 3 * 3)
+        self.assertTrue((self.output_dir / MANIFEST_NAME).exists())
+
+    # Case 5: Only the modules that decide the pixels of the outputs change the code version
+    def test_version_modules(self):
+        source_dir = Path(self.temp_dir.name) / "source"
+        source_dir.mkdir()
+        for name in [*manifest.OUTPUT_MODULES, "main.py"]:
+            (source_dir / name).write_bytes((Path(SCRIPT_DIR) / name).read_bytes())
+        with patch.object(manifest, "SOURCE_DIR", source_dir):
+            version = manifest.code_version.__wrapped__()
+            with open(source_dir / "main.py", "a") as file:
+                file.write("# A new help text\n")
+            self.assertEqual(manifest.code_version.__wrapped__(), version)
+            with open(source_dir / "filters.py", "a") as file:
+                file.write("# A new filter\n")
+            self.assertNotEqual(manifest.code_version.__wrapped__(), version)
+
+
+if __name__ == '__main__':
+    unittest.main()
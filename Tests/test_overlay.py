@@ -0,0 +1,117 @@
+# Test cases for the overlay effects of the image manipulation program
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_overlay.py
+# or
+#     pytest test_overlay.py
+
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation')))
+import overlay
+from overlay import process_image_overlay, process_array_overlay, prepare_overlay, prepare_overlay_array, load_overlay, enhance_overlay
+
+
+def uncached_overlay(background: Image.Image, effect_type: str, overlay_path: str) -> Image.Image:
+    """The overlay as applied before prepared overlays were cached."""
+    overlay = Image.open(overlay_path).convert("RGBA")
+    if effect_type == "fog":
+        new_size = (int(background.size[0] * 1.8), int(background.size[1] * 1.8))
+        overlay = overlay.resize(new_size, Image.Resampling.LANCZOS)
+        start_x = (overlay.size[0] - background.size[0]) // 2
+        start_y = (overlay.size[1] - background.size[1]) // 2
+        overlay = overlay.crop((start_x, start_y, start_x + background.size[0], start_y + background.size[1]))
+    else:
+        overlay = overlay.resize(background.size, Image.Resampling.LANCZOS)
+    overlay = enhance_overlay(overlay, effect_type)
+    return Image.alpha_composite(background.convert("RGBA"), overlay).convert("RGB")
+
+
+class TestOverlayCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        cls.overlay_path = str(Path(cls.temp_dir.name) / "overlay.png")
+        Image.fromarray(rng.integers(0, 256, (120, 160, 4), dtype=np.uint8), "RGBA").save(cls.overlay_path)
+        cls.background = Image.fromarray(rng.integers(0, 256, (90, 160, 3), dtype=np.uint8))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def setUp(self):
+        load_overlay.cache_clear()
+        prepare_overlay.cache_clear()
+        prepare_overlay_array.cache_clear()
+        overlay.prepare_overlay_ring.cache_clear()
+
+    # Case 1: Cached overlays give the same output as preparing the overlay for every image
+    def test_matches_uncached(self):
+        for effect in ("rain", "fog", "graffiti", "lens-flare", "wet-filter"):
+            expected = np.array(uncached_overlay(self.background, effect, self.overlay_path))
+            result = np.array(process_image_overlay(self.background, effect, self.overlay_path))
+            np.testing.assert_array_equal(result, expected, err_msg=effect)
+
+    # Case 2: Images of the same size share one prepared overlay
+    def test_shared_between_images(self):
+        for _ in range(3):
+            process_image_overlay(self.background, "rain", self.overlay_path)
+        self.assertEqual(prepare_overlay.cache_info().misses, 1)
+        self.assertEqual(prepare_overlay_array.cache_info().misses, 1)
+        self.assertEqual(prepare_overlay_array.cache_info().hits, 2)
+        self.assertEqual(load_overlay.cache_info().misses, 1)
+
+    # Case 3: A new size or effect prepares a new overlay from the loaded image
+    def test_keyed_by_effect_and_size(self):
+        process_image_overlay(self.background, "rain", self.overlay_path)
+        process_image_overlay(self.background.resize((80, 45)), "rain", self.overlay_path)
+        process_image_overlay(self.background, "fog", self.overlay_path)
+        self.assertEqual(prepare_overlay.cache_info().misses, 3)
+        self.assertEqual(load_overlay.cache_info().misses, 1)
+
+    # Case 4: Compositing onto an array in integer arithmetic matches Image.alpha_composite exactly
+    def test_array_overlay_exact(self):
+        background = np.array(self.background)
+        for effect in ("rain", "fog"):
+            overlay = prepare_overlay(effect, self.overlay_path, self.background.size)
+            expected = np.array(Image.alpha_composite(self.background.convert("RGBA"), overlay).convert("RGB"))
+            result = process_array_overlay(background, effect, self.overlay_path)
+            self.assertEqual(result.dtype, np.uint8)
+            np.testing.assert_array_equal(result, expected, err_msg=effect)
+
+    # Case 5: Images with transparency are still composited in RGBA
+    def test_transparent_background(self):
+        background = self.background.convert("RGBA")
+        background.putalpha(128)
+        expected = uncached_overlay(background, "rain", self.overlay_path)
+        np.testing.assert_array_equal(np.array(process_image_overlay(background, "rain", self.overlay_path)), np.array(expected))
+
+
+    # Case 6: Animated overlays fall by a few rows per frame and wrap around, back at the start after a full cycle
+    def test_animated_overlay(self):
+        background = np.array(self.background)
+        prepared = np.array(prepare_overlay("rain", self.overlay_path, self.background.size))
+        static = process_array_overlay(background, "rain", self.overlay_path)
+        np.testing.assert_array_equal(process_array_overlay(background, "rain", self.overlay_path, 5), static)
+        with patch.object(overlay, "animate_overlays", True):
+            np.testing.assert_array_equal(process_array_overlay(background, "rain", self.overlay_path, 0), static)
+            np.testing.assert_array_equal(process_array_overlay(background, "rain", self.overlay_path, 24), static)
+            shifted = Image.fromarray(np.roll(prepared, 5 * 90 // 24, axis=0), "RGBA")
+            expected = np.array(Image.alpha_composite(self.background.convert("RGBA"), shifted).convert("RGB"))
+            np.testing.assert_array_equal(process_array_overlay(background, "rain", self.overlay_path, 5), expected)
+            np.testing.assert_array_equal(process_array_overlay(background, "fog", self.overlay_path, 5),
+                                          process_array_overlay(background, "fog", self.overlay_path))
+        self.assertEqual(overlay.prepare_overlay_ring.cache_info().misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# Test cases for perturbing files in memory and sending them to the models
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_perturb.py
+# or
+#     pytest test_perturb.py
+
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import numpy as np
+import cv2
+from PIL import Image
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/api')))
+import perturb
+from perturb import perturbed_frames, perturb_process
+from effects import apply_image_effect, effect_variants
+
+
+class TestPerturb(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self.temp_dir.name)
+        rng = np.random.default_rng(0)
+        base = cv2.resize(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8), (64, 48))
+        self.image_path = self.dir_path / "image.png"
+        Image.fromarray(base).save(self.image_path)
+        self.video_path = self.dir_path / "video.mp4"
+        writer = cv2.VideoWriter(str(self.video_path), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+        for i in range(25):
+            writer.write(np.roll(base, i, axis=1))
+        writer.release()
+        self.variants = effect_variants(["darkness", "rain"], [0.2, 0.6], sweep=True)
+        self.requests = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def frames_request(self, frames: list[bytes], file_name: str) -> dict[str, str]:
+        self.requests.append((file_name, frames))
+        return {"model": "test", "file_name": file_name, "action": "stop"}
+
+    # Case 1: Images are perturbed like the image manipulation program and encoded as JPEG
+    def test_image_frames(self):
+        payloads = perturbed_frames(self.image_path, self.variants)
+        self.assertEqual([len(frames) for frames in payloads], [1, 1, 1])
+        image = Image.open(self.image_path)
+        for (name, effect_name, strength), frames in zip(self.variants, payloads):
+            expected = np.array(apply_image_effect(image, effect_name, strength)).astype(int)
+            decoded = cv2.imdecode(np.frombuffer(frames[0], np.uint8), cv2.IMREAD_COLOR)[..., ::-1].astype(int)
+            self.assertLess(np.abs(decoded - expected).mean(), 3, name)
+
+    # Case 2: Videos only perturb the frames encode_video would send, one per second
+    def test_video_sampled(self):
+        payloads = perturbed_frames(self.video_path, self.variants)
+        self.assertEqual([len(frames) for frames in payloads], [3, 3, 3])
+
+    # Case 3: Every file, variant and model gets a result with its perturbation and nothing is written to disk
+    def test_process_results(self):
+        files_before = sorted(self.dir_path.iterdir())
+        with patch.dict(perturb.FRAME_REQUEST_FUNCTIONS, {"chatgpt": self.frames_request, "claude": self.frames_request}):
+            results = perturb_process(self.dir_path, self.variants, ["chatgpt", "claude"])
+        self.assertEqual(len(results), 2 * 3 * 2)
+        self.assertEqual(sorted(self.dir_path.iterdir()), files_before)
+        perturbations = {(r["file_name"], r["effect"], r["strength"]) for r in results}
+        self.assertEqual(perturbations, {(name, effect, strength) for name in ("image.png", "video.mp4")
+                                         for effect, strength in (("darkness", 0.2), ("darkness", 0.6), ("rain", ""))})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# Test cases for the video processing pipeline of the image manipulation program
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_pipeline.py
+# or
+#     pytest test_pipeline.py
+
+import sys
+import os
+import time
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation')))
+from pipeline import run_pipeline, format_stats
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(50)]
+
+    def reader(self):
+        frames = iter(self.frames)
+        return lambda: next(frames, None)
+
+    # Case 1: Frames are written in their original order even when filters finish out of order
+    def test_order_preserved(self):
+        def slow_filter(frame):
+            time.sleep(0.002 * (frame[0, 0, 0] % 3))
+            return frame + 1
+        written = []
+        stats = run_pipeline(self.reader(), slow_filter, written.append, filter_threads=4)
+        self.assertEqual([int(frame[0, 0, 0]) for frame in written], list(range(1, 51)))
+        self.assertEqual([stage.frames for stage in stats], [50, 50, 50])
+        self.assertIn("50 frames", format_stats(stats, 1.0))
+
+    # Case 2: Only the requested number of frames is read
+    def test_max_frames(self):
+        written = []
+        run_pipeline(self.reader(), lambda frame: frame, written.append, max_frames=7)
+        self.assertEqual(len(written), 7)
+
+    # Case 3: An error in a stage stops the pipeline and is raised to the caller
+    def test_filter_error(self):
+        def failing_filter(frame):
+            if frame[0, 0, 0] == 10:
+                raise ValueError("bad frame")
+            return frame
+        written = []
+        with self.assertRaises(ValueError):
+            run_pipeline(self.reader(), failing_filter, written.append)
+        self.assertTrue(all(frame[0, 0, 0] < 10 for frame in written))
+
+
+    # Case 4: Filters can be given the position of each frame in the video
+    def test_frame_positions(self):
+        written = []
+        run_pipeline(self.reader(), lambda frame, frame_index: frame_index, written.append, filter_threads=4,
+                     first_frame=10, frame_step=3)
+        self.assertEqual(written, list(range(10, 160, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
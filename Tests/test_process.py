@@ -0,0 +1,81 @@
+# Test cases for parallel processing of files with the LLM request functions
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_process.py
+# or
+#     pytest test_process.py
+
+import sys
+import os
+import threading
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/api')))
+from process import parallel_process
+
+
+class TestParallelProcess(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self.temp_dir.name)
+        for i in range(12):
+            (self.dir_path / f"image{i}.jpg").write_bytes(b"x" * 300)  # 400 bytes once base64 encoded
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def request_function(self, file_path: Path) -> dict[str, str]:
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+        return {"file_name": file_path.name}
+
+    # Case 1: All files are processed
+    def test_all_files_processed(self):
+        result = parallel_process(self.dir_path, self.request_function)
+        self.assertEqual(sorted(r["file_name"] for r in result), sorted(f"image{i}.jpg" for i in range(12)))
+
+    # Case 2: Request count limit bounds concurrency
+    @patch('common.MAX_INFLIGHT_REQUESTS', 3)
+    def test_request_limit(self):
+        result = parallel_process(self.dir_path, self.request_function)
+        self.assertEqual(len(result), 12)
+        self.assertLessEqual(self.max_running, 3)
+
+    # Case 3: Byte budget bounds concurrency
+    @patch('common.MAX_INFLIGHT_BYTES', 800)
+    def test_byte_budget(self):
+        result = parallel_process(self.dir_path, self.request_function)
+        self.assertEqual(len(result), 12)
+        self.assertLessEqual(self.max_running, 2)
+
+    # Case 4: A file larger than the budget is still processed on its own
+    @patch('common.MAX_INFLIGHT_BYTES', 100)
+    def test_file_larger_than_budget(self):
+        result = parallel_process(self.dir_path, self.request_function)
+        self.assertEqual(len(result), 12)
+        self.assertEqual(self.max_running, 1)
+
+    # Case 5: Exceptions are reported without stopping the other files
+    def test_exception_in_request(self):
+        def failing_request(file_path: Path):
+            if file_path.name == "image0.jpg":
+                raise RuntimeError("API error")
+            return {"file_name": file_path.name}
+        result = parallel_process(self.dir_path, failing_request)
+        self.assertEqual(len(result), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
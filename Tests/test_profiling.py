@@ -0,0 +1,89 @@
+# Test cases for profiling the stages of the image manipulation program
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_profiling.py
+# or
+#     pytest test_profiling.py
+
+import sys
+import os
+import io
+import json
+import importlib.util
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+import numpy as np
+import cv2
+
+SCRIPT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation'))
+sys.path.append(SCRIPT_DIR)
+# The api also has a main module, so this one is loaded under its own name
+spec = importlib.util.spec_from_file_location("interference_main", os.path.join(SCRIPT_DIR, "main.py"))
+interference_main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(interference_main)
+import profiling
+from profiling import set_profiling, start_profile, finish_profile, profile_file, stage, load_trace, format_summary
+from effects import effect_variants
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self.temp_dir.name)
+        self.profile_dir = self.dir_path / "profile"
+        self.video_path = self.dir_path / "video.mp4"
+        writer = cv2.VideoWriter(str(self.video_path), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+        for i in range(12):
+            writer.write(np.full((48, 64, 3), 10 * i, dtype=np.uint8))
+        writer.release()
+
+    def tearDown(self):
+        set_profiling(None)
+        self.temp_dir.cleanup()
+
+    # Case 1: Without profiling, stages record nothing and no trace is written
+    def test_disabled(self):
+        with profile_file("image.png"):
+            with stage("decode"):
+                pass
+        self.assertEqual(profiling.stage_times, {})
+        self.assertFalse(self.profile_dir.exists())
+
+    # Case 2: Every file gets an entry with the time of each stage of the video pipeline
+    def test_video_stages(self):
+        set_profiling(self.profile_dir)
+        start_profile()
+        with profile_file(str(self.video_path)):
+            interference_main.process_video_variants(self.video_path, effect_variants(["rain"], [0.5]), self.dir_path / "output")
+        entries = load_trace(self.profile_dir)
+        self.assertEqual([entry["file"] for entry in entries], [str(self.video_path)])
+        self.assertLessEqual({"open", "decode", "filter", "encode", "close"}, set(entries[0]["stages"]))
+        self.assertGreaterEqual(entries[0]["total"], entries[0]["stages"]["encode"])
+
+        summary = format_summary(entries)
+        self.assertIn("video.mp4", summary)
+        self.assertTrue(summary.splitlines()[-1].startswith("Total"))
+
+    # Case 3: The summary is saved as JSON, with the statistics of cProfile and the peak memory of tracemalloc
+    def test_profilers(self):
+        for profiler in ("cprofile", "tracemalloc"):
+            set_profiling(self.profile_dir, profiler)
+            start_profile()
+            with profile_file(str(self.video_path)):
+                interference_main.process_video_variants(self.video_path, effect_variants(["darkness"], [0.5]), self.dir_path / "output")
+            with redirect_stdout(io.StringIO()):
+                finish_profile()
+            with open(self.profile_dir / "profile.json") as file:
+                summary = json.load(file)
+            self.assertEqual(summary["profiler"], profiler)
+            self.assertEqual(len(summary["files"]), 1)
+            self.assertIn("filter", summary["stages"])
+            self.assertEqual((self.profile_dir / "profile.prof").exists(), profiler == "cprofile")
+            self.assertEqual("peak_bytes" in summary["files"][0], profiler == "tracemalloc")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# Test cases for the result output sinks
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_sinks.py
+# or
+#     pytest test_sinks.py
+
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/api')))
+from sinks import result_row, ParquetSink, CsvSink, PYARROW_AVAILABLE
+import csv
+import common
+
+
+class TestResultRow(unittest.TestCase):
+
+    # Case 1: Columns follow the CSV layout
+    def test_column_order(self):
+        row = result_row({"model": "gpt-4o-mini", "file_name": "image.jpg", "action": "stop", "extra": "value"})
+        expected_columns = ["File_name", "Model", *common.AnalysisResponse.model_fields.keys(), "Extra"]
+        self.assertEqual(list(row.keys()), expected_columns)
+        self.assertEqual(row["File_name"], "image.jpg")
+        self.assertEqual(row["description"], "")
+
+@unittest.skipUnless(PYARROW_AVAILABLE, "pyarrow is not installed")
+class TestParquetSink(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_path = str(Path(self.temp_dir.name) / "result.parquet")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # Case 2: Results are written across several record batches
+    def test_write_batches(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        sink = ParquetSink(self.output_path, batch_rows=2)
+        for i in range(5):
+            sink.write({"file_name": f"image{i}.jpg", "model": "gpt-4o-mini", "action": "stop"})
+        self.assertTrue(sink.close())
+
+        table = pq.read_table(self.output_path)
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column_names, ["File_name", "Model", *common.AnalysisResponse.model_fields.keys()])
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("Model").type))
+        self.assertEqual(table.column("File_name").to_pylist(), [f"image{i}.jpg" for i in range(5)])
+        self.assertEqual(set(table.column("action").to_pylist()), {"stop"})
+
+    # Case 3: No file is written without results
+    def test_close_without_results(self):
+        sink = ParquetSink(self.output_path)
+        self.assertFalse(sink.close())
+        self.assertFalse(os.path.exists(self.output_path))
+
+    # Case 4: Checkpoints leave readable files, and new columns continue in a new part instead of being dropped
+    def test_checkpoint_parts(self):
+        import pyarrow.parquet as pq
+        sink = ParquetSink(self.output_path)
+        sink.write({"file_name": "image0.jpg", "model": "gpt-4o-mini", "action": "stop"})
+        sink.checkpoint()
+        self.assertEqual(pq.read_table(self.output_path).column("File_name").to_pylist(), ["image0.jpg"])
+        sink.write({"file_name": "image1.jpg", "model": "gpt-4o-mini", "action": "go"})
+        sink.write({"file_name": "image2.jpg", "model": "gpt-4o-mini", "action": "go", "effect": "rain"})
+        sink.checkpoint()
+        sink.write({"file_name": "image3.jpg", "model": "gpt-4o-mini", "action": "go", "strength": 0.5})
+        self.assertTrue(sink.close())
+
+        parts = [pq.read_table(path) for path in sink.paths]
+        self.assertEqual([Path(path).name for path in sink.paths], ["result.parquet", "result-1.parquet", "result-2.parquet"])
+        self.assertEqual([part.num_rows for part in parts], [1, 2, 1])
+        self.assertEqual(parts[1].column("Effect").to_pylist(), ["", "rain"])
+        self.assertEqual(parts[2].column_names[-2:], ["Effect", "Strength"])
+        self.assertEqual(parts[2].column("Strength").to_pylist(), ["0.5"])
+
+class TestCsvSink(unittest.TestCase):
+
+    # Case 5: Rows are readable as soon as they are flushed, with the CSV output columns
+    def test_flush_rows(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = str(Path(temp_dir) / "result.csv")
+            sink = CsvSink(output_path)
+            sink.write({"file_name": "image0.jpg", "model": "gpt-4o-mini", "action": "stop", "effect": "rain"})
+            sink.flush()
+            with open(output_path, newline="") as file:
+                rows = list(csv.DictReader(file))
+            self.assertEqual(rows[0]["File_name"], "image0.jpg")
+            self.assertEqual(rows[0]["Effect"], "rain")
+            sink.write({"file_name": "image1.jpg", "model": "gpt-4o-mini", "action": "go", "effect": "fog"})
+            self.assertTrue(sink.close())
+            with open(output_path, newline="") as file:
+                self.assertEqual([row["action"] for row in csv.DictReader(file)], ["stop", "go"])
+
+    # Case 6: Results with new columns continue in a new file with the extended header
+    def test_new_columns(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = str(Path(temp_dir) / "result.csv")
+            sink = CsvSink(output_path)
+            sink.write({"file_name": "image0.jpg", "model": "gpt-4o-mini", "action": "stop"})
+            sink.write({"file_name": "image1.jpg", "model": "gpt-4o-mini", "action": "go", "effect": "rain"})
+            self.assertTrue(sink.close())
+            self.assertEqual(sink.paths, [output_path, str(Path(temp_dir) / "result-1.csv")])
+            with open(sink.paths[1], newline="") as file:
+                rows = list(csv.DictReader(file))
+            self.assertEqual([(row["File_name"], row["Effect"]) for row in rows], [("image1.jpg", "rain")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# Test cases for the lazy loading of provider SDKs and heavy libraries by the api CLI
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_startup.py
+# or
+#     pytest test_startup.py
+
+import os
+import subprocess
+import sys
+import unittest
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/api'))
+
+
+def loaded_modules(imports: list[str], candidates: list[str]) -> list[str]:
+    script = f"import sys\nfor m in {imports!r}: __import__(m)\nprint(','.join(m for m in {candidates!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", script], cwd=API_DIR, capture_output=True, text=True, check=True).stdout
+    return [module for module in output.strip().split(",") if module]
+
+
+class TestLazyImports(unittest.TestCase):
+
+    # Case 1: Parsing arguments loads no provider SDK or heavy library
+    def test_main_import(self):
+        loaded = loaded_modules(["main"], ["openai", "anthropic", "google.generativeai", "pandas", "cv2", "tkinter", "tqdm", "PIL"])
+        self.assertEqual(loaded, [])
+
+    # Case 2: Batch status commands only load the OpenAI SDK
+    def test_batch_operations_import(self):
+        loaded = loaded_modules(["main", "batch_operations"], ["openai", "anthropic", "google.generativeai", "pandas", "cv2", "tkinter", "tqdm", "PIL"])
+        self.assertEqual(loaded, ["openai"])
+
+    # Case 3: Processing loads nothing until a request is made
+    def test_process_import(self):
+        loaded = loaded_modules(["main", "process"], ["anthropic", "google.generativeai", "pandas", "cv2", "tkinter"])
+        self.assertEqual(loaded, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# Test cases for the local results store
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_store.py
+# or
+#     pytest test_store.py
+
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/api')))
+from store import connect, start_run, record_results, list_runs, diff_runs, aggregate_results, run_query
+
+
+class TestResultsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        temp_path = Path(self.temp_dir.name)
+        self.db_path = temp_path / "results.db"
+        self.image = temp_path / "image.jpg"
+        self.image.write_bytes(b"image bytes")
+        self.video = temp_path / "video.mp4"
+        self.video.write_bytes(b"video bytes")
+        self.file_dict = {"image.jpg": self.image, "video.mp4": self.video}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def record_run(self, run_id: str, action: str) -> None:
+        start_run("process", "chatgpt", Path(self.temp_dir.name), self.file_dict, run_id, self.db_path)
+        record_results(run_id, [
+            {"file_name": "image.jpg", "model": "gpt-4o-mini", "action": action},
+            {"file_name": "video.mp4_1", "model": "gpt-4o-mini", "action": "stop"},
+        ], self.db_path)
+
+    # Case 1: Results are linked to file content hashes and video frames
+    def test_record_results(self):
+        self.record_run("run_a", "stop")
+        connection = connect(self.db_path)
+        _, rows = run_query(connection, "SELECT file_name, file_hash IS NOT NULL, frame FROM results ORDER BY file_name")
+        connection.close()
+        self.assertEqual(rows, [("image.jpg", 1, None), ("video.mp4_1", 1, 1)])
+
+    # Case 2: Runs are listed with their result counts
+    def test_list_runs(self):
+        self.record_run("run_a", "stop")
+        self.record_run("run_b", "go")
+        connection = connect(self.db_path)
+        columns, rows = list_runs(connection)
+        connection.close()
+        self.assertEqual([row[0] for row in rows], ["run_a", "run_b"])
+        self.assertEqual([row[columns.index("results")] for row in rows], [2, 2])
+
+    # Case 3: Only changed responses appear in a diff
+    def test_diff_runs(self):
+        self.record_run("run_a", "stop")
+        self.record_run("run_b", "go")
+        connection = connect(self.db_path)
+        _, rows = diff_runs(connection, "run_a", "run_b", "action")
+        connection.close()
+        self.assertEqual(rows, [("image.jpg", None, None, "gpt-4o-mini", "stop", "go")])
+
+    # Case 4: Response values are counted per group
+    def test_aggregate_results(self):
+        self.record_run("run_a", "stop")
+        self.record_run("run_b", "go")
+        connection = connect(self.db_path)
+        _, rows = aggregate_results(connection, "model", "action")
+        connection.close()
+        self.assertEqual(rows, [("gpt-4o-mini", "stop", 3), ("gpt-4o-mini", "go", 1)])
+
+    # Case 5: Grouping by an unknown column is rejected
+    def test_aggregate_invalid_group(self):
+        connection = connect(self.db_path)
+        with self.assertRaises(ValueError):
+            aggregate_results(connection, "response; DROP TABLE results", "action")
+        connection.close()
+
+    # Case 6: Exported results of an unknown batch still create a run
+    def test_record_results_unknown_run(self):
+        record_results("batch_123", [{"file_name": "image.jpg", "model": "gpt-4o-mini", "action": "stop"}], self.db_path)
+        connection = connect(self.db_path)
+        _, rows = run_query(connection, "SELECT run_id, command FROM runs")
+        connection.close()
+        self.assertEqual(rows, [("batch_123", "export")])
+
+    # Case 7: Perturbed variants of a file are only compared with the same variant, and can be grouped by effect
+    def test_diff_perturb_runs(self):
+        variants = [("darkness", 0.2), ("darkness", 0.6), ("rain", "")]
+        for run_id, actions in (("run_a", ["go", "go", "stop"]), ("run_b", ["go", "stop", "stop"])):
+            start_run("perturb", "chatgpt", Path(self.temp_dir.name), self.file_dict, run_id, self.db_path)
+            record_results(run_id, [{"file_name": "image.jpg", "model": "gpt-4o-mini", "action": action,
+                                     "effect": effect, "strength": strength}
+                                    for (effect, strength), action in zip(variants, actions)], self.db_path)
+        connection = connect(self.db_path)
+        _, rows = diff_runs(connection, "run_a", "run_b", "action")
+        _, counts = aggregate_results(connection, "effect", "action")
+        connection.close()
+        self.assertEqual(rows, [("image.jpg", "darkness", 0.6, "gpt-4o-mini", "go", "stop")])
+        self.assertEqual(counts, [("darkness", "go", 3), ("darkness", "stop", 1), ("rain", "stop", 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# Test cases for processing large images in tiles
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_tiles.py
+# or
+#     pytest test_tiles.py
+
+import sys
+import os
+import importlib.util
+import tempfile
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+import numpy as np
+import cv2
+from PIL import Image
+
+SCRIPT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation'))
+sys.path.append(SCRIPT_DIR)
+# The api also has a main module, so this one is loaded under its own name
+spec = importlib.util.spec_from_file_location("interference_main", os.path.join(SCRIPT_DIR, "main.py"))
+interference_main = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(interference_main)
+import filters
+from effects import effect_variants
+from filters import luma_mean
+import tiles
+from tiles import TilePass, tile_boxes, tiled_luma_mean, decode_image
+
+
+class TestTiles(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir_path = Path(self.temp_dir.name)
+        rng = np.random.default_rng(0)
+        self.image = cv2.resize(rng.integers(0, 256, (20, 30, 3), dtype=np.uint8), (333, 250), interpolation=cv2.INTER_CUBIC)
+        self.image_path = self.dir_path / "image.png"
+        Image.fromarray(self.image).save(self.image_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def compare(self, effect_names):
+        variants = effect_variants(effect_names, [0.4], sweep=True)
+        interference_main.process_image_variants(self.image_path, variants, self.dir_path / "whole")
+        interference_main.process_image_variants(self.image_path, variants, self.dir_path / "tiled", tile_size=64)
+        self.assertEqual(sorted(path.name for path in (self.dir_path / "tiled").iterdir()),
+                         sorted(path.name for path in (self.dir_path / "whole").iterdir()))
+        for name, _, _ in variants:
+            whole = np.array(Image.open(self.dir_path / "whole" / f"{name}_image.png")).astype(int)
+            tiled = np.array(Image.open(self.dir_path / "tiled" / f"{name}_image.png")).astype(int)
+            yield name, np.abs(whole - tiled)
+
+    # Case 1: Tiled filters and chains match processing the whole image, blurs included
+    def test_filters_match(self):
+        with patch.object(filters, "motion_angle", 30.0):
+            for name, difference in self.compare(["darkness", "brightness", "intensity", "gaussian", "motion",
+                                                  "gaussian+intensity+motion@0.3", "motion+intensity@0.2+gaussian@1.0"]):
+                self.assertEqual(difference.max(), 0, name)
+
+    # Case 2: Overlays are resampled per tile, which only rounds a few pixels differently
+    def test_overlays_match(self):
+        for name, difference in self.compare(["rain", "fog", "graffiti", "lens-flare", "wet-filter", "fog+motion@0.3+intensity"]):
+            self.assertLessEqual(difference.max(), 3, name)
+            self.assertLess((difference > 0).mean(), 0.001, name)
+
+    # Case 3: The mean of the intensity filter is summed over the tiles
+    def test_luma_mean(self):
+        boxes = tile_boxes(333, 250, 64)
+        self.assertEqual(sum((right - left) * (bottom - top) for left, top, right, bottom in boxes), 333 * 250)
+        self.assertEqual(tiled_luma_mean(self.image, TilePass(333, 250), 64), luma_mean(self.image))
+
+    # Case 4: Images that fit in one tile are processed whole
+    def test_small_image_whole(self):
+        with patch.object(interference_main, "process_image_tiles") as mock_tiles:
+            interference_main.process_image_variants(self.image_path, effect_variants(["rain"], [0.5]), self.dir_path, tile_size=512)
+        mock_tiles.assert_not_called()
+        self.assertTrue((self.dir_path / "rain_image.png").exists())
+
+    # Case 5: Images are decoded into the buffer a band at a time, converting other modes band by band
+    def test_decode_bands(self):
+        palette_path = self.dir_path / "palette.png"
+        Image.fromarray(self.image).quantize(64).save(palette_path)
+        with patch.object(tiles, "BAND_ROWS", 64):
+            for path in (self.image_path, palette_path):
+                buffer = decode_image(path, self.dir_path / "buffer.raw")
+                with Image.open(path) as image:
+                    np.testing.assert_array_equal(np.asarray(buffer), np.asarray(image.convert("RGB")))
+                del buffer
+
+
+if __name__ == '__main__':
+    unittest.main()
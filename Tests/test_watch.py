@@ -0,0 +1,120 @@
+# Test cases for watching a directory for new files
+
+# To run the tests, run the following command (add -v for more verbose output):
+#     python3 -m unittest test_watch.py
+# or
+#     pytest test_watch.py
+
+import sys
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'Scripts/image_manipulation')))
+from watch import FileWatcher, watch, WATCHDOG_AVAILABLE
+
+
+class TestFileWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name).resolve()
+        (self.root / "output").mkdir()
+        (self.root / "old.jpg").write_bytes(b"old")
+        self.watcher = FileWatcher(self.root, (".jpg", ".mp4"), exclude=self.root / "output", settle_seconds=2.0, use_events=False)
+        self.watcher.mark_existing()
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.temp_dir.cleanup()
+
+    # Case 1: New files are reported once they stop changing, and only once
+    def test_new_file_settles(self):
+        clip = self.root / "sub" / "clip.mp4"
+        clip.parent.mkdir()
+        clip.write_bytes(b"part")
+        self.assertEqual(self.watcher.ready_files(0.0), [])
+        self.assertEqual(self.watcher.ready_files(1.0), [])
+        with open(clip, "ab") as file:
+            file.write(b"ial write")  # Still being written, so it has to settle again
+        self.assertEqual(self.watcher.ready_files(2.5), [])
+        self.assertEqual(self.watcher.ready_files(4.0), [])
+        self.assertEqual(self.watcher.ready_files(4.5), [clip])
+        self.assertEqual(self.watcher.ready_files(10.0), [])
+
+    # Case 2: Existing, excluded and unwatched files are ignored, changed files are reported again
+    def test_ignored_and_changed(self):
+        (self.root / "output" / "rain_old.jpg").write_bytes(b"output")
+        (self.root / "notes.txt").write_bytes(b"text")
+        self.watcher.ready_files(0.0)
+        self.assertEqual(self.watcher.ready_files(3.0), [])
+        (self.root / "old.jpg").write_bytes(b"changed")
+        self.watcher.ready_files(4.0)
+        self.assertEqual(self.watcher.ready_files(6.0), [self.root / "old.jpg"])
+
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name).resolve()
+        (self.root / "old.jpg").write_bytes(b"old")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_watch(self, include_existing: bool):
+        batches = []
+        stop = threading.Event()
+
+        def handle_files(file_paths):
+            batches.append(list(file_paths))
+            if len(batches) == 1:
+                time.sleep(0.6)  # Files arriving meanwhile go into the next batch
+            else:
+                stop.set()
+
+        thread = threading.Thread(target=watch, args=(self.root, (".jpg",), handle_files),
+                                  kwargs={"settle_seconds": 0.05, "poll_seconds": 0.02,
+                                          "include_existing": include_existing, "stop": stop})
+        thread.start()
+        time.sleep(0.1)
+        (self.root / "a.jpg").write_bytes(b"a")
+        time.sleep(0.3)
+        (self.root / "b.jpg").write_bytes(b"b")
+        (self.root / "c.jpg").write_bytes(b"c")
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        return batches
+
+    # Case 3: New files are handled one batch at a time
+    def test_batches(self):
+        batches = self.run_watch(include_existing=False)
+        self.assertEqual(batches[0], [self.root / "a.jpg"])
+        self.assertEqual(batches[1], [self.root / "b.jpg", self.root / "c.jpg"])
+
+    # Case 4: Existing files can be handled first
+    def test_include_existing(self):
+        batches = self.run_watch(include_existing=True)
+        self.assertEqual(batches[0], [self.root / "old.jpg"])
+        self.assertIn(self.root / "a.jpg", batches[1])
+
+    # Case 5: inotify events find new files without scanning
+    @unittest.skipUnless(WATCHDOG_AVAILABLE, "watchdog is not installed")
+    def test_events(self):
+        watcher = FileWatcher(self.root, (".jpg",), settle_seconds=0.0, use_events=True)
+        try:
+            watcher.mark_existing()
+            (self.root / "new.jpg").write_bytes(b"new")
+            time.sleep(0.5)
+            watcher.ready_files(0.0)
+            self.assertEqual(watcher.ready_files(1.0), [self.root / "new.jpg"])
+        finally:
+            watcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()